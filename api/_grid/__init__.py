@@ -0,0 +1,5 @@
+"""Rendering core for The Grid.
+
+Kept out of ``api/index.py`` so the Flask entry point can import it lazily:
+only ``/api/image`` needs Pillow, the dashboard and font routes never do.
+"""
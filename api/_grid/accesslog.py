@@ -0,0 +1,93 @@
+"""Structured per-request records for ``/api/image`` (no Pillow here).
+
+With ``GRID_ACCESS_LOG`` set (``-`` for stdout, otherwise a file to append
+to) every ``/api/image`` response adds one JSON line::
+
+    {"log":"access","ts":1792378860.1,"day":"2026-10-19","status":200,"config":"9f2c04d1e6a7b385",
+     "key":"41be0c9d2f7e6a10","mode":"year","theme":"dark","variants":"lock","emoji":2,"signature":true,
+     "cache":"miss","render_ms":11.8,"ms":13.1,"bytes":14028}
+
+``config`` hashes the canonical token (every parameter, theme included);
+``key`` hashes the render-cache key (token and IST date, colours left out
+on the indexed canvas), so ``tools/analyze_logs.py`` can replay what the
+cache sees. Hashes keep signatures and dates out of the logs. ``cache`` is
+``hit``, ``shared``, ``miss``, ``partial`` (some variants rendered),
+``uncacheable`` (no token form, rendered every time) or ``redirect``.
+``render_ms`` is set when this request rendered (for a streamed render it
+includes waiting on the client). Rejected requests (400, 429, 503) are
+logged too, with whatever was known when they were turned away.
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+
+from _grid.settings import ACCESS_LOG
+
+_lock = threading.Lock()
+_stream = None
+
+
+def digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def begin(now):
+    """A new record for a request made at IST ``now``, or None when logging is off."""
+    if not ACCESS_LOG:
+        return None
+    return {'log': 'access', 'ts': round(time.time(), 3), 'day': now.date().isoformat(), '_t0': time.perf_counter()}
+
+
+def describe(record, config, variants, key, canonical):
+    """Adds what the request asked for; ``canonical`` is its canonical query (None without a token form)."""
+    if record is None:
+        return
+    record.update({
+        'config': digest(canonical) if canonical else None,
+        'key': digest(key) if key else None,
+        'mode': config.mode,
+        'theme': config.theme if config.accent is None and config.bg is None else 'custom',
+        'variants': ','.join(variants),
+        'emoji': sum(1 for e in config.special_dates.values() if e),
+        'signature': bool(config.signature),
+    })
+
+
+def note(record, **fields):
+    if record is not None:
+        record.update(fields)
+
+
+def cache_outcome(sources, key):
+    """One word for how the variants were served, from each variant's ``RenderCache.lookup`` source."""
+    if not key:
+        return 'uncacheable'
+    if all(source == 'miss' for source in sources):
+        return 'miss'
+    if 'miss' in sources:
+        return 'partial'
+    return 'shared' if 'shared' in sources else 'hit'
+
+
+def finish(record, status, nbytes):
+    """Completes and writes the record (no-op for None)."""
+    if record is None:
+        return
+    record['ms'] = round((time.perf_counter() - record.pop('_t0')) * 1000, 2)
+    record['status'] = status
+    record['bytes'] = nbytes
+    write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+
+
+def write(line):
+    global _stream
+    with _lock:
+        try:
+            if _stream is None:
+                _stream = sys.stdout if ACCESS_LOG == '-' else open(ACCESS_LOG, 'a', encoding='utf-8')
+            _stream.write(line + '\n')
+            _stream.flush()
+        except OSError as e:
+            print(f"Access log {ACCESS_LOG} not writable: {e}")
@@ -0,0 +1,29 @@
+"""The rest of a period's wallpapers as one zip, for devices that rotate them offline."""
+import datetime
+import io
+import zipfile
+
+from _grid.config import period_days
+
+
+def archive_name(day, variant):
+    return f"{day.isoformat()}{'' if variant == 'lock' else f'-{variant}'}.png"
+
+
+def build_archive(config, now, period, variants=('lock',)):
+    """Zip of ``config`` for every day from ``now`` to the end of ``period``; returns (bytes, days).
+
+    Members are named ``YYYY-MM-DD.png`` (``-home`` for the home screen
+    variant) and stored, not deflated: PNGs are already compressed.
+    """
+    from _grid.render import render_days
+
+    days = period_days(now.date(), period)
+    # Today keeps the request's clock; later days are rendered as of the same time of day
+    nows = [now] + [datetime.datetime.combine(day, now.timetz()) for day in days[1:]]
+    body = io.BytesIO()
+    with zipfile.ZipFile(body, 'w', zipfile.ZIP_STORED) as archive:
+        for variant in variants:
+            for day, png in zip(days, render_days(config, nows, variant)):
+                archive.writestr(zipfile.ZipInfo(archive_name(day, variant), (day.year, day.month, day.day, 0, 0, 0)), png)
+    return body.getvalue(), days
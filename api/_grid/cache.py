@@ -0,0 +1,130 @@
+"""Cache of encoded wallpapers, keyed by canonical config token and IST day.
+
+An in-process LRU, backed by the shared store (store.py) when one is
+configured, so instances fill each other's misses.
+"""
+import collections
+import dataclasses
+import threading
+
+from _grid.config import ConfigError, ist_now, seconds_until_midnight
+from _grid.settings import CANVAS_MODE, RENDER_CACHE_SIZE
+from _grid.store import shared_store
+
+# Bump when the entry layout changes, so instances on old code never read new entries
+ENTRY_FORMAT = 1
+
+
+def pack_entry(entry):
+    """Serializes a ``(png, emoji_entries)`` render entry for the shared store."""
+    png, emoji_entries = entry
+    if emoji_entries is None:
+        return b'\x00' + png
+    return bytes([1, len(emoji_entries)]) + bytes(v for rgba in emoji_entries for v in rgba) + png
+
+
+def unpack_entry(data):
+    if data[0] == 0:
+        return data[1:], None
+    count = data[1]
+    flat = data[2:2 + 4 * count]
+    return data[2 + 4 * count:], tuple(tuple(flat[i:i + 4]) for i in range(0, len(flat), 4))
+
+
+class RenderCache:
+    """Thread-safe LRU of ``(png, emoji_entries)`` render entries over an optional shared store."""
+
+    def __init__(self, max_entries, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def lookup(self, key):
+        """(entry or None, where it came from: 'hit', 'shared' or 'miss')."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value, 'hit'
+        if self.store is not None:
+            data = self.store.get(self._store_key(key))
+            if data:
+                value = unpack_entry(data)
+                self._remember(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value, 'shared'
+        with self._lock:
+            self.misses += 1
+        return None, 'miss'
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.store is not None:
+            # Keys carry the IST date, so nothing outlives the day it was rendered for
+            self.store.set(self._store_key(key), pack_entry(value), seconds_until_midnight(ist_now()))
+
+    def _remember(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _store_key(key):
+        # RGB and indexed entries for one token differ, so the canvas is part of the key
+        return f"render:{ENTRY_FORMAT}:{CANVAS_MODE}:{key}"
+
+    def nbytes(self):
+        """PNG bytes held in this process."""
+        with self._lock:
+            return sum(len(png) for png, _ in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+render_cache = RenderCache(RENDER_CACHE_SIZE, shared_store)
+
+
+def variant_key(key, variant):
+    """Cache key of one output variant; the lock screen keeps the plain key."""
+    return key if key is None or variant == 'lock' else f"{key}/{variant}"
+
+
+def canonical_query(config, variants):
+    """The one query string every spelling of this request redirects to, or None without a token form."""
+    from _grid.codec import encode_config
+    try:
+        query = f"c={encode_config(config)}"
+    except ConfigError:
+        return None
+    if variants != ('lock',):
+        query += f"&variants={','.join(variants)}"
+    return query
+
+
+def render_key(config, now):
+    """Canonical token plus the IST date, or None if the config has no token form.
+
+    Indexed renders are re-themed by palette swap, so their key leaves the
+    colours out and every theme of a config shares one entry.
+    """
+    from _grid.codec import encode_config
+    if CANVAS_MODE == 'P':
+        config = dataclasses.replace(config, theme='dark', accent=None, bg=None)
+    try:
+        return f"{encode_config(config)}@{now.date().isoformat()}"
+    except ConfigError:
+        return None
@@ -0,0 +1,296 @@
+"""Compact binary config token carried as ``?c=`` (base64url, no padding).
+
+Layout, all integers big-endian::
+
+    byte 0    version (high nibble) | flags (low nibble)
+              flags: 1 = highlight weekends, 2 = signature, 4 = dates as bitset,
+                     8 = custom colours
+    byte 1    mode (bits 0-2) | theme (bits 3-4) | bar style (bits 5-6)
+    dates     list:   count (1 byte), then day-of-year (2 bytes) per date
+              bitset: 46 bytes, bit n = day n of a leap year
+    emoji     version 1: one nibble per date in ascending date order, padded
+              to a byte: 0 none, 1-7 EMOJI_TABLE, 15 inline (length byte +
+              UTF-8 follows, in date order, after the nibbles)
+              version 2: count (1 byte), then length byte + UTF-8 per distinct
+              inline emoji in order of first use; then one code per date in
+              ascending date order: 0 none, 1-7 EMOJI_TABLE, 8 + i inline
+              emoji i; codes are nibbles (padded to a byte) while they fit,
+              bytes otherwise. Variation selectors are dropped in both.
+    signature length byte + UTF-8 (only with the signature flag)
+    mode      life:  birthdate as days since 1900-01-01 (3 bytes), lifespan (1)
+              years: first year (2 bytes, 0 = current year), span - 1 (1)
+    colours   which (1 byte: 1 = accent, 2 = background), then R, G, B per
+              colour in that order (only with the colours flag)
+
+Whichever of list or bitset is shorter is used, and version 2 only when
+there are inline emoji (so each is written once, however many dates use
+it), so every config has exactly one encoding; that canonical token doubles
+as the render cache key. Version 1 tokens with inline emoji still decode.
+"""
+import base64
+import datetime
+import re
+
+from _grid.config import (
+    BAR_STYLES, MAX_LIFESPAN, MAX_YEAR_SPAN, MIN_BIRTHDATE, MODES, THEME_NAMES, ConfigError, GridConfig,
+)
+
+VERSION = 1
+VERSION_EMOJI_TABLE = 2
+
+FLAG_WEEKENDS = 0x1
+FLAG_SIGNATURE = 0x2
+FLAG_BITSET = 0x4
+FLAG_COLORS = 0x8
+KNOWN_FLAGS = FLAG_WEEKENDS | FLAG_SIGNATURE | FLAG_BITSET | FLAG_COLORS
+
+COLOR_ACCENT = 0x1
+COLOR_BG = 0x2
+
+# Same order as the dashboard's emoji picker; index 0 means "plain gold dot"
+EMOJI_TABLE = ["🍰", "❤️", "🚀", "💰", "✈️", "💀", "🍺"]
+EMOJI_INLINE = 15  # version 1
+EMOJI_TABLE_CODE = len(EMOJI_TABLE) + 1  # version 2: code of the token's first inline emoji
+
+BITSET_BYTES = 46  # 366 days
+MAX_TOKEN_CHARS = 1024
+MAX_INLINE_EMOJI_BYTES = 64
+MAX_SIGNATURE_BYTES = 255
+EPOCH = MIN_BIRTHDATE.toordinal()
+
+# Day-of-year in a leap year, so 02-29 has a slot
+_LEAP_START = datetime.date(2000, 1, 1).toordinal()
+
+
+def _strip_vs(emoji):
+    return emoji.replace('\ufe0f', '')
+
+_EMOJI_INDEX = {_strip_vs(e): i + 1 for i, e in enumerate(EMOJI_TABLE)}
+
+
+def _day_index(month, day):
+    return datetime.date(2000, month, day).toordinal() - _LEAP_START
+
+
+# Decoding is a table lookup instead of a date construction per entry
+_MONTH_DAY = [(d.month, d.day) for d in (datetime.date.fromordinal(_LEAP_START + i) for i in range(366))]
+
+_TOKEN_RE = re.compile(r'[A-Za-z0-9_-]+')
+
+
+# --- Encoding ---
+def encode_config(config):
+    """Returns the canonical token for ``config``."""
+    dates = sorted((_day_index(m, d), emoji) for (m, d), emoji in config.special_dates.items())
+    theme = THEME_NAMES.index(config.theme) if config.theme in THEME_NAMES else 0
+
+    flags = 0
+    if config.highlight_weekends:
+        flags |= FLAG_WEEKENDS
+    signature = config.signature.encode('utf-8')
+    if signature:
+        flags |= FLAG_SIGNATURE
+    use_bitset = 1 + 2 * len(dates) > BITSET_BYTES
+    if use_bitset:
+        flags |= FLAG_BITSET
+    if config.accent or config.bg:
+        flags |= FLAG_COLORS
+
+    codes, inline = [], []
+    for _, emoji in dates:
+        if not emoji:
+            codes.append(0)
+        elif _strip_vs(emoji) in _EMOJI_INDEX:
+            codes.append(_EMOJI_INDEX[_strip_vs(emoji)])
+        else:
+            # The emoji CDN is keyed without U+FE0F, so it carries no information
+            raw = _strip_vs(emoji).encode('utf-8')
+            if len(raw) > MAX_INLINE_EMOJI_BYTES:
+                raise ConfigError('emoji too long to encode')
+            if raw not in inline:
+                inline.append(raw)
+            codes.append(EMOJI_TABLE_CODE + inline.index(raw))
+    version = VERSION_EMOJI_TABLE if inline else VERSION
+
+    out = bytearray([version << 4 | flags,
+                     MODES.index(config.mode) | theme << 3 | BAR_STYLES.index(config.bar_style) << 5])
+
+    if use_bitset:
+        bits = bytearray(BITSET_BYTES)
+        for index, _ in dates:
+            bits[index >> 3] |= 0x80 >> (index & 7)
+        out += bits
+    else:
+        out.append(len(dates))
+        for index, _ in dates:
+            out += index.to_bytes(2, 'big')
+
+    if inline:
+        out.append(len(inline))
+        for raw in inline:
+            out.append(len(raw))
+            out += raw
+    out += _pack_codes(codes, _wide_codes(len(inline)))
+
+    if signature:
+        if len(signature) > MAX_SIGNATURE_BYTES:
+            raise ConfigError('signature too long to encode')
+        out.append(len(signature))
+        out += signature
+
+    if config.mode == 'life':
+        out += (config.birthdate.toordinal() - EPOCH).to_bytes(3, 'big')
+        out.append(config.lifespan)
+    elif config.mode == 'years':
+        first = config.year_from or 0
+        span = (config.year_to - config.year_from) if config.year_from else 0
+        out += first.to_bytes(2, 'big')
+        out.append(span)
+
+    if flags & FLAG_COLORS:
+        out.append((COLOR_ACCENT if config.accent else 0) | (COLOR_BG if config.bg else 0))
+        for color in (config.accent, config.bg):
+            if color:
+                out += bytes(color)
+
+    token = base64.urlsafe_b64encode(bytes(out)).rstrip(b'=').decode('ascii')
+    if len(token) > MAX_TOKEN_CHARS:
+        raise ConfigError('too many dates, emoji or signature characters to fit in one link')
+    return token
+
+
+def _wide_codes(inline_count):
+    """True when the highest emoji code no longer fits in a nibble."""
+    return len(EMOJI_TABLE) + inline_count > 0xF
+
+
+def _pack_codes(codes, wide):
+    """Emoji codes as bytes (``wide``) or nibbles padded to a byte."""
+    if wide:
+        return bytes(codes)
+    if len(codes) % 2:
+        codes = codes + [0]
+    return bytes(codes[i] << 4 | codes[i + 1] for i in range(0, len(codes), 2))
+
+
+# --- Decoding ---
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def take(self, n):
+        end = self.pos + n
+        if end > len(self.data):
+            raise ConfigError('config token is truncated')
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def byte(self):
+        return self.take(1)[0]
+
+    def uint(self, n):
+        return int.from_bytes(self.take(n), 'big')
+
+    def text(self, limit):
+        n = self.byte()
+        if n > limit:
+            raise ConfigError('config token field too long')
+        try:
+            return self.take(n).decode('utf-8')
+        except UnicodeDecodeError:
+            raise ConfigError('config token has invalid text') from None
+
+
+def _unpack_codes(r, count, wide):
+    if wide:
+        return list(r.take(count))
+    return [n for b in r.take((count + 1) // 2) for n in (b >> 4, b & 0xF)][:count]
+
+
+def decode_config(token):
+    """Parses a ``c=`` token into a GridConfig; raises ConfigError on anything malformed."""
+    if not token or len(token) > MAX_TOKEN_CHARS or len(token) % 4 == 1:
+        raise ConfigError('config token has an invalid length')
+    if not _TOKEN_RE.fullmatch(token):
+        raise ConfigError('config token is not base64url')
+    data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+
+    r = _Reader(data)
+    head = r.byte()
+    version, flags = head >> 4, head & 0xF
+    if version not in (VERSION, VERSION_EMOJI_TABLE):
+        raise ConfigError(f'unsupported config token version {version}')
+    if flags & ~KNOWN_FLAGS:
+        raise ConfigError('config token has unknown flags')
+
+    packed = r.byte()
+    mode, theme, bar_style = packed & 0x7, packed >> 3 & 0x3, packed >> 5 & 0x3
+    if packed & 0x80 or mode >= len(MODES) or theme >= len(THEME_NAMES) or bar_style >= len(BAR_STYLES):
+        raise ConfigError('config token has an unknown enum value')
+    config = GridConfig(theme=THEME_NAMES[theme], mode=MODES[mode], bar_style=BAR_STYLES[bar_style],
+                        highlight_weekends=bool(flags & FLAG_WEEKENDS))
+
+    if flags & FLAG_BITSET:
+        bits = r.take(BITSET_BYTES)
+        indexes = [i for i in range(366) if bits[i >> 3] & (0x80 >> (i & 7))]
+        if bits[-1] & 0x03:
+            raise ConfigError('config token sets days past the end of the year')
+    else:
+        indexes = [r.uint(2) for _ in range(r.byte())]
+        if any(i > 365 for i in indexes) or indexes != sorted(set(indexes)):
+            raise ConfigError('config token has invalid dates')
+
+    if version == VERSION_EMOJI_TABLE:
+        inline = [r.text(MAX_INLINE_EMOJI_BYTES) for _ in range(r.byte())]
+        if not inline:
+            raise ConfigError('config token has an empty emoji table')
+        emoji_table = EMOJI_TABLE + inline
+        codes = _unpack_codes(r, len(indexes), _wide_codes(len(inline)))
+    else:
+        emoji_table = EMOJI_TABLE
+        codes = _unpack_codes(r, len(indexes), False)
+    for index, n in zip(indexes, codes):
+        if version == VERSION and n == EMOJI_INLINE:
+            emoji = r.text(MAX_INLINE_EMOJI_BYTES)
+        elif n:
+            if n > len(emoji_table):
+                raise ConfigError('config token has an unknown emoji')
+            emoji = emoji_table[n - 1]
+        else:
+            emoji = None
+        config.special_dates[_MONTH_DAY[index]] = emoji
+
+    if flags & FLAG_SIGNATURE:
+        config.signature = r.text(MAX_SIGNATURE_BYTES)
+
+    if config.mode == 'life':
+        try:
+            config.birthdate = datetime.date.fromordinal(EPOCH + r.uint(3))
+        except ValueError:
+            raise ConfigError('config token has an invalid birthdate') from None
+        config.lifespan = r.byte()
+        if not 1 <= config.lifespan <= MAX_LIFESPAN:
+            raise ConfigError('config token has an invalid lifespan')
+    elif config.mode == 'years':
+        first, span = r.uint(2), r.byte()
+        if span >= MAX_YEAR_SPAN or (first == 0 and span) or first + span > 9998:
+            raise ConfigError('config token has an invalid year range')
+        if first:
+            config.year_from, config.year_to = first, first + span
+
+    if flags & FLAG_COLORS:
+        which = r.byte()
+        if not which or which & ~(COLOR_ACCENT | COLOR_BG):
+            raise ConfigError('config token has invalid colours')
+        if which & COLOR_ACCENT:
+            config.accent = tuple(r.take(3))
+        if which & COLOR_BG:
+            config.bg = tuple(r.take(3))
+
+    if r.pos != len(data):
+        raise ConfigError('config token has trailing bytes')
+    return config
@@ -0,0 +1,222 @@
+"""Request parameters parsed into a ``GridConfig`` (no Pillow here)."""
+import datetime
+from dataclasses import dataclass, field
+
+IST_OFFSET = datetime.timedelta(hours=5, minutes=30)
+
+THEME_NAMES = ('dark', 'light')
+MODES = ('year', 'segregated_months', 'quarter', 'month', 'fortnight', 'life', 'years')
+BAR_STYLES = ('segmented', 'solid', 'minimal')
+# Images one request can ask for: the wallpaper itself and its dimmed home-screen companion
+VARIANTS = ('lock', 'home')
+# Spans /api/archive covers, from today to the end of the current one
+PERIODS = ('week', 'month', 'quarter')
+
+# Long-horizon modes
+DEFAULT_LIFESPAN = 90
+MAX_LIFESPAN = 100
+# Config tokens store the birthdate as days since this date
+MIN_BIRTHDATE = datetime.date(1900, 1, 1)
+MAX_YEAR_SPAN = 15
+DEFAULT_YEAR_SPAN = 5
+
+# Input bounds: every accepted request must be cheap to render
+MAX_DATES_PARAM_CHARS = 4096
+MAX_DATE_ENTRIES = 366
+MAX_DISTINCT_EMOJI = 16
+MAX_EMOJI_CHARS = 8
+MAX_SIGNATURE_CHARS = 40
+
+
+class ConfigError(ValueError):
+    """A request described a wallpaper that cannot be rendered (answered with a 400)."""
+
+
+def ist_now():
+    """Current wall-clock time in IST, which is what every wallpaper is rendered for."""
+    return datetime.datetime.now(datetime.timezone.utc) + IST_OFFSET
+
+
+def seconds_until_midnight(now):
+    """Seconds from the IST datetime ``now`` until the wallpaper next changes (at least 1)."""
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), now.tzinfo)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+@dataclass
+class GridConfig:
+    theme: str = 'dark'
+    mode: str = 'year'
+    bar_style: str = 'segmented'
+    highlight_weekends: bool = False
+    signature: str = ''
+    # (month, day) -> emoji or None, in the order they were given
+    special_dates: dict = field(default_factory=dict)
+    # life mode
+    birthdate: datetime.date = None
+    lifespan: int = DEFAULT_LIFESPAN
+    # years mode (inclusive); None means "starting this year"
+    year_from: int = None
+    year_to: int = None
+    # Custom colours over the theme, as (r, g, b); None keeps the theme's
+    accent: tuple = None
+    bg: tuple = None
+
+
+def parse_dates(dates_param):
+    """Parses ``MM-DD|emoji,...`` into an ordered {(month, day): emoji} dict, skipping junk.
+
+    Raises ConfigError when the list is longer than any real year needs.
+    """
+    special_dates = {}
+    if not dates_param:
+        return special_dates
+    if len(dates_param) > MAX_DATES_PARAM_CHARS:
+        raise ConfigError('dates parameter is too long')
+    items = dates_param.split(',')
+    if len(items) > MAX_DATE_ENTRIES:
+        raise ConfigError(f'at most {MAX_DATE_ENTRIES} dates are allowed')
+    for item in items:
+        if '|' in item:
+            d_str, emoji = item.split('|', 1)
+        else:
+            d_str, emoji = item, None
+        parts = d_str.strip().split('-')
+        if len(parts) != 2:
+            continue
+        try:
+            m, d = int(parts[0]), int(parts[1])
+            # Leap year so 02-29 survives; non-leap years drop it at layout time
+            datetime.date(2000, m, d)
+        except ValueError:
+            continue
+        special_dates[(m, d)] = emoji or None
+    return special_dates
+
+
+def parse_birthdate(value):
+    """An ISO date, or None if ``value`` is not one; raises ConfigError before ``MIN_BIRTHDATE``."""
+    try:
+        birthdate = datetime.date.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        return None
+    if birthdate < MIN_BIRTHDATE:
+        raise ConfigError(f'birthdate must be {MIN_BIRTHDATE.isoformat()} or later')
+    return birthdate
+
+
+def parse_year_range(value):
+    """Parses ``YYYY-YYYY`` (or a single ``YYYY``) into an ordered pair, or (None, None)."""
+    try:
+        parts = [int(p) for p in value.split('-')]
+    except (AttributeError, ValueError):
+        return None, None
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2:
+        return None, None
+    start, end = sorted(parts)
+    if not 1 <= start <= 9998 or not 1 <= end <= 9998:
+        return None, None
+    return start, min(end, start + MAX_YEAR_SPAN - 1)
+
+
+def parse_hex_color(value):
+    """Parses ``RRGGBB`` or ``RGB`` (``#`` optional) into an (r, g, b) tuple, or None."""
+    value = (value or '').strip().lstrip('#')
+    if len(value) == 3:
+        value = ''.join(ch * 2 for ch in value)
+    if len(value) != 6:
+        return None
+    try:
+        return tuple(bytes.fromhex(value))
+    except ValueError:
+        return None
+
+
+def parse_variants(args):
+    """Parses ``variants=lock,home`` into an ordered tuple of distinct variants (default: lock)."""
+    value = args.get('variants', 'lock')
+    variants = tuple(dict.fromkeys(v.strip() for v in value.split(',') if v.strip()))
+    if not variants or any(v not in VARIANTS for v in variants):
+        raise ConfigError(f"variants must be a list of {', '.join(VARIANTS)}")
+    return variants
+
+
+def parse_period(args):
+    """Parses ``period=`` for /api/archive (default: month)."""
+    period = args.get('period', 'month')
+    if period not in PERIODS:
+        raise ConfigError(f"period must be one of {', '.join(PERIODS)}")
+    return period
+
+
+def period_days(today, period):
+    """``today`` and every later day of its week (Monday first), month or quarter."""
+    if period == 'week':
+        last = today + datetime.timedelta(days=6 - today.weekday())
+    else:
+        month = today.month if period == 'month' else (today.month - 1) // 3 * 3 + 3
+        last = datetime.date(today.year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return [today + datetime.timedelta(days=n) for n in range((last - today).days + 1)]
+
+
+def check_limits(config):
+    """Raises ConfigError if ``config`` is over the input bounds (checked before any drawing)."""
+    if len(config.signature) > MAX_SIGNATURE_CHARS:
+        raise ConfigError(f'signature is limited to {MAX_SIGNATURE_CHARS} characters')
+    emoji = {e for e in config.special_dates.values() if e}
+    if len(emoji) > MAX_DISTINCT_EMOJI:
+        raise ConfigError(f'at most {MAX_DISTINCT_EMOJI} different emoji are allowed')
+    for e in emoji:
+        # Every emoji is a CDN fetch by codepoint; text and whitespace never resolve
+        if len(e) > MAX_EMOJI_CHARS or e.isascii() or any(ch.isspace() for ch in e):
+            raise ConfigError('dates contain an invalid emoji')
+    # Every accepted config needs a token: it is the canonical URL and the render cache key
+    from _grid.codec import encode_config
+    encode_config(config)
+
+
+def parse_config(args):
+    """Builds a GridConfig from a ``c=`` token or plain query args.
+
+    Plain args fall back to defaults like the old inline parser did; a
+    malformed token, or anything over the input bounds, raises ConfigError.
+    """
+    if 'c' in args:
+        from _grid.codec import decode_config
+        config = decode_config(args['c'])
+        check_limits(config)
+        return config
+
+    config = GridConfig(
+        theme=args.get('theme', 'dark'),
+        mode=args.get('mode', 'year'),
+        bar_style=args.get('bar_style', 'segmented'),
+        highlight_weekends=args.get('highlight_weekends', 'false') == 'true',
+        signature=args.get('signature', ''),
+        special_dates=parse_dates(args.get('dates', '')),
+        accent=parse_hex_color(args.get('accent')),
+        bg=parse_hex_color(args.get('bg')),
+    )
+    # Unknown values used to render as the defaults; normalize so they share a cache key
+    if config.theme not in THEME_NAMES:
+        config.theme = 'dark'
+    if config.mode not in MODES:
+        config.mode = 'year'
+    if config.bar_style not in BAR_STYLES:
+        config.bar_style = 'segmented'
+
+    if config.mode == 'life':
+        config.birthdate = parse_birthdate(args.get('birthdate'))
+        try:
+            config.lifespan = min(max(int(args.get('lifespan', DEFAULT_LIFESPAN)), 1), MAX_LIFESPAN)
+        except ValueError:
+            config.lifespan = DEFAULT_LIFESPAN
+        # Without a birthdate there is no life to draw
+        if config.birthdate is None:
+            config.mode = 'year'
+    elif config.mode == 'years':
+        config.year_from, config.year_to = parse_year_range(args.get('years'))
+    check_limits(config)
+    return config
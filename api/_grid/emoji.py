@@ -0,0 +1,64 @@
+"""Twemoji download helper (Pillow is only imported once an image is fetched)."""
+import collections
+import io
+import threading
+import time
+import urllib.request
+
+from _grid.settings import EMOJI_BASE_URL, EMOJI_CACHE_SIZE, EMOJI_FETCH_TIMEOUT, EMOJI_RETRY_AFTER, EMOJI_SHARED_TTL
+from _grid.store import shared_store
+
+# --- Helper: Fetch Emoji Image ---
+# Both bounded: a stream of made-up emoji must not grow the process
+emoji_cache = collections.OrderedDict()
+emoji_failures = collections.OrderedDict()  # emoji -> time of the failed download
+_lock = threading.Lock()
+
+def _remember(cache, key, value):
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > EMOJI_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def emoji_url(emoji_char):
+    """Twemoji PNG URL for an emoji (e.g. 🍰 -> .../1f370.png)."""
+    codepoint = "-".join([f"{ord(c):x}" for c in emoji_char if ord(c) != 0xfe0f])
+    return f"{EMOJI_BASE_URL}/{codepoint}.png"
+
+def get_emoji_image(emoji_char):
+    """Downloads the PNG representation of an emoji from Twemoji CDN.
+
+    The downloaded PNG is shared through the shared store, if any, so
+    other instances skip the CDN. Failures are remembered for
+    EMOJI_RETRY_AFTER seconds so a bad emoji costs one fetch, not one per request.
+    """
+    with _lock:
+        if emoji_char in emoji_cache:
+            emoji_cache.move_to_end(emoji_char)
+            return emoji_cache[emoji_char]
+        failed_at = emoji_failures.get(emoji_char)
+    if failed_at is not None and time.monotonic() - failed_at < EMOJI_RETRY_AFTER:
+        return None
+    
+    from PIL import Image
+
+    url = emoji_url(emoji_char)
+    try:
+        shared = shared_store.get(f'emoji:{url}') if shared_store else None
+        data = shared
+        if data is None:
+            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+
+            with urllib.request.urlopen(req, timeout=EMOJI_FETCH_TIMEOUT) as response:
+                data = response.read()
+        img = Image.open(io.BytesIO(data)).convert("RGBA")
+        # Only decodable downloads are shared
+        if shared is None and shared_store:
+            shared_store.set(f'emoji:{url}', data, EMOJI_SHARED_TTL)
+        _remember(emoji_cache, emoji_char, img)
+        return img
+    except Exception as e:
+        print(f"Failed to download emoji {emoji_char}: {e}")
+        _remember(emoji_failures, emoji_char, time.monotonic())
+        return None
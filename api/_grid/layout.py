@@ -0,0 +1,398 @@
+"""Wallpaper geometry: where every dot, label and bar goes (no Pillow here).
+
+Days are handled as proleptic ordinals instead of ``datetime`` objects so a
+5,000-dot view costs a few list operations rather than 5,000 date iterations.
+"""
+import calendar
+import datetime
+
+from _grid.config import DEFAULT_YEAR_SPAN
+from _grid.settings import DOT_PADDING, DOT_RADIUS, GRID_COLS, GRID_ROWS, IMAGE_HEIGHT, IMAGE_WIDTH
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# Vertical band long-horizon views fit into: below the clock, above the footer
+LONG_VIEW_TOP = 640
+LONG_VIEW_BOTTOM = 2180
+LONG_VIEW_MARGIN_X = 60
+LIFE_WEEKS_PER_ROW = 52
+YEAR_LABEL_HEIGHT = 50
+YEAR_BLOCK_GAP = 10
+
+# Footer: the "Nd left" line sits below the dots, the bar below that, the signature last
+FOOTER_TEXT_GAP = 80
+BAR_GAP = 60
+BAR_WIDTH = 600
+BAR_BLOCKS = 10
+BAR_BLOCK_GAP = 12
+
+
+class DotGrid:
+    """A rectangular block of dots; ``cells[row][col]`` is a palette key or None for an empty slot."""
+
+    __slots__ = ('x', 'y', 'size', 'pitch_x', 'pitch_y', 'cells', 'emoji')
+
+    def __init__(self, x, y, size, pitch_x, pitch_y, cells, emoji=None):
+        self.x = x
+        self.y = y
+        self.size = size
+        self.pitch_x = pitch_x
+        self.pitch_y = pitch_y
+        self.cells = cells
+        # (row, col) -> emoji drawn instead of the dot
+        self.emoji = emoji or {}
+
+    @property
+    def count(self):
+        return sum(1 for row in self.cells for c in row if c is not None)
+
+    def cell_origin(self, row, col):
+        return self.x + col * self.pitch_x, self.y + row * self.pitch_y
+
+
+class Layout:
+    """Everything the renderer needs, resolved for one config on one day."""
+
+    __slots__ = ('grids', 'labels', 'bottom_text', 'progress_ratio', 'grid_bottom_y', 'sig_gap',
+                 'footer_y', 'bar', 'signature_y')
+
+    def __init__(self):
+        self.grids = []
+        # (text, x, y, palette key), drawn with the small font
+        self.labels = []
+        self.bottom_text = ''
+        self.progress_ratio = 0
+        self.grid_bottom_y = 0
+        self.sig_gap = 120
+        # Set by place_footer: top of the bottom text, bar rectangles, top of the signature
+        self.footer_y = 0
+        self.bar = []
+        self.signature_y = 0
+
+
+# --- Day classification ---
+def special_ordinals(config, year):
+    """Maps the config's MM-DD entries onto ``year`` as {ordinal: emoji}."""
+    result = {}
+    for (m, d), emoji in config.special_dates.items():
+        try:
+            result[datetime.date(year, m, d).toordinal()] = emoji
+        except ValueError:
+            pass
+    return result
+
+
+def classify_days(start, count, today, specials, highlight_weekends):
+    """Returns (palette keys, {index: emoji}) for ``count`` consecutive day ordinals from ``start``.
+
+    Same precedence as the original per-day loop: special > today > passed >
+    weekend > inactive.
+    """
+    passed = min(max(today - start, 0), count)
+    keys = ['PASSED'] * passed + ['INACTIVE'] * (count - passed)
+    if highlight_weekends:
+        # date.fromordinal(1) is a Monday, so weekday == (ordinal - 1) % 7
+        for weekday in (5, 6):
+            offset = (weekday - (start - 1)) % 7
+            # Past weekends stay PASSED, so start at the first one from today on
+            first = offset + max(0, -(-(passed - offset) // 7)) * 7
+            for i in range(first, count, 7):
+                keys[i] = 'WEEKEND'
+    if 0 <= today - start < count:
+        keys[today - start] = 'ACTIVE'
+    emoji = {}
+    for ordinal, char in specials.items():
+        i = ordinal - start
+        if 0 <= i < count:
+            keys[i] = 'SPECIAL'
+            if char:
+                emoji[i] = char
+    return keys, emoji
+
+
+def fill_rows(keys, emoji, cols, rows, offset=0):
+    """Pours a flat run of keys into a rows x cols matrix, row-major, starting at slot ``offset``."""
+    cells = [[None] * cols for _ in range(rows)]
+    placed = {}
+    for i, key in enumerate(keys):
+        slot = i + offset
+        r, c = divmod(slot, cols)
+        if r >= rows:
+            break
+        cells[r][c] = key
+        if i in emoji:
+            placed[(r, c)] = emoji[i]
+    return cells, placed
+
+
+def fill_columns(keys, emoji, rows, cols, offset=0):
+    """Like fill_rows but column-major (weeks as columns, weekdays as rows)."""
+    cells = [[None] * cols for _ in range(rows)]
+    placed = {}
+    for i, key in enumerate(keys):
+        c, r = divmod(i + offset, rows)
+        if c >= cols:
+            break
+        cells[r][c] = key
+        if i in emoji:
+            placed[(r, c)] = emoji[i]
+    return cells, placed
+
+
+def year_stats(today, year):
+    """(days passed including today, total days) for ``year``, clamped like the original."""
+    start = datetime.date(year, 1, 1).toordinal()
+    total = 366 if calendar.isleap(year) else 365
+    passed = min(max(today - start + 1, 0), total)
+    return passed, total
+
+
+# --- Modes ---
+def layout_segregated_months(layout, config, now, today):
+    COLS = 3
+    MONTH_DOT_RADIUS = 12
+    MONTH_DOT_PADDING = 10
+    MINI_GRID_COLS = 7
+    BLOCK_WIDTH = (MONTH_DOT_RADIUS * 2 * MINI_GRID_COLS) + (MONTH_DOT_PADDING * (MINI_GRID_COLS - 1))
+    BLOCK_GAP_X = 150
+    TOTAL_CONTENT_WIDTH = (COLS * BLOCK_WIDTH) + ((COLS - 1) * BLOCK_GAP_X)
+    START_X_GLOBAL = (IMAGE_WIDTH - TOTAL_CONTENT_WIDTH) // 2
+    START_Y_GLOBAL = 750  # Lowered to clear the clock area
+    ROW_HEIGHT_STEP = 340
+    pitch = MONTH_DOT_RADIUS * 2 + MONTH_DOT_PADDING
+
+    year = now.year
+    specials = special_ordinals(config, year)
+    for m in range(1, 13):
+        idx = m - 1
+        month_start_x = START_X_GLOBAL + (idx % COLS) * (BLOCK_WIDTH + BLOCK_GAP_X)
+        month_start_y = START_Y_GLOBAL + (idx // COLS) * ROW_HEIGHT_STEP
+        layout.labels.append((MONTH_NAMES[idx], month_start_x, month_start_y - 60, 'INACTIVE'))
+
+        days_in_month = calendar.monthrange(year, m)[1]
+        keys, emoji = classify_days(datetime.date(year, m, 1).toordinal(), days_in_month, today,
+                                    specials, config.highlight_weekends)
+        rows = -(-days_in_month // MINI_GRID_COLS)
+        cells, placed = fill_rows(keys, emoji, MINI_GRID_COLS, rows)
+        layout.grids.append(DotGrid(month_start_x, month_start_y, MONTH_DOT_RADIUS * 2, pitch, pitch, cells, placed))
+
+    layout.grid_bottom_y = START_Y_GLOBAL + (3 * ROW_HEIGHT_STEP) + 220
+    layout.sig_gap = 200  # Push it lower specifically for this mode
+    passed, total = year_stats(today, year)
+    layout.bottom_text = f"{total - passed}d left in year"
+    layout.progress_ratio = passed / total
+
+
+def layout_single_grid(layout, config, now, today):
+    """Year, Quarter, Month and Fortnight: one grid of days."""
+    mode = config.mode
+    year = now.year
+    grid_cols, grid_rows = GRID_COLS, GRID_ROWS
+    dot_radius, dot_spacing = DOT_RADIUS, DOT_PADDING
+
+    if mode == 'month':
+        start_date = datetime.date(year, now.month, 1)
+        end_date = datetime.date(year, now.month, calendar.monthrange(year, now.month)[1])
+        grid_cols, grid_rows = 7, 5
+        dot_radius, dot_spacing = 35, 45
+        range_text = now.strftime("%b")
+    elif mode == 'quarter':
+        q = (now.month - 1) // 3 + 1
+        start_month = (q - 1) * 3 + 1
+        start_date = datetime.date(year, start_month, 1)
+        end_date = datetime.date(year, start_month + 2, calendar.monthrange(year, start_month + 2)[1])
+        grid_cols, grid_rows = 10, 10
+        dot_radius, dot_spacing = 25, 25
+        range_text = f"Q{q}"
+    elif mode == 'fortnight':
+        start_date = now.date() - datetime.timedelta(days=now.weekday())
+        end_date = start_date + datetime.timedelta(days=13)
+        grid_cols, grid_rows = 7, 2
+        dot_radius, dot_spacing = 45, 50
+        range_text = "period"
+    else:  # Year (Default Single Grid)
+        start_date = datetime.date(year, 1, 1)
+        end_date = datetime.date(year, 12, 31)
+        range_text = "year"
+
+    size = dot_radius * 2
+    total_grid_w = (grid_cols * size) + ((grid_cols - 1) * dot_spacing)
+    total_grid_h = (grid_rows * size) + ((grid_rows - 1) * dot_spacing)
+    start_x = (IMAGE_WIDTH - total_grid_w) // 2
+    start_y = (IMAGE_HEIGHT // 2) - (total_grid_h // 2)
+    if mode == 'year':
+        start_y += 150
+    if start_y < 200:
+        start_y = 200
+
+    start = start_date.toordinal()
+    count = end_date.toordinal() - start + 1
+    # Specials are pinned to the current year, so a fortnight spilling into January skips them
+    keys, emoji = classify_days(start, count, today, special_ordinals(config, year), config.highlight_weekends)
+    cells, placed = fill_rows(keys, emoji, grid_cols, grid_rows)
+    pitch = size + dot_spacing
+    layout.grids.append(DotGrid(start_x, start_y, size, pitch, pitch, cells, placed))
+    layout.grid_bottom_y = start_y + total_grid_h
+
+    passed = min(max(today - start + 1, 0), count)
+    layout.bottom_text = f"{count - passed}d left in {range_text}"
+    layout.progress_ratio = passed / count
+
+
+def same_day_in_year(d, year):
+    """``d`` moved to ``year``; Feb 29 becomes Feb 28 outside leap years."""
+    try:
+        return d.replace(year=year)
+    except ValueError:
+        return d.replace(year=year, day=28)
+
+
+def life_week(birthdate, d):
+    """(year of life, week within that year) containing date ``d``; weeks restart on each birthday."""
+    age = d.year - birthdate.year
+    if (d.month, d.day) < (birthdate.month, birthdate.day):
+        age -= 1
+    last_birthday = same_day_in_year(birthdate, birthdate.year + age)
+    week = min((d - last_birthday).days // 7, LIFE_WEEKS_PER_ROW - 1)
+    return age, week
+
+
+def layout_life(layout, config, now, today):
+    """Life in weeks: one row per year of life, 52 weeks per row."""
+    rows, cols = config.lifespan, LIFE_WEEKS_PER_ROW
+    band = LONG_VIEW_BOTTOM - LONG_VIEW_TOP
+    pitch = min(band // rows, (IMAGE_WIDTH - 2 * LONG_VIEW_MARGIN_X) // cols)
+    size = max(2, round(pitch * 0.7))
+    grid_w = (cols - 1) * pitch + size
+    grid_h = (rows - 1) * pitch + size
+    start_x = (IMAGE_WIDTH - grid_w) // 2
+    start_y = LONG_VIEW_TOP + (band - grid_h) // 2
+
+    total = rows * cols
+    if now.date() < config.birthdate:
+        lived = 0
+    else:
+        age, week = life_week(config.birthdate, now.date())
+        lived = min(age * cols + week, total)
+    keys = ['PASSED'] * lived + ['INACTIVE'] * (total - lived)
+    if lived < total:
+        keys[lived] = 'ACTIVE'
+
+    emoji = {}
+    for (m, d), char in config.special_dates.items():
+        try:
+            day = datetime.date(now.year, m, d)
+        except ValueError:
+            continue
+        if day < config.birthdate:
+            continue
+        age, week = life_week(config.birthdate, day)
+        i = age * cols + week
+        if i < total:
+            keys[i] = 'SPECIAL'
+            if char:
+                emoji[i] = char
+
+    cells, placed = fill_rows(keys, emoji, cols, rows)
+    layout.grids.append(DotGrid(start_x, start_y, size, pitch, pitch, cells, placed))
+    layout.grid_bottom_y = start_y + grid_h
+    layout.bottom_text = f"{total - lived}w left in life"
+    layout.progress_ratio = lived / total
+
+
+def layout_years(layout, config, now, today):
+    """Multi-year range: one contribution-graph block (weeks x weekdays) per year."""
+    year_from = config.year_from or now.year
+    year_to = config.year_to or year_from + DEFAULT_YEAR_SPAN - 1
+    years = list(range(year_from, year_to + 1))
+    cols = 54  # a leap year starting on Sunday touches 54 week columns
+
+    band = LONG_VIEW_BOTTOM - LONG_VIEW_TOP
+    block_h = band // len(years)
+    pitch = min((IMAGE_WIDTH - 2 * LONG_VIEW_MARGIN_X) // cols, (block_h - YEAR_LABEL_HEIGHT - YEAR_BLOCK_GAP) // 7)
+    pitch = max(pitch, 3)
+    size = max(2, round(pitch * 0.75))
+    grid_w = (cols - 1) * pitch + size
+    start_x = (IMAGE_WIDTH - grid_w) // 2
+    step = YEAR_LABEL_HEIGHT + 7 * pitch + YEAR_BLOCK_GAP
+    start_y = LONG_VIEW_TOP + (band - step * len(years)) // 2
+
+    total = passed = 0
+    for i, year in enumerate(years):
+        block_y = start_y + i * step
+        layout.labels.append((str(year), start_x, block_y, 'INACTIVE'))
+        first = datetime.date(year, 1, 1).toordinal()
+        count = 366 if calendar.isleap(year) else 365
+        keys, emoji = classify_days(first, count, today, special_ordinals(config, year), config.highlight_weekends)
+        cells, placed = fill_columns(keys, emoji, 7, cols, offset=(first - 1) % 7)
+        layout.grids.append(DotGrid(start_x, block_y + YEAR_LABEL_HEIGHT, size, pitch, pitch, cells, placed))
+        total += count
+        passed += min(max(today - first + 1, 0), count)
+
+    layout.grid_bottom_y = start_y + step * len(years) - YEAR_BLOCK_GAP
+    layout.bottom_text = f"{total - passed}d left in {year_from}-{year_to}"
+    layout.progress_ratio = passed / total
+
+
+def label_values(today, days=1):
+    """Footer labels the calendar modes show on ``today`` and the ``days - 1`` days after it."""
+    labels = []
+    for day in (today + datetime.timedelta(days=i) for i in range(days)):
+        year = day.year
+        month_end = datetime.date(year, day.month, calendar.monthrange(year, day.month)[1])
+        q = (day.month - 1) // 3 + 1
+        quarter_end = datetime.date(year, q * 3, calendar.monthrange(year, q * 3)[1])
+        labels += [
+            f"{(datetime.date(year, 12, 31) - day).days}d left in year",
+            f"{(month_end - day).days}d left in {day.strftime('%b')}",
+            f"{(quarter_end - day).days}d left in Q{q}",
+            f"{13 - day.weekday()}d left in period",
+        ]
+    return labels
+
+
+def bar_shapes(bar_style, progress_ratio, x, y):
+    """The progress bar as ``(x0, y0, x1, y1, radius, palette key)`` rectangles, plus its height."""
+    if bar_style in ('solid', 'minimal'):
+        height, radius = (20, 10) if bar_style == 'solid' else (6, 3)
+        shapes = [(x, y, x + BAR_WIDTH, y + height, radius, 'INACTIVE')]
+        fill_width = int(BAR_WIDTH * progress_ratio)
+        if fill_width > 0:
+            shapes.append((x, y, x + fill_width, y + height, radius, 'ACTIVE'))
+        return shapes, height
+
+    height = 20
+    block_width = (BAR_WIDTH - ((BAR_BLOCKS - 1) * BAR_BLOCK_GAP)) / BAR_BLOCKS
+    filled_blocks = int(progress_ratio * BAR_BLOCKS)
+    # Ensure at least one block is filled if any time passed
+    if progress_ratio > 0 and filled_blocks == 0:
+        filled_blocks = 1
+    shapes = []
+    for i in range(BAR_BLOCKS):
+        x1 = x + i * (block_width + BAR_BLOCK_GAP)
+        shapes.append((x1, y, x1 + block_width, y + height, 8, 'ACTIVE' if i < filled_blocks else 'INACTIVE'))
+    return shapes, height
+
+
+def place_footer(layout, config):
+    """Positions the bottom text, progress bar and signature under the dots."""
+    layout.footer_y = layout.grid_bottom_y + FOOTER_TEXT_GAP
+    bar_y = layout.footer_y + BAR_GAP
+    layout.bar, bar_height = bar_shapes(config.bar_style, layout.progress_ratio, (IMAGE_WIDTH - BAR_WIDTH) / 2, bar_y)
+    layout.signature_y = bar_y + bar_height + layout.sig_gap
+
+
+def build_layout(config, now):
+    """Resolves ``config`` for the IST datetime ``now``."""
+    layout = Layout()
+    today = now.date().toordinal()
+    if config.mode == 'segregated_months':
+        layout_segregated_months(layout, config, now, today)
+    elif config.mode == 'life':
+        layout_life(layout, config, now, today)
+    elif config.mode == 'years':
+        layout_years(layout, config, now, today)
+    else:
+        layout_single_grid(layout, config, now, today)
+    place_footer(layout, config)
+    return layout
@@ -0,0 +1,98 @@
+"""Admission control for renders (no Pillow here).
+
+Cache hits are never limited; only requests that have to draw take a slot.
+When every slot stays busy for RENDER_SLOT_WAIT seconds the request is shed
+with a 503 instead of queueing behind work it cannot overtake. Misses for a
+wallpaper that is already being drawn take no slot either: they wait up to
+RENDER_COALESCE_WAIT seconds for that render (``RenderFlights``).
+"""
+import concurrent.futures
+import contextlib
+import threading
+import time
+
+from _grid.settings import RENDER_COALESCE_WAIT, RENDER_RETRY_AFTER, RENDER_SLOT_WAIT, RENDER_SLOTS
+
+
+class Overloaded(Exception):
+    """No render slot freed up in time (answered with a 503 and Retry-After)."""
+
+    def __init__(self, retry_after):
+        super().__init__('renderer is busy, try again shortly')
+        self.retry_after = retry_after
+
+
+class RenderSlots:
+    """Bounded number of renders in flight, with counters for the harnesses."""
+
+    def __init__(self, slots, wait, retry_after):
+        self.slots = slots
+        self.wait = wait
+        self.retry_after = retry_after
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self.admitted = 0
+        self.shed = 0
+
+    def acquire(self):
+        """Takes a slot or raises Overloaded; pair with ``release`` (streamed responses)."""
+        if not self._semaphore.acquire(timeout=self.wait):
+            self.shed += 1
+            raise Overloaded(self.retry_after)
+        self.admitted += 1
+
+    def release(self):
+        self._semaphore.release()
+
+    @contextlib.contextmanager
+    def hold(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class RenderFlights:
+    """Renders in flight by key, so concurrent misses for one wallpaper share a single render.
+
+    The first miss leads: it renders and ``land``s the result. Misses that
+    arrive meanwhile get the leader's future and wait on it (``result`` from
+    a thread, ``asyncio.wrap_future`` on a loop); None means the leader
+    failed and they render for themselves. A flight older than ``wait`` is
+    presumed lost (its client went away) and the next miss leads a new one.
+    """
+
+    def __init__(self, wait):
+        self.wait = wait
+        self._flights = {}  # key -> (future, monotonic start)
+        self._lock = threading.Lock()
+        self.led = 0
+        self.coalesced = 0
+
+    def join(self, key):
+        """(future, True) for a new flight's leader, (the flight's future, False) for a follower."""
+        now = time.monotonic()
+        with self._lock:
+            future, started = self._flights.get(key, (None, 0))
+            if future is not None and now - started < self.wait:
+                self.coalesced += 1
+                return future, False
+            future = concurrent.futures.Future()
+            self._flights[key] = (future, now)
+            self.led += 1
+            return future, True
+
+    def land(self, key, future, result):
+        """Ends the flight of ``future``, handing ``result`` (None for a failed render) to its followers."""
+        with self._lock:
+            if self._flights.get(key, (None,))[0] is future:
+                del self._flights[key]
+            if not future.done():
+                future.set_result(result)
+
+    def __len__(self):
+        return len(self._flights)
+
+
+render_slots = RenderSlots(RENDER_SLOTS, RENDER_SLOT_WAIT, RENDER_RETRY_AFTER)
+render_flights = RenderFlights(RENDER_COALESCE_WAIT)
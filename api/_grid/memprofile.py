@@ -0,0 +1,245 @@
+"""Opt-in memory instrumentation for renders (no Pillow here).
+
+With ``GRID_MEMORY_PROFILE=1`` the process runs under ``tracemalloc`` and
+every render is accounted as two peaks above what the process held when
+it started, overall and for the high-water mark reached during each stage
+(``emoji``: download and resize, ``draw``: canvas, dots and text,
+``encode``: the PNG):
+
+* ``heap``: Python allocations traced by ``tracemalloc`` (PNG buffers,
+  ``tobytes`` copies, downloaded emoji bytes)
+* ``rss``: growth of the resident set high-water mark, which also sees
+  Pillow's image buffers (allocated outside Python's allocator) and is
+  what an OOM kill is about; Linux only, reset through
+  ``/proc/self/clear_refs``
+
+Both peaks are process-wide, so profiled renders take turns on one lock to
+keep them attributable; the mode is for diagnosing a staging or canary
+instance, not for regular traffic. Renders whose larger peak exceeds
+``GRID_MEMORY_LOG_THRESHOLD`` bytes are logged with their parameter mix,
+and ``report`` (behind ``/api/memory``) aggregates them per mode and per
+mix next to the top allocation sites and the size of every cache.
+"""
+import collections
+import contextlib
+import sys
+import threading
+import tracemalloc
+
+from _grid.settings import MEMORY_LOG_THRESHOLD, MEMORY_PROFILE, MEMORY_PROFILE_FRAMES, MEMORY_RECENT
+
+MB = 1024 * 1024
+
+# Allocations the profiler makes for itself, left out of snapshots
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_render_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+recent = collections.deque(maxlen=MEMORY_RECENT)
+by_mode = {}
+by_mix = {}
+over_threshold = 0
+
+
+def start():
+    """Starts tracing if profiling is on; a no-op otherwise or when already tracing."""
+    if MEMORY_PROFILE and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_PROFILE_FRAMES)
+
+
+def parameter_mix(config, variants):
+    """What drives a render's memory, as a short label: mode, theme, variants and extras."""
+    parts = [config.mode, config.theme if config.bg is None and config.accent is None else 'custom', '+'.join(variants)]
+    emoji = sum(1 for e in config.special_dates.values() if e)
+    if emoji:
+        parts.append(f'emoji={emoji}')
+    if config.signature:
+        parts.append('signature')
+    return ' '.join(parts)
+
+
+def _status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_rss_peak():
+    """Sets the high-water mark back to the current RSS (Linux); False where that is not possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class RenderRecord:
+    """Heap and RSS peaks of one profiled render, in bytes above its starting baseline."""
+
+    def __init__(self, label):
+        self.label = label
+        tracemalloc.reset_peak()
+        self.track_rss = _reset_rss_peak()
+        self.heap_baseline = tracemalloc.get_traced_memory()[0]
+        self.rss_baseline = _status_kb('VmRSS:') if self.track_rss else None
+        self.heap = 0
+        self.rss = 0
+        self.stages = {}
+        self._active = []
+
+    @property
+    def peak(self):
+        return max(self.heap, self.rss)
+
+    def fold(self):
+        """Charges the peaks since the last fold to the render and every stage in progress."""
+        heap = max(0, tracemalloc.get_traced_memory()[1] - self.heap_baseline)
+        rss = 0
+        if self.track_rss:
+            rss = max(0, (_status_kb('VmHWM:') or 0) - self.rss_baseline)
+            _reset_rss_peak()
+        tracemalloc.reset_peak()
+        self.heap = max(self.heap, heap)
+        self.rss = max(self.rss, rss)
+        for name in self._active:
+            stage_peaks = self.stages.setdefault(name, {'heap': 0, 'rss': 0})
+            stage_peaks['heap'] = max(stage_peaks['heap'], heap)
+            stage_peaks['rss'] = max(stage_peaks['rss'], rss)
+
+    def as_dict(self):
+        return {'mix': self.label, 'heap': self.heap, 'rss': self.rss if self.track_rss else None, 'stages': self.stages}
+
+
+@contextlib.contextmanager
+def profiled_render(config, variants=('lock',)):
+    """Accounts the render inside the block; does nothing unless profiling is on."""
+    if not tracemalloc.is_tracing():
+        yield None
+        return
+    with _render_lock:
+        record = _local.record = RenderRecord(parameter_mix(config, variants))
+        try:
+            yield record
+        finally:
+            record.fold()
+            _local.record = None
+    _account(config.mode, record)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Attributes the peak inside the block to ``name`` in the current profiled render, if any."""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        yield
+        return
+    record.fold()
+    record._active.append(name)
+    try:
+        yield
+    finally:
+        record.fold()
+        record._active.remove(name)
+
+
+def _aggregate(table, key, record):
+    row = table.setdefault(key, {'renders': 0, 'heap_max': 0, 'rss_max': 0, 'peak_total': 0, 'stages_max': {}})
+    row['renders'] += 1
+    row['heap_max'] = max(row['heap_max'], record.heap)
+    row['rss_max'] = max(row['rss_max'], record.rss)
+    row['peak_total'] += record.peak
+    for name, peaks in record.stages.items():
+        stage_max = row['stages_max'].setdefault(name, {'heap': 0, 'rss': 0})
+        for kind in ('heap', 'rss'):
+            stage_max[kind] = max(stage_max[kind], peaks[kind])
+
+
+def _account(mode, record):
+    global over_threshold
+    with _stats_lock:
+        recent.append(record.as_dict())
+        _aggregate(by_mode, mode, record)
+        _aggregate(by_mix, record.label, record)
+        if record.peak > MEMORY_LOG_THRESHOLD:
+            over_threshold += 1
+    if record.peak > MEMORY_LOG_THRESHOLD:
+        stages = ', '.join(f"{name} {p['heap'] / MB:.1f}/{p['rss'] / MB:.1f}" for name, p in record.stages.items())
+        print(f"Memory: render peaked {record.heap / MB:.1f} MB heap, {record.rss / MB:.1f} MB RSS over baseline "
+              f"({record.label}; heap/RSS MB by stage: {stages})")
+
+
+def _summary(table):
+    return {key: {'renders': row['renders'], 'heap_max': row['heap_max'], 'rss_max': row['rss_max'],
+                  'peak_mean': row['peak_total'] // row['renders'],
+                  'stages_max': {name: dict(peaks) for name, peaks in row['stages_max'].items()}}
+            for key, row in table.items()}
+
+
+def image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+def cache_footprint():
+    """Entries and, where they can be counted, bytes held by each per-process cache."""
+    from _grid.cache import render_cache
+    from _grid.png import band_cache
+
+    caches = {
+        'render': {'entries': len(render_cache), 'bytes': render_cache.nbytes()},
+        'bands': {'entries': len(band_cache), 'bytes': band_cache.size},
+    }
+    if '_grid.render' in sys.modules:
+        from _grid import emoji, raster, render, text
+        with emoji._lock:
+            emoji_images = list(emoji.emoji_cache.values())
+        with render._resized_emoji_lock:
+            resized = [img for img in render.resized_emoji_cache.values() if img is not None]
+        caches.update({
+            'emoji': {'entries': len(emoji_images), 'bytes': sum(map(image_bytes, emoji_images))},
+            'resized_emoji': {'entries': len(resized), 'bytes': sum(map(image_bytes, resized))},
+            'dot_strips': {'entries': raster.dot_strip.cache_info().currsize},
+            'text_tiles': {'entries': len(text.tile_cache), 'bytes': text.tile_cache.size},
+        })
+    return caches
+
+
+def top_allocations(limit, group_by):
+    """The ``limit`` allocation sites holding the most memory now, grouped by 'lineno', 'filename' or 'traceback'."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+    top = []
+    for stat in snapshot.statistics(group_by)[:limit]:
+        # Traceback groups list every frame, most recent call last
+        site = [str(frame) for frame in stat.traceback] if group_by == 'traceback' else str(stat.traceback[0])
+        top.append({'site': site, 'bytes': stat.size, 'blocks': stat.count})
+    return top
+
+
+def report(limit=20, group_by='lineno'):
+    """Everything ``/api/memory`` shows: traced totals, render peaks, top sites and cache sizes."""
+    if not tracemalloc.is_tracing():
+        return {'profiling': False, 'caches': cache_footprint()}
+    current, peak = tracemalloc.get_traced_memory()
+    with _stats_lock:
+        renders = {'by_mode': _summary(by_mode), 'by_mix': _summary(by_mix), 'recent': list(recent),
+                   'over_threshold': over_threshold, 'threshold': MEMORY_LOG_THRESHOLD}
+    return {
+        'profiling': True,
+        'traced': {'current': current, 'peak_since_last_render': peak, 'overhead': tracemalloc.get_tracemalloc_memory()},
+        'rss': _status_kb('VmRSS:'),
+        'renders': renders,
+        'top': top_allocations(limit, group_by),
+        'caches': cache_footprint(),
+    }
@@ -0,0 +1,102 @@
+"""Semantic palette for the 8-bit indexed canvas (no Pillow here).
+
+Every index means the same thing in every render, whatever the theme:
+
+    0-6     BG, ACTIVE, PASSED, INACTIVE, WEEKEND, SPECIAL, TEXT
+    7-51    anti-aliasing ramps from BG to ACTIVE, INACTIVE and TEXT
+            (15 partial-coverage steps each), used by text
+    52-255  emoji colours, stored as RGBA and flattened onto BG
+
+The theme is only applied when the palette is built, so the same indexed
+pixels can be shown in any theme: a cached render is re-themed by swapping
+its PLTE chunk (``themed_png``).
+"""
+import functools
+
+from _grid.png import replace_palette
+from _grid.settings import THEMES
+
+PALETTE_KEYS = ('BG', 'ACTIVE', 'PASSED', 'INACTIVE', 'WEEKEND', 'SPECIAL', 'TEXT')
+INDEX = {key: i for i, key in enumerate(PALETTE_KEYS)}
+
+RAMP_LEVELS = 16
+TEXT_RAMPS = ('ACTIVE', 'INACTIVE', 'TEXT')
+RAMP_BASE = {key: len(PALETTE_KEYS) + i * (RAMP_LEVELS - 1) for i, key in enumerate(TEXT_RAMPS)}
+
+EMOJI_BASE = len(PALETTE_KEYS) + len(TEXT_RAMPS) * (RAMP_LEVELS - 1)
+EMOJI_COLORS = 256 - EMOJI_BASE
+
+# Output variants: the home screen is the lock screen without bar and
+# signature, every colour pulled this far towards BG
+VARIANT_DIM = {'lock': 1.0, 'home': 0.45}
+
+# Both built-in themes sit their future dots and weekends this far from BG
+# towards PASSED; a custom background keeps the same contrast
+INACTIVE_MIX = 0.18
+WEEKEND_MIX = 0.07
+
+
+def blend(bg, fg, alpha):
+    """``fg`` over ``bg`` at coverage ``alpha`` (0-1), rounded like Pillow's paste."""
+    return tuple(int(b + (f - b) * alpha + 0.5) for b, f in zip(bg, fg))
+
+
+def coverage_lut(key):
+    """Maps 8-bit text coverage to the palette index of ``key``'s ramp (0 stays BG)."""
+    lut = []
+    for alpha in range(256):
+        level = (alpha * RAMP_LEVELS + 127) // 255
+        if level == 0:
+            lut.append(INDEX['BG'])
+        elif level == RAMP_LEVELS:
+            lut.append(INDEX[key])
+        else:
+            lut.append(RAMP_BASE[key] + level - 1)
+    return lut
+
+
+def build_palette(colors, emoji_entries=(), dim=1.0):
+    """Flat 768-entry RGB palette for theme ``colors`` plus RGBA ``emoji_entries``.
+
+    ``dim`` below 1 pulls every entry towards BG (see VARIANT_DIM).
+    """
+    bg = colors['BG']
+    entries = [colors[key] for key in PALETTE_KEYS]
+    for key in TEXT_RAMPS:
+        entries += [blend(bg, colors[key], level / RAMP_LEVELS) for level in range(1, RAMP_LEVELS)]
+    entries += [blend(bg, rgba[:3], rgba[3] / 255) for rgba in emoji_entries[:EMOJI_COLORS]]
+    entries += [bg] * (256 - len(entries))
+    if dim < 1:
+        entries = [blend(bg, entry, dim) for entry in entries]
+    return [channel for entry in entries for channel in entry]
+
+
+def theme_colors(config):
+    """The theme's colours with the config's custom accent and background applied."""
+    colors = dict(THEMES.get(config.theme, THEMES['dark']))
+    if config.accent:
+        colors['ACTIVE'] = config.accent
+    if config.bg:
+        colors['BG'] = config.bg
+        colors['INACTIVE'] = blend(config.bg, colors['PASSED'], INACTIVE_MIX)
+        colors['WEEKEND'] = blend(config.bg, colors['PASSED'], WEEKEND_MIX)
+    return colors
+
+
+@functools.lru_cache(maxsize=256)
+def _palette_for(color_items, emoji_entries, dim):
+    return build_palette(dict(color_items), emoji_entries, dim)
+
+
+def themed_png(entry, config, variant='lock'):
+    """PNG bytes for ``config`` from a cached ``(png, emoji_entries)`` render entry.
+
+    Indexed renders get the config's palette (dimmed for ``variant``)
+    swapped in; RGB renders (``emoji_entries`` is None) already have their
+    colours baked in.
+    """
+    png, emoji_entries = entry
+    if emoji_entries is None:
+        return png
+    palette = _palette_for(tuple(sorted(theme_colors(config).items())), emoji_entries, VARIANT_DIM[variant])
+    return replace_palette(png, palette)
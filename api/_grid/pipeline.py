@@ -0,0 +1,176 @@
+"""``/api/image`` from query to response, shared by index.py and asgi.py (no Pillow here).
+
+Both servers run the same steps and differ only in how they wait on them:
+
+1. ``ImageRequest(args, now, record, client)``: bounds, canonical token and
+   render key (raises ConfigError), then ``redirect_headers`` for any other
+   spelling of the canonical query
+2. ``lookup``: each variant from the render cache; the ASGI loop runs it on
+   its I/O pool when a shared store makes it a round trip
+3. ``found``: with anything missing, either a render of the same variants
+   is already in flight and this request follows it (``adopt`` what it
+   lands), or this request leads and pays the render rate limit (RateLimited)
+4. ``render``: the leader draws the missing variants in one pass under a
+   render slot (Overloaded), fills the cache and ``land``s them; Flask may
+   stream a lone lock screen instead, and ASGI fetches the emoji first
+5. ``reply``: themes as a palette swap, one PNG or a multipart body
+
+Turned-away requests are answered with ``refusal``.
+"""
+import concurrent.futures
+import secrets
+import time
+
+from _grid import accesslog, memprofile
+from _grid.cache import canonical_query, render_cache, render_key, variant_key
+from _grid.config import parse_config, parse_variants, seconds_until_midnight
+from _grid.limits import render_flights, render_slots
+from _grid.palette import themed_png
+from _grid.ratelimit import RateLimited, rate_limiter
+from _grid.settings import CANONICAL_REDIRECTS, REDIRECT_MAX_AGE, REDIRECT_S_MAXAGE, RENDER_COALESCE_WAIT
+
+
+def refusal(e):
+    """(status, body, headers) for a RateLimited (429) or Overloaded (503)."""
+    status = 429 if isinstance(e, RateLimited) else 503
+    return status, str(e), [('Retry-After', str(e.retry_after)), ('Cache-Control', 'no-store')]
+
+
+def redirect_headers(canonical, path, query_string):
+    """Headers of a 301 to ``canonical`` unless this request already spells it that way (None if it does).
+
+    One URL per wallpaper: parameter order, explicit defaults, padding and
+    variation selectors all collapse into the token, so the edge stores one object.
+    """
+    if not CANONICAL_REDIRECTS or not canonical or query_string == canonical:
+        return None
+    return [('Location', f'{path}?{canonical}'),
+            ('Cache-Control', f'public, max-age={REDIRECT_MAX_AGE}, s-maxage={REDIRECT_S_MAXAGE}')]
+
+
+def cache_control(now):
+    """Lets browsers and the edge keep a wallpaper until it changes at IST midnight."""
+    ttl = seconds_until_midnight(now)
+    return 'Cache-Control', f'public, max-age={ttl}, s-maxage={ttl}'
+
+
+def multipart_body(parts):
+    """(content type, multipart/mixed body) with one image/png part per (name, png)."""
+    boundary = secrets.token_hex(16)
+    body = []
+    for name, png in parts:
+        body.append(f'--{boundary}\r\nContent-Type: image/png\r\n'
+                    f'Content-Disposition: inline; name="{name}"; filename="{name}.png"\r\n'
+                    f'Content-Length: {len(png)}\r\n\r\n'.encode('ascii'))
+        body.append(png)
+        body.append(b'\r\n')
+    body.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return f'multipart/mixed; boundary={boundary}', b''.join(body)
+
+
+class ImageRequest:
+    """One ``/api/image`` request; ``entries`` fills in as variants are found or rendered.
+
+    With variants missing, ``flight`` is the render in flight for them (None
+    without a render key) and ``leading`` says whether this request draws them.
+    """
+
+    def __init__(self, args, now, record, client):
+        # Bounds are checked here, before anything is fetched or drawn
+        self.config = parse_config(args)
+        self.variants = parse_variants(args)
+        self.now = now
+        self.record = record
+        self.client = client
+        self.canonical = canonical_query(self.config, self.variants)
+        # Same wallpaper for the same config all IST day, however the URL spelled it
+        self.key = render_key(self.config, now)
+        self.entries = {}
+        self.missing = ()
+        self.flight = None
+        self.leading = False
+        accesslog.describe(record, self.config, self.variants, self.key, self.canonical)
+
+    def lookup(self):
+        """{variant: (entry, source)} from the render cache, as ``RenderCache.lookup`` returns them."""
+        return {v: render_cache.lookup(variant_key(self.key, v)) if self.key else (None, 'miss')
+                for v in self.variants}
+
+    def found(self, found):
+        """Takes ``lookup``'s result and joins or starts the render of what is missing (raises RateLimited)."""
+        self.entries = {v: entry for v, (entry, _) in found.items()}
+        self.missing = tuple(v for v in self.variants if self.entries[v] is None)
+        accesslog.note(self.record, cache=accesslog.cache_outcome([source for _, source in found.values()], self.key))
+        if not self.missing:
+            return
+        if self.key:
+            # A midnight burst on one config renders it once; everyone else waits for that render
+            self.flight, self.leading = render_flights.join((self.key, self.missing))
+            if not self.leading:
+                return
+        self.leading = True
+        try:
+            self.charge()
+        except RateLimited:
+            self.land(None)
+            raise
+
+    def charge(self):
+        """Charges the render rate limit: per client and config, so a device retrying in a loop runs dry alone."""
+        config = self.key.partition('@')[0] if self.key else 'uncacheable'
+        rate_limiter.check('render', f'{self.client}|{config}')
+
+    def follow(self):
+        """Waits (blocking) for the leader's render and adopts it."""
+        try:
+            landed = self.flight.result(RENDER_COALESCE_WAIT)
+        except concurrent.futures.TimeoutError:
+            landed = None
+        self.adopt(landed)
+
+    def adopt(self, landed):
+        """Takes the leader's variants; without them (failed or too slow) leads a render of its own (raises RateLimited)."""
+        self.flight = None
+        if landed is not None:
+            self.entries.update(landed)
+            self.missing = ()
+            return
+        self.leading = True
+        self.charge()
+
+    def land(self, rendered):
+        """Ends this request's flight, if it leads one; followers get ``rendered`` ({variant: entry} or None)."""
+        flight, self.flight = self.flight, None
+        if flight is not None:
+            render_flights.land((self.key, self.missing), flight, rendered)
+
+    def render(self):
+        """Renders the missing variants under a render slot (raises Overloaded), caches and lands them."""
+        # Pillow (and the emoji downloader) are only paid for on a cache miss
+        from _grid.render import emoji_resolved, render_entries
+
+        rendered = None
+        try:
+            with render_slots.hold(), memprofile.profiled_render(self.config, self.missing):
+                started = time.perf_counter()
+                # Variants share one pass: parsing, layout, dots and most of the deflate
+                self.entries.update(render_entries(self.config, self.now, self.missing))
+                accesslog.note(self.record, render_ms=round((time.perf_counter() - started) * 1000, 2))
+            rendered = {v: self.entries[v] for v in self.missing}
+            # A failed emoji download falls back to a gold dot; retry it next time
+            if self.key and emoji_resolved(self.config):
+                for v in self.missing:
+                    render_cache.put(variant_key(self.key, v), self.entries[v])
+        finally:
+            # Followers get the render even when it is not cached
+            self.land(rendered)
+
+    def reply(self):
+        """(body, headers) of the 200 response."""
+        # Themes and custom colours are a palette swap on the cached render
+        pngs = [(v, themed_png(self.entries[v], self.config, v)) for v in self.variants]
+        if len(pngs) == 1:
+            content_type, body = 'image/png', pngs[0][1]
+        else:
+            content_type, body = multipart_body(pngs)
+        return body, [('Content-Type', content_type), cache_control(self.now)]
@@ -0,0 +1,182 @@
+"""PNG chunk surgery on already-encoded images, and the indexed PNG encoders (no Pillow here)."""
+import collections
+import hashlib
+import struct
+import threading
+import zlib
+
+from _grid.settings import BAND_CACHE_BYTES
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Same as Pillow's default, so both encoders give similar sizes
+COMPRESS_LEVEL = 6
+
+# Rows per independently deflated band in the band-cached encoder
+BAND_ROWS = 64
+ZLIB_HEADER = b'\x78\x9c'  # deflate, 32K window, default level
+# An empty final deflate block: what ends a stream made of flushed bands
+FINAL_BLOCK = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15).flush()
+ADLER_BASE = 65521
+
+
+def chunk(tag, data):
+    """One length-prefixed, CRC-suffixed PNG chunk."""
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def replace_palette(png, palette):
+    """Returns ``png`` with its PLTE chunk rewritten from the flat RGB list ``palette``.
+
+    Only the chunk header and 768 bytes are touched; the compressed pixels
+    are copied as-is. Raises ValueError if ``png`` has no palette.
+    """
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(png):
+        length, tag = struct.unpack_from('>I4s', png, pos)
+        end = pos + 12 + length
+        if tag == b'PLTE':
+            # The encoder may have trimmed the palette to the indexes in use
+            return png[:pos] + chunk(b'PLTE', bytes(palette[:length])) + png[end:]
+        if tag == b'IDAT':
+            break
+        pos = end
+    raise ValueError('PNG has no palette to replace')
+
+
+def scanlines(pixels, width):
+    """8-bit indexed rows with the PNG filter byte (0, none) in front of each."""
+    rows = [pixels[i:i + width] for i in range(0, len(pixels), width)]
+    return b'\x00' + b'\x00'.join(rows)
+
+
+def indexed_header(width, height, palette):
+    """Signature, IHDR and PLTE of an 8-bit indexed PNG: everything before the pixels."""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)
+    return PNG_SIGNATURE + chunk(b'IHDR', ihdr) + chunk(b'PLTE', bytes(palette))
+
+
+def indexed_png(width, height, palette, idat):
+    """Wraps a finished zlib stream of 8-bit indexed scanlines into a PNG."""
+    return indexed_header(width, height, palette) + chunk(b'IDAT', idat) + chunk(b'IEND', b'')
+
+
+def adler32_combine(adler1, adler2, len2):
+    """Adler-32 of A + B from the checksums of A and B and the length of B (zlib's adler32_combine)."""
+    rem = len2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = rem * sum1 % ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + ADLER_BASE - 1
+    sum2 += (adler1 >> 16) + (adler2 >> 16) + ADLER_BASE - rem
+    return (sum2 % ADLER_BASE) << 16 | sum1 % ADLER_BASE
+
+
+class BandCache:
+    """Thread-safe LRU of deflated bands, keyed by a digest of their pixels and bounded in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._bands = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            band = self._bands.get(digest)
+            if band is None:
+                self.misses += 1
+                return None
+            self._bands.move_to_end(digest)
+            self.hits += 1
+            return band
+
+    def put(self, digest, band):
+        if len(band[0]) > self.max_bytes:
+            return
+        with self._lock:
+            if digest in self._bands:
+                return
+            self._bands[digest] = band
+            self.size += len(band[0])
+            while self.size > self.max_bytes:
+                _, (data, _, _) = self._bands.popitem(last=False)
+                self.size -= len(data)
+
+    def clear(self):
+        with self._lock:
+            self._bands.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._bands)
+
+
+band_cache = BandCache(BAND_CACHE_BYTES)
+
+
+def deflate_band(band, width):
+    """``(raw deflate ending on a full flush, adler32, length)`` of a band's scanlines, cached by content.
+
+    Every band starts a fresh compressor, so its output does not depend on
+    the bands around it and can be spliced into any image that has it.
+    """
+    digest = hashlib.sha1(band, usedforsecurity=False).digest()
+    cached = band_cache.get(digest)
+    if cached is not None:
+        return cached
+    rows = scanlines(band, width)
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    deflated = (compressor.compress(rows) + compressor.flush(zlib.Z_FULL_FLUSH), zlib.adler32(rows), len(rows))
+    band_cache.put(digest, deflated)
+    return deflated
+
+
+def banded_idat(width, height, pixels, band_rows=BAND_ROWS):
+    """Yields a zlib stream of ``pixels`` as 8-bit indexed scanlines, one piece per band.
+
+    Bands already seen (the blank top, month labels, unchanged dot rows)
+    are copied from ``band_cache`` instead of being compressed again; only
+    the checksum is stitched together.
+    """
+    view = memoryview(pixels)
+    adler = 1
+    for top in range(0, height, band_rows):
+        data, band_adler, length = deflate_band(view[top * width:(top + band_rows) * width], width)
+        adler = adler32_combine(adler, band_adler, length)
+        yield ZLIB_HEADER + data if top == 0 else data
+    yield FINAL_BLOCK + struct.pack('>I', adler)
+
+
+def encode_indexed_png(width, height, palette, pixels):
+    """An 8-bit indexed PNG of ``pixels`` through the band cache."""
+    return indexed_png(width, height, palette, b''.join(banded_idat(width, height, pixels)))
+
+
+def stream_indexed_png(width, height, palette, pixels):
+    """Yields an 8-bit indexed PNG piece by piece: the header at once, then one IDAT per band.
+
+    Bands come from ``banded_idat``, so each leaves as soon as it is
+    compressed (or found in the band cache).
+    """
+    yield indexed_header(width, height, palette)
+    for data in banded_idat(width, height, pixels):
+        yield chunk(b'IDAT', data)
+    yield chunk(b'IEND', b'')
+
+
+def encode_indexed_forks(width, height, shared, tails, palettes):
+    """One 8-bit indexed PNG per (tail, palette), all starting with the rows in ``shared``.
+
+    ``shared`` is deflated once; the compressor is then copied for each
+    tail, so the cost of the extra images is only their differing rows.
+    """
+    compressor = zlib.compressobj(COMPRESS_LEVEL)
+    head = compressor.compress(scanlines(shared, width))
+    pngs = []
+    for tail, palette in zip(tails, palettes):
+        fork = compressor.copy()
+        idat = head + fork.compress(scanlines(tail, width)) + fork.flush()
+        pngs.append(indexed_png(width, height, palette, idat))
+    return pngs
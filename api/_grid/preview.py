@@ -0,0 +1,64 @@
+"""``/api/layout``: the resolved layout as JSON for the dashboard's canvas preview (no Pillow here).
+
+Built from the same ``build_layout`` as ``/api/image``, so the preview shows
+what the wallpaper will be without a render. Dots are sent as one string
+per row, one character per cell (see ``CELL_CODES``); text is sent as strings
+with an alignment, since its exact width is measured by whoever draws it.
+"""
+import os
+
+from _grid.emoji import emoji_url
+from _grid.layout import build_layout
+from _grid.palette import theme_colors
+from _grid.settings import (
+    FONT_PATH, FONT_SIGNATURE_PATH, FONT_SIGNATURE_SIZE, FONT_SIZE, IMAGE_HEIGHT, IMAGE_WIDTH,
+)
+
+CELL_CODES = {None: '.', 'ACTIVE': 'a', 'PASSED': 'p', 'INACTIVE': 'i', 'WEEKEND': 'w', 'SPECIAL': 's'}
+
+
+def hex_color(rgb):
+    return '#%02x%02x%02x' % tuple(rgb)
+
+
+def round_px(value):
+    """Coordinates keep one decimal; the bar's block edges are fractional."""
+    value = round(value, 1)
+    return int(value) if value == int(value) else value
+
+
+def layout_payload(config, now):
+    """JSON-ready dict describing the wallpaper for ``config`` at ``now``."""
+    layout = build_layout(config, now)
+
+    grids = []
+    for grid in layout.grids:
+        grids.append({
+            'x': grid.x, 'y': grid.y, 'size': grid.size,
+            'pitch_x': grid.pitch_x, 'pitch_y': grid.pitch_y,
+            'rows': [''.join(CELL_CODES[key] for key in row) for row in grid.cells],
+            'emoji': [[r, c, char, emoji_url(char)] for (r, c), char in sorted(grid.emoji.items())],
+        })
+
+    texts = [{'text': text, 'x': round_px(x), 'y': round_px(y), 'color': key, 'font': 'small', 'align': 'left'}
+             for text, x, y, key in layout.labels]
+    texts.append({'text': layout.bottom_text, 'x': IMAGE_WIDTH / 2, 'y': layout.footer_y, 'color': 'ACTIVE',
+                  'font': 'small', 'align': 'center'})
+    if config.signature:
+        texts.append({'text': config.signature, 'x': IMAGE_WIDTH / 2, 'y': layout.signature_y, 'color': 'TEXT',
+                      'font': 'signature', 'align': 'center'})
+
+    return {
+        'width': IMAGE_WIDTH,
+        'height': IMAGE_HEIGHT,
+        'colors': {key: hex_color(rgb) for key, rgb in theme_colors(config).items()},
+        'cells': {code: key for key, code in CELL_CODES.items() if key},
+        'fonts': {
+            'small': {'url': '/fonts/' + os.path.basename(FONT_PATH), 'size': FONT_SIZE},
+            'signature': {'url': '/fonts/' + os.path.basename(FONT_SIGNATURE_PATH), 'size': FONT_SIGNATURE_SIZE},
+        },
+        'grids': grids,
+        'texts': texts,
+        'bar': [[round_px(x0), round_px(y0), round_px(x1), round_px(y1), radius, key]
+                for x0, y0, x1, y1, radius, key in layout.bar],
+    }
@@ -0,0 +1,271 @@
+"""Rasterization backends: how dots and progress bars get onto the canvas.
+
+Text and emoji are pastes of cached tiles (see text.py) whatever the
+backend; the shapes are drawn by one of:
+
+* ``pillow`` (the default): a pre-drawn strip of dots pasted once per run
+  of equal colours, and ``ImageDraw.rounded_rectangle`` for the bar
+* ``numpy``: each dot grid composited in one array operation from a
+  Pillow-drawn dot stamp (so dots are pixel-identical), and the bar from a
+  rounded-corner mask computed in NumPy (corners may differ from Pillow's
+  by a few pixels); needs ``numpy``
+
+``GRID_RASTER`` names the backend, or ``auto``: then the first render (or
+warm-up) draws a few reference layouts with every backend installed here,
+drops any whose pixels differ from Pillow's on more than
+``PARITY_TOLERANCE`` of the canvas, and keeps the fastest.
+``bench/raster_backends.py`` runs the same comparison offline with more
+rounds and layouts.
+"""
+import datetime
+import functools
+import itertools
+import threading
+import time
+
+from PIL import Image, ImageChops, ImageDraw
+
+from _grid.palette import INDEX
+from _grid.settings import CANVAS_MODE, IMAGE_HEIGHT, IMAGE_WIDTH, RASTER_BACKEND
+
+# Share of canvas pixels a backend may colour differently from Pillow
+PARITY_TOLERANCE = 1e-4
+
+# What auto-selection draws: the common view, the most dots, and every bar style
+REFERENCE_CONFIGS = (
+    {'mode': 'year', 'highlight_weekends': 'true', 'bar_style': 'segmented'},
+    {'mode': 'life', 'birthdate': '1990-01-01', 'bar_style': 'solid'},
+    {'mode': 'segregated_months', 'bar_style': 'minimal'},
+)
+REFERENCE_NOW = datetime.datetime(2026, 10, 19, 9, 0)
+AUTO_ROUNDS = 3
+
+
+@functools.lru_cache(maxsize=128)
+def dot_strip(mode, size, pitch, count, color, bg):
+    """A row of ``count`` dots on background, rasterized with the same ellipse call as a single dot.
+
+    Dots never overlap anything else, so a run of same-coloured dots is drawn
+    by pasting a slice of this strip: a plain copy with no per-pixel blending,
+    which is what keeps 5,000-dot views as cheap as the year view.
+    """
+    strip = Image.new(mode, ((count - 1) * pitch + size + 1, size + 1), bg)
+    draw = ImageDraw.Draw(strip)
+    for i in range(count):
+        draw.ellipse((i * pitch, 0, i * pitch + size, size), fill=color)
+    return strip
+
+
+@functools.lru_cache(maxsize=64)
+def dot_stamp(size, pitch_x, pitch_y):
+    """One cell for the numpy backend: True where Pillow's ellipse puts a dot, False in the padding around it."""
+    import numpy
+    cell = Image.new('L', (pitch_x, pitch_y), 0)
+    ImageDraw.Draw(cell).ellipse((0, 0, size, size), fill=1)
+    stamp = numpy.asarray(cell).astype(bool)
+    stamp.flags.writeable = False  # Shared by every grid of this geometry
+    return stamp
+
+
+class PillowRaster:
+    """Dots as strip pastes, bars through ImageDraw."""
+
+    name = 'pillow'
+
+    def dot_grid(self, img, grid, cells, ink):
+        """Draws ``cells`` (palette keys, None for no dot) of ``grid``, row by row, one paste per run."""
+        cols = max(len(row) for row in cells)
+        for r, row in enumerate(cells):
+            y = grid.y + r * grid.pitch_y
+            col = 0
+            for key, run in itertools.groupby(row):
+                n = sum(1 for _ in run)
+                if key is not None:
+                    strip = dot_strip(img.mode, grid.size, grid.pitch_x, cols, ink[key], ink['BG'])
+                    if n < cols:
+                        strip = strip.crop((0, 0, (n - 1) * grid.pitch_x + grid.size + 1, grid.size + 1))
+                    img.paste(strip, (grid.x + col * grid.pitch_x, y))
+                col += n
+
+    def bars(self, img, shapes, ink):
+        """Draws ``(x0, y0, x1, y1, radius, palette key)`` rounded rectangles in order."""
+        draw = ImageDraw.Draw(img)
+        for x0, y0, x1, y1, radius, key in shapes:
+            draw.rounded_rectangle((x0, y0, x1, y1), radius=radius, fill=ink[key])
+
+
+class NumpyRaster(PillowRaster):
+    """Whole dot grids and bars composited as arrays; raises ImportError without NumPy."""
+
+    name = 'numpy'
+
+    def __init__(self):
+        import numpy
+        self.np = numpy
+
+    def region(self, img, box):
+        """A writable (height, width) copy of ``box``: palette indices, or RGB pixels packed as RGBX words."""
+        np = self.np
+        size = (box[3] - box[1], box[2] - box[0])
+        if img.mode == 'P':
+            return np.frombuffer(img.crop(box).tobytes(), dtype=np.uint8).reshape(size).copy()
+        return np.frombuffer(img.crop(box).tobytes('raw', 'RGBX'), dtype=np.uint32).reshape(size).copy()
+
+    def put(self, img, box, region):
+        size = (box[2] - box[0], box[3] - box[1])
+        if img.mode == 'P':
+            img.paste(Image.frombytes('P', size, region.tobytes()), box[:2])
+        else:
+            img.paste(Image.frombytes('RGB', size, region.tobytes(), 'raw', 'RGBX'), box[:2])
+
+    def colors(self, img, colors):
+        """``colors`` (palette indices or RGB tuples) in the dtype ``region`` returns."""
+        np = self.np
+        if img.mode == 'P':
+            return np.array(colors, dtype=np.uint8)
+        return np.frombuffer(b''.join(bytes((*color, 0)) for color in colors), dtype=np.uint32)
+
+    def dot_grid(self, img, grid, cells, ink):
+        np = self.np
+        size, pitch_x, pitch_y = grid.size, grid.pitch_x, grid.pitch_y
+        if size + 1 > min(pitch_x, pitch_y):
+            return super().dot_grid(img, grid, cells, ink)  # Dots would overlap their neighbours' cells
+        keys = sorted({key for row in cells for key in row if key is not None})
+        if not keys:
+            return
+        code = {key: i + 1 for i, key in enumerate(keys)}
+        code[None] = 0
+        rows, cols = len(cells), max(len(row) for row in cells)
+        codes = np.zeros((rows, cols), dtype=np.uint8)
+        for r, row in enumerate(cells):
+            codes[r, :len(row)] = [code[key] for key in row]
+        lut = self.colors(img, [ink['BG']] + [ink[key] for key in keys])
+
+        # Whole cells, so the region is (rows, pitch_y, cols, pitch_x) without copying
+        box = (grid.x, grid.y, grid.x + cols * pitch_x, grid.y + rows * pitch_y)
+        region = self.region(img, box)
+        cells4 = region.reshape(rows, pitch_y, cols, pitch_x)
+        mask = (codes != 0)[:, None, :, None] & dot_stamp(size, pitch_x, pitch_y)[None, :, None, :]
+        np.copyto(cells4, lut[codes][:, None, :, None], where=mask)
+        self.put(img, box, region)
+
+    def bars(self, img, shapes, ink):
+        np = self.np
+        if not shapes:
+            return
+        box = (int(min(s[0] for s in shapes)), int(min(s[1] for s in shapes)),
+               int(max(s[2] for s in shapes)) + 1, int(max(s[3] for s in shapes)) + 1)
+        region = self.region(img, box)
+        for x0, y0, x1, y1, radius, key in shapes:
+            x0, y0, x1, y1 = round(x0), round(y0), round(x1), round(y1)
+            xs = np.arange(x0, x1 + 1)
+            ys = np.arange(y0, y1 + 1)[:, None]
+            # Distance past the nearest corner's centre, zero along the straight edges
+            dx = np.maximum(np.maximum(x0 + radius - xs, xs - (x1 - radius)), 0)
+            dy = np.maximum(np.maximum(y0 + radius - ys, ys - (y1 - radius)), 0)
+            inside = dx * dx + dy * dy <= radius * radius + radius
+            target = region[y0 - box[1]:y1 - box[1] + 1, x0 - box[0]:x1 - box[0] + 1]
+            # Later shapes paint over earlier ones, as with ImageDraw
+            np.copyto(target, self.colors(img, [ink[key]])[0], where=inside)
+        self.put(img, box, region)
+
+
+BACKENDS = {
+    'pillow': PillowRaster,
+    'numpy': NumpyRaster,
+}
+
+
+def available():
+    """{name: backend} for every backend whose library is installed here."""
+    backends = {}
+    for name, cls in BACKENDS.items():
+        try:
+            backends[name] = cls()
+        except ImportError:
+            pass
+    return backends
+
+
+def draw_shapes(backend, layout, canvas_mode=CANVAS_MODE, ink=None):
+    """A canvas with ``layout``'s dots and bar drawn by ``backend`` (no text or emoji)."""
+    from _grid.settings import THEMES
+    ink = ink or (INDEX if canvas_mode == 'P' else THEMES['dark'])
+    img = Image.new(canvas_mode, (IMAGE_WIDTH, IMAGE_HEIGHT), ink['BG'])
+    for grid in layout.grids:
+        backend.dot_grid(img, grid, grid.cells, ink)
+    backend.bars(img, layout.bar, ink)
+    return img
+
+
+def differing_pixels(a, b):
+    """Pixels where two same-sized canvases of one mode differ in any channel."""
+    if a.mode == 'P':
+        # Compare indices, not what the palette maps them to
+        a, b = (Image.frombytes('L', im.size, im.tobytes()) for im in (a, b))
+    diff = ImageChops.difference(a, b)
+    if diff.mode != 'L':
+        diff = functools.reduce(ImageChops.lighter, diff.split())
+    return diff.size[0] * diff.size[1] - diff.histogram()[0]
+
+
+def reference_layouts():
+    from _grid.config import parse_config
+    from _grid.layout import build_layout
+    return [build_layout(parse_config(args), REFERENCE_NOW) for args in REFERENCE_CONFIGS]
+
+
+def compare(backends, layouts, rounds, canvas_mode=CANVAS_MODE):
+    """{name: (best ms to draw every layout, worst share of pixels differing from pillow)}."""
+    reference = [draw_shapes(PillowRaster(), layout, canvas_mode) for layout in layouts]
+    results = {}
+    for name, backend in backends.items():
+        drift = max(differing_pixels(draw_shapes(backend, layout, canvas_mode), ref) / (IMAGE_WIDTH * IMAGE_HEIGHT)
+                    for layout, ref in zip(layouts, reference))
+        best = float('inf')
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            for layout in layouts:
+                draw_shapes(backend, layout, canvas_mode)
+            best = min(best, time.perf_counter() - t0)
+        results[name] = (best * 1000, drift)
+    return results
+
+
+def fastest():
+    """The fastest installed backend within parity of Pillow, timed on the reference layouts."""
+    backends = available()
+    results = compare(backends, reference_layouts(), AUTO_ROUNDS)
+    eligible = [name for name, (_, drift) in results.items() if drift <= PARITY_TOLERANCE]
+    name = min(eligible, key=lambda name: results[name][0])
+    timings = ', '.join(f'{n} {ms:.1f} ms' + ('' if n in eligible else ' (out of parity)')
+                        for n, (ms, _) in results.items())
+    print(f"Raster: auto-selected {name} ({timings})")
+    return backends[name]
+
+
+_lock = threading.Lock()
+_backend = None
+
+
+def backend():
+    """The process's backend, chosen on first use."""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = select(RASTER_BACKEND)
+    return _backend
+
+
+def select(name):
+    if name == 'auto':
+        return fastest()
+    if name not in BACKENDS:
+        print(f"Raster: unknown backend {name!r}; drawing with pillow")
+        return PillowRaster()
+    try:
+        return BACKENDS[name]()
+    except ImportError as e:
+        print(f"Raster: {name} backend unavailable ({e}); drawing with pillow")
+        return PillowRaster()
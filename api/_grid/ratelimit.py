@@ -0,0 +1,187 @@
+"""Token-bucket rate limiting per client and per config (no Pillow here).
+
+A rule refills ``rate`` tokens per second up to ``burst``; each request
+takes one. Bucket state lives in a backend (``GRID_RATE_LIMIT_BACKEND``):
+
+* ``memory``: in this process, so every worker and instance has its own
+  buckets and a client gets the limit once per process (the default)
+* ``redis``: on the server at ``GRID_CACHE_URL``, shared by every instance
+* ``shm``: in a memory-mapped file next to ``GRID_CACHE_SHM_PATH``, shared
+  by the workers of one host
+
+The shared backends take a token in one atomic step (a Lua script on the
+server, a byte-range lock on the file). Each bucket is one number, the time
+it is full again: a request moves it on by ``1 / rate`` and is refused if
+that puts it more than ``burst`` tokens ahead. While the store is down,
+buckets fall back to this process.
+"""
+import collections
+import math
+import struct
+import threading
+import time
+
+from _grid.settings import (
+    CACHE_RETRY_AFTER, CACHE_SHM_PATH, CACHE_TIMEOUT, CACHE_URL, RATE_LIMIT_BACKEND, RATE_LIMIT_ENABLED,
+    RATE_LIMIT_MAX_KEYS, RATE_LIMITS,
+)
+from _grid.store import MmapStore, RespStore
+
+# Arena slot of the shm backend: a slot header and the 8-byte bucket
+SHM_SLOT_BYTES = 128
+
+
+class RateLimited(Exception):
+    """A bucket is empty (answered with a 429 and Retry-After)."""
+
+    def __init__(self, rule, retry_after):
+        super().__init__(f'too many requests ({rule}), retry in {retry_after}s')
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+class Rule:
+    __slots__ = ('name', 'rate', 'burst')
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+
+def parse_rules(spec):
+    """Parses ``"image=0.5:30,render=0.2:10"`` into {name: Rule}."""
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, limits = item.partition('=')
+        rate, _, burst = limits.partition(':')
+        rules[name] = Rule(name, float(rate), float(burst or rate))
+    return rules
+
+
+class MemoryBackend:
+    """Buckets in a bounded LRU dict: key -> (tokens, last refill time)."""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        """Takes a token from ``key``'s bucket; returns 0 if allowed, else seconds until one is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class SharedBackend:
+    """Buckets in a shared store; subclasses implement _take. While the store is down, in this process."""
+
+    def __init__(self, store):
+        self.store = store
+        self.fallback = MemoryBackend(RATE_LIMIT_MAX_KEYS)
+
+    def take(self, key, rate, burst, now):
+        """MemoryBackend.take, against the store's clock rather than ``now``."""
+        wait = self.store.attempt(lambda: self._take(f'ratelimit:{key}', rate, burst))
+        return self.fallback.take(key, rate, burst, now) if wait is None else wait
+
+
+class RedisBackend(SharedBackend):
+    """Buckets as keys on a Redis-protocol server, taken by a script that runs atomically there."""
+
+    # Times in ms on the server's clock; the key expires once its bucket is full
+    SCRIPT = b"""-- day-grid token bucket
+local now = redis.call('TIME')
+now = now[1] * 1000 + now[2] / 1000
+local interval, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local full = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), now) + interval
+local wait = full - now - burst * interval
+if wait > 0 then return math.ceil(wait) end
+redis.call('SET', KEYS[1], string.format('%.3f', full), 'PX', math.ceil(full - now))
+return 0
+"""
+
+    def _take(self, key, rate, burst):
+        args = repr(1000 / rate).encode('ascii'), repr(burst).encode('ascii')
+        return self.store.eval(self.SCRIPT, [key], args) / 1000
+
+
+class ShmBackend(SharedBackend):
+    """Buckets in an shm arena, taken under the lock of the key's set."""
+
+    FULL = struct.Struct('>d')  # Unix time the bucket is full again
+
+    def _take(self, key, rate, burst):
+        now, interval = time.time(), 1 / rate
+
+        def change(value):
+            full = max(self.FULL.unpack(value)[0] if value else now, now) + interval
+            wait = full - now - burst * interval
+            return (None, wait) if wait > 0 else (self.FULL.pack(full), 0.0)
+
+        return self.store.update(key, change, burst * interval)
+
+
+BACKENDS = {
+    'memory': lambda: MemoryBackend(RATE_LIMIT_MAX_KEYS),
+    'redis': lambda: RedisBackend(RespStore(CACHE_URL, CACHE_TIMEOUT, CACHE_RETRY_AFTER)),
+    'shm': lambda: ShmBackend(MmapStore(f'{CACHE_SHM_PATH}-ratelimit', RATE_LIMIT_MAX_KEYS * SHM_SLOT_BYTES,
+                                        SHM_SLOT_BYTES, CACHE_RETRY_AFTER)),
+}
+
+
+class RateLimiter:
+    """Applies named rules against a backend and counts what it lets through and turns away."""
+
+    def __init__(self, rules, backend, enabled=True):
+        self.rules = rules
+        self.backend = backend
+        self.enabled = enabled
+        self.allowed = collections.Counter()
+        self.rejected = collections.Counter()
+        self._limited_keys = {}  # rule -> set of keys rejected at least once (bounded)
+        self._lock = threading.Lock()
+
+    def check(self, rule_name, key):
+        """Charges one request to ``key`` under ``rule_name``; raises RateLimited if its bucket is empty."""
+        rule = self.rules.get(rule_name)
+        if not self.enabled or rule is None:
+            return
+        wait = self.backend.take(f'{rule_name}:{key}', rule.rate, rule.burst, time.monotonic())
+        with self._lock:
+            if not wait:
+                self.allowed[rule_name] += 1
+                return
+            self.rejected[rule_name] += 1
+            keys = self._limited_keys.setdefault(rule_name, set())
+            if len(keys) < RATE_LIMIT_MAX_KEYS:
+                keys.add(key)
+        raise RateLimited(rule_name, max(1, math.ceil(wait)))
+
+    def stats(self):
+        with self._lock:
+            return {name: {'allowed': self.allowed[name], 'rejected': self.rejected[name],
+                           'limited_keys': len(self._limited_keys.get(name, ())),
+                           'rate': rule.rate, 'burst': rule.burst}
+                    for name, rule in self.rules.items()}
+
+
+def make_backend(name):
+    if name not in BACKENDS:
+        print(f"Rate limit: unknown backend {name!r}; keeping buckets in memory")
+        name = 'memory'
+    return BACKENDS[name]()
+
+
+rate_limiter = RateLimiter(parse_rules(RATE_LIMITS), make_backend(RATE_LIMIT_BACKEND), RATE_LIMIT_ENABLED)
@@ -0,0 +1,290 @@
+"""Pillow renderer behind ``/api/image``."""
+import collections
+import functools
+import io
+import threading
+
+from PIL import Image, ImageFont
+
+from _grid.emoji import emoji_cache, get_emoji_image
+from _grid.layout import build_layout
+from _grid.memprofile import stage
+from _grid.palette import EMOJI_BASE, EMOJI_COLORS, INDEX, VARIANT_DIM, build_palette, theme_colors
+from _grid.png import encode_indexed_forks, encode_indexed_png, stream_indexed_png
+from _grid import raster
+from _grid.settings import (
+    CANVAS_MODE, EMOJI_CACHE_SIZE, FONT_PATH, FONT_SIGNATURE_PATH, FONT_SIGNATURE_SIZE, FONT_SIZE,
+    IMAGE_HEIGHT, IMAGE_WIDTH, WARM_TEXT_ON_IMPORT,
+)
+from _grid.text import center_x, draw_text, draw_text_indexed, warm_labels_in_background
+
+
+# --- Fonts ---
+@functools.lru_cache(maxsize=None)
+def get_font(path, size):
+    """Parses a font once per process; None if it cannot be loaded."""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return None
+
+
+def get_fonts():
+    font_small = get_font(FONT_PATH, FONT_SIZE) or ImageFont.load_default()
+    font_signature = get_font(FONT_SIGNATURE_PATH, FONT_SIGNATURE_SIZE) or font_small
+    return font_small, font_signature
+
+
+# --- Emoji ---
+resized_emoji_cache = collections.OrderedDict()
+_resized_emoji_lock = threading.Lock()
+
+def resized_emoji(emoji_char, size):
+    """Emoji scaled to a dot; failed downloads are not cached so they retry next request."""
+    key = (emoji_char, size)
+    with _resized_emoji_lock:
+        if key in resized_emoji_cache:
+            resized_emoji_cache.move_to_end(key)
+            return resized_emoji_cache[key]
+    emoji_img = get_emoji_image(emoji_char)
+    if emoji_img is None:
+        return None
+    resized = emoji_img.resize((size, size), Image.Resampling.LANCZOS)
+    with _resized_emoji_lock:
+        resized_emoji_cache[key] = resized
+        while len(resized_emoji_cache) > EMOJI_CACHE_SIZE:
+            resized_emoji_cache.popitem(last=False)
+    return resized
+
+
+@functools.lru_cache(maxsize=64)
+def emoji_block(keys):
+    """Quantizes the emoji of one render together into the palette's emoji range.
+
+    Returns (RGBA palette entries, {(char, size): P image of palette indices}).
+    Entries keep their alpha so the palette can flatten them onto any BG.
+    """
+    # Normally all cached by emoji_pieces; one evicted and failing since just drops out
+    resolved = [(key, im) for key, im in ((key, resized_emoji(*key)) for key in keys) if im is not None]
+    if not resolved:
+        return (), {}
+    images = [im for _, im in resolved]
+    sheet = Image.new('RGBA', (sum(im.width for im in images), max(im.height for im in images)), (0, 0, 0, 0))
+    x = 0
+    for im in images:
+        sheet.paste(im, (x, 0))
+        x += im.width
+    quantized = sheet.quantize(colors=EMOJI_COLORS, method=Image.Quantize.FASTOCTREE)
+    rgba = quantized.getpalette('RGBA')
+    entries = tuple(tuple(rgba[i:i + 4]) for i in range(0, len(rgba), 4))[:EMOJI_COLORS]
+
+    shift = bytes(min(i + EMOJI_BASE, 255) for i in range(256))
+    shifted = Image.frombytes('P', sheet.size, quantized.tobytes().translate(shift))
+    pieces, x = {}, 0
+    for key, im in resolved:
+        pieces[key] = shifted.crop((x, 0, x + im.width, im.height))
+        x += im.width
+    return entries, pieces
+
+
+def emoji_pieces(layout, indexed):
+    """Resolves the layout's emoji: {(char, size): (image, paste mask)} plus palette entries."""
+    keys = sorted({(char, grid.size) for grid in layout.grids for char in grid.emoji.values()})
+    images = {key: resized_emoji(*key) for key in keys}
+    keys = tuple(key for key in keys if images[key] is not None)
+    if not keys:
+        return {}, ()
+    if not indexed:
+        return {key: (images[key], images[key]) for key in keys}, ()
+    # Emoji cells sit on plain BG and transparent entries flatten to BG, so no mask is needed
+    entries, pieces = emoji_block(keys)
+    return {key: (piece, None) for key, piece in pieces.items()}, entries
+
+
+def draw_dot_grid(img, grid, ink, pieces):
+    """Draws a DotGrid: emoji pasted into their cells, every other dot by the raster backend."""
+    cells = grid.cells
+    if grid.emoji:
+        cells = [list(row) for row in cells]
+        for (r, c), char in grid.emoji.items():
+            piece = pieces.get((char, grid.size))
+            if piece is None:
+                continue  # Download failed, stays a SPECIAL dot
+            cells[r][c] = None
+            img.paste(piece[0], grid.cell_origin(r, c), piece[1])
+    raster.backend().dot_grid(img, grid, cells, ink)
+
+
+def render_image(config, now, canvas_mode=CANVAS_MODE):
+    """Draws the wallpaper for ``config`` as seen at the IST datetime ``now``.
+
+    The default 'P' canvas stores palette indices (see ``palette.py``), a
+    third of the memory of 'RGB', which is kept as the reference path.
+    """
+    return draw_wallpaper(config, now, canvas_mode)[0]
+
+
+def draw_wallpaper(config, now, canvas_mode, variant='lock'):
+    """render_image plus the emoji palette entries (None on an RGB canvas)."""
+    with stage('draw'):
+        colors = theme_colors(config)
+        layout = build_layout(config, now)
+        img = Image.new(canvas_mode, (IMAGE_WIDTH, IMAGE_HEIGHT), color=INDEX['BG'] if canvas_mode == 'P' else colors['BG'])
+        emoji_entries = draw_shared(img, config, layout, colors)
+        if variant == 'lock':
+            draw_lock_footer(img, config, layout, colors)
+        return finish_variant(img, colors, emoji_entries, variant)
+
+
+def write_text(img, xy, text, font, key, colors, cache=True):
+    if img.mode == 'P':
+        draw_text_indexed(img, xy, text, font, key, cache)
+    else:
+        draw_text(img, xy, text, font, colors[key], cache)
+
+
+def draw_shared(img, config, layout, colors):
+    """Draws what every variant shows (labels, dots, days-left line); returns the emoji palette entries."""
+    indexed = img.mode == 'P'
+    ink = INDEX if indexed else colors
+    font_small = get_fonts()[0]
+
+    for text, x, y, key in layout.labels:
+        write_text(img, (x, y), text, font_small, key, colors)
+    with stage('emoji'):
+        pieces, emoji_entries = emoji_pieces(layout, indexed)
+    for grid in layout.grids:
+        draw_dot_grid(img, grid, ink, pieces)
+
+    # --- Draw Bottom Info (Common) ---
+    text_x = center_x(layout.bottom_text, font_small, IMAGE_WIDTH)
+    write_text(img, (text_x, layout.footer_y), layout.bottom_text, font_small, 'ACTIVE', colors)
+    return emoji_entries
+
+
+def draw_lock_footer(img, config, layout, colors):
+    """Draws the lock screen's progress bar and signature, all at or below ``footer_split``."""
+    ink = INDEX if img.mode == 'P' else colors
+
+    # --- Draw Progress Bar ---
+    raster.backend().bars(img, layout.bar, ink)
+
+    # --- Draw Signature ---
+    if config.signature:
+        font_signature = get_fonts()[1]
+        # Signatures are free text: caching them would let visitors fill the tile cache
+        sig_x = center_x(config.signature, font_signature, IMAGE_WIDTH, cache=False)
+        write_text(img, (sig_x, layout.signature_y), config.signature, font_signature, 'TEXT', colors, cache=False)
+
+
+def footer_split(layout):
+    """First pixel row the lock footer can touch; variants are identical above it."""
+    return int(min(y0 for _, y0, _, _, _, _ in layout.bar))
+
+
+def finish_variant(img, colors, emoji_entries, variant):
+    """Applies the variant's dimming: in the palette when indexed, in the pixels on RGB."""
+    dim = VARIANT_DIM[variant]
+    if img.mode != 'P':
+        if dim < 1:
+            img = Image.blend(Image.new('RGB', img.size, colors['BG']), img, dim)
+        return img, None
+    img.putpalette(build_palette(colors, emoji_entries, dim))
+    return img, emoji_entries
+
+
+def render_png(config, now):
+    """Renders ``config`` for ``now`` and returns the PNG bytes."""
+    return render_entry(config, now)[0]
+
+
+def render_entry(config, now):
+    """Renders ``config`` into a cacheable ``(png, emoji_entries)`` pair for ``themed_png``."""
+    return render_entries(config, now)['lock']
+
+
+def render_entries(config, now, variants=('lock',)):
+    """Renders each variant into a cacheable entry in one pass: {variant: (png, emoji_entries)}.
+
+    On the indexed canvas the layout, dots and text are drawn once, and the
+    deflate stream over the rows the variants share is computed once and
+    forked for the rows below ``footer_split``.
+    """
+    if CANVAS_MODE != 'P' or len(variants) == 1:
+        entries = {}
+        for variant in variants:
+            img, emoji_entries = draw_wallpaper(config, now, CANVAS_MODE, variant)
+            with stage('encode'):
+                if img.mode == 'P':
+                    png = encode_indexed_png(IMAGE_WIDTH, IMAGE_HEIGHT, img.getpalette(), img.tobytes())
+                else:
+                    img_io = io.BytesIO()
+                    img.save(img_io, 'PNG')
+                    png = img_io.getvalue()
+            entries[variant] = (png, emoji_entries)
+        return entries
+
+    with stage('draw'):
+        colors = theme_colors(config)
+        layout = build_layout(config, now)
+        img = Image.new('P', (IMAGE_WIDTH, IMAGE_HEIGHT), color=INDEX['BG'])
+        emoji_entries = draw_shared(img, config, layout, colors)
+        split = footer_split(layout) * IMAGE_WIDTH
+        pixels = {'home': img.tobytes()}
+        draw_lock_footer(img, config, layout, colors)
+        pixels['lock'] = img.tobytes()
+
+    with stage('encode'):
+        pngs = encode_indexed_forks(
+            IMAGE_WIDTH, IMAGE_HEIGHT, pixels['lock'][:split],
+            [pixels[v][split:] for v in variants],
+            [build_palette(colors, emoji_entries, VARIANT_DIM[v]) for v in variants],
+        )
+    return {v: (png, emoji_entries) for v, png in zip(variants, pngs)}
+
+
+def stream_entry(config, now):
+    """Draws ``config`` and returns ``(PNG chunk iterator, emoji_entries)`` on the indexed canvas.
+
+    Drawing is done up front (a few ms); the deflate, which is most of the
+    cost, happens band by band as the iterator is consumed.
+    """
+    img, emoji_entries = draw_wallpaper(config, now, 'P')
+    palette = build_palette(theme_colors(config), emoji_entries)
+    return stream_indexed_png(IMAGE_WIDTH, IMAGE_HEIGHT, palette, img.tobytes()), emoji_entries
+
+
+def render_days(config, nows, variant='lock'):
+    """Yields the finished PNG of ``config`` for each IST datetime in ``nows``, in one pass.
+
+    Fonts, emoji and the palette are resolved once. On the indexed canvas
+    each day is drawn (about 1 ms) and only its bands that differ from
+    every cached one are deflated.
+    """
+    if CANVAS_MODE != 'P':
+        for now in nows:
+            img = draw_wallpaper(config, now, CANVAS_MODE, variant)[0]
+            with stage('encode'):
+                img_io = io.BytesIO()
+                img.save(img_io, 'PNG')
+            yield img_io.getvalue()
+        return
+    if not nows:
+        return
+    img, emoji_entries = draw_wallpaper(config, nows[0], 'P', variant)
+    palette = build_palette(theme_colors(config), emoji_entries, VARIANT_DIM[variant])
+    for i, now in enumerate(nows):
+        if i:
+            img = draw_wallpaper(config, now, 'P', variant)[0]
+        with stage('encode'):
+            png = encode_indexed_png(IMAGE_WIDTH, IMAGE_HEIGHT, palette, img.tobytes())
+        yield png
+
+
+def emoji_resolved(config):
+    """True once every emoji in ``config`` has downloaded, so a render is safe to cache."""
+    return all(not e or e in emoji_cache for e in config.special_dates.values())
+
+
+if WARM_TEXT_ON_IMPORT:
+    warm_labels_in_background(get_fonts()[0], IMAGE_WIDTH)
@@ -0,0 +1,148 @@
+"""Static configuration shared by the routes and the renderer (no Pillow here)."""
+import os
+import tempfile
+
+# --- Configuration & Themes ---
+IMAGE_WIDTH = 1170
+IMAGE_HEIGHT = 2532
+
+# Default (Year) Grid Settings
+GRID_COLS = 15
+GRID_ROWS = 25
+DOT_RADIUS = 18
+DOT_PADDING = 15
+
+# Define Color Palettes
+THEMES = {
+    'dark': {
+        'BG': (28, 28, 30),
+        'ACTIVE': (255, 105, 60),    # Orange
+        'PASSED': (255, 255, 255),   # White
+        'INACTIVE': (68, 68, 70),    # Dim Gray
+        'WEEKEND': (44, 44, 46),     # Darker Gray for Weekends
+        'SPECIAL': (255, 215, 0),    # Gold
+        'TEXT': (255, 255, 255)      # White Text
+    },
+    'light': {
+        'BG': (242, 242, 247),       # iOS Light Gray
+        'ACTIVE': (255, 105, 60),    # Orange
+        'PASSED': (60, 60, 67),      # Dark Gray (Completed)
+        'INACTIVE': (209, 209, 214), # Light Gray (Future)
+        'WEEKEND': (229, 229, 234),  # Slightly different gray
+        'SPECIAL': (255, 204, 0),    # Gold
+        'TEXT': (0, 0, 0)            # Black Text
+    }
+}
+
+# Font Paths
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_DIR = os.path.join(API_DIR, 'fonts')
+FONT_PATH = os.path.join(FONT_DIR, 'Roboto-Regular.ttf')
+FONT_SIGNATURE_PATH = os.path.join(FONT_DIR, 'Buffalo.otf')
+FONT_SIZE = 40
+FONT_SIGNATURE_SIZE = 55
+
+# Emoji source (override to point load tests at a local stand-in server)
+EMOJI_BASE_URL = os.environ.get('GRID_EMOJI_BASE_URL', 'https://cdnjs.cloudflare.com/ajax/libs/twemoji/14.0.2/72x72')
+
+# Emoji images kept per process, and how long a failed download is remembered before retrying
+EMOJI_CACHE_SIZE = int(os.environ.get('GRID_EMOJI_CACHE_SIZE', '128'))
+EMOJI_FETCH_TIMEOUT = float(os.environ.get('GRID_EMOJI_FETCH_TIMEOUT', '3'))
+EMOJI_RETRY_AFTER = float(os.environ.get('GRID_EMOJI_RETRY_AFTER', '60'))
+
+# Admission control: renders in flight per process, how long a request may
+# queue for a slot, and the Retry-After (seconds) sent when it cannot get one.
+# A miss for a wallpaper already being rendered waits for that render instead,
+# up to GRID_RENDER_COALESCE_WAIT seconds before rendering it itself
+RENDER_SLOTS = int(os.environ.get('GRID_RENDER_SLOTS', '4'))
+RENDER_SLOT_WAIT = float(os.environ.get('GRID_RENDER_SLOT_WAIT', '2'))
+RENDER_RETRY_AFTER = int(os.environ.get('GRID_RENDER_RETRY_AFTER', '2'))
+RENDER_COALESCE_WAIT = float(os.environ.get('GRID_RENDER_COALESCE_WAIT', '10'))
+
+# Token-bucket rate limits as "rule=tokens per second:burst". 'image',
+# 'layout' (the dashboard preview, one call per edit), 'archive' and 'static'
+# are charged per client on every request to their routes, 'render' per client
+# and config on every actual render (a miss no render in flight covers).
+# GRID_RATE_LIMIT=0 turns limiting off.
+RATE_LIMIT_ENABLED = os.environ.get('GRID_RATE_LIMIT', '1') == '1'
+RATE_LIMITS = os.environ.get('GRID_RATE_LIMITS', 'image=0.5:30,layout=5:120,render=0.2:10,archive=0.02:5,static=5:120')
+# Where buckets live (see ratelimit.py): 'memory' (per process, so the limits
+# multiply with workers and instances), 'redis' (the GRID_CACHE_URL server) or
+# 'shm' (the workers of one host, next to GRID_CACHE_SHM_PATH), and the buckets
+# kept per process (and per shm arena)
+RATE_LIMIT_BACKEND = os.environ.get('GRID_RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('GRID_RATE_LIMIT_MAX_KEYS', '10000'))
+# Behind Vercel's proxy the client is the first X-Forwarded-For hop; elsewhere it can be spoofed
+TRUST_FORWARDED_FOR = os.environ.get('GRID_TRUST_FORWARDED_FOR', '1' if os.environ.get('VERCEL') else '0') == '1'
+
+# Non-canonical /api/image URLs redirect to ?c=<token> so the edge caches one object per wallpaper
+CANONICAL_REDIRECTS = os.environ.get('GRID_CANONICAL_REDIRECTS', '1') == '1'
+# The redirect only changes when the token format does (a deploy purges the edge anyway)
+REDIRECT_MAX_AGE = int(os.environ.get('GRID_REDIRECT_MAX_AGE', '86400'))
+REDIRECT_S_MAXAGE = int(os.environ.get('GRID_REDIRECT_S_MAXAGE', '31536000'))
+
+# 'P' renders on an 8-bit indexed canvas (a third of the memory); 'RGB' is the reference path
+CANVAS_MODE = os.environ.get('GRID_CANVAS', 'P')
+
+# ASGI mode (asgi.py): threads for emoji downloads and shared-store calls,
+# and for requests bridged to the Flask app; renders get one per render slot
+ASGI_IO_THREADS = int(os.environ.get('GRID_ASGI_IO_THREADS', '32'))
+ASGI_WSGI_THREADS = int(os.environ.get('GRID_ASGI_WSGI_THREADS', '8'))
+
+# How dots and bars are drawn (see raster.py): 'pillow', 'numpy', or 'auto' for the
+# fastest one installed that matches Pillow's pixels, timed once per process (a few
+# hundred ms, at warm-up or the first render)
+RASTER_BACKEND = os.environ.get('GRID_RASTER', 'pillow')
+
+# Stream cache-miss PNGs band by band as they are compressed (indexed canvas only)
+STREAM_PNG = os.environ.get('GRID_STREAM_PNG', '1') == '1'
+
+# Rendered wallpapers kept per process (PNG bytes, keyed by config token and day)
+RENDER_CACHE_SIZE = int(os.environ.get('GRID_RENDER_CACHE_SIZE', '64'))
+
+# Store shared between instances behind the render and emoji caches (see store.py):
+# 'memory' (nothing shared), 'disk', 'redis' or 'shm' (workers of one host)
+CACHE_BACKEND = os.environ.get('GRID_CACHE_BACKEND', 'memory')
+CACHE_DIR = os.environ.get('GRID_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'day-grid-cache'))
+CACHE_URL = os.environ.get('GRID_CACHE_URL', 'redis://127.0.0.1:6379/0')
+# The shm arena: its file (tmpfs where there is one), total size and slot size; a
+# render entry is 13-20 KB and larger values are not stored
+CACHE_SHM_PATH = os.environ.get('GRID_CACHE_SHM_PATH', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'day-grid-cache'))
+CACHE_SHM_BYTES = int(os.environ.get('GRID_CACHE_SHM_BYTES', str(64 * 1024 * 1024)))
+CACHE_SHM_SLOT_BYTES = int(os.environ.get('GRID_CACHE_SHM_SLOT_BYTES', str(32 * 1024)))
+# A slow store must cost less than the render it saves
+CACHE_TIMEOUT = float(os.environ.get('GRID_CACHE_TIMEOUT', '0.25'))
+CACHE_RETRY_AFTER = float(os.environ.get('GRID_CACHE_RETRY_AFTER', '30'))
+# Downloaded emoji PNGs do not change; renders expire at IST midnight
+EMOJI_SHARED_TTL = int(os.environ.get('GRID_EMOJI_SHARED_TTL', str(7 * 86400)))
+
+# Deflated 64-row bands kept per process, so unchanged regions are never recompressed
+BAND_CACHE_BYTES = int(os.environ.get('GRID_BAND_CACHE_BYTES', str(16 * 1024 * 1024)))
+
+# Rasterized text tiles kept per process (footer labels, month names; never signatures),
+# and measured label widths
+TEXT_CACHE_BYTES = int(os.environ.get('GRID_TEXT_CACHE_BYTES', str(8 * 1024 * 1024)))
+TEXT_CACHE_SIZE = int(os.environ.get('GRID_TEXT_CACHE_SIZE', '1024'))
+WARM_TEXT_ON_IMPORT = os.environ.get('GRID_WARM_TEXT', '1') == '1'
+
+# Warm-up (see warmup.py) at worker boot, off the request path. Off on Vercel,
+# where a frozen instance cannot finish background work; its cron calls /api/warmup
+WARM_ON_BOOT = os.environ.get('GRID_WARM_ON_BOOT', '0' if os.environ.get('VERCEL') else '1') == '1'
+
+# Opt-in memory instrumentation (see memprofile.py): tracemalloc frames kept
+# per allocation, the render peak (bytes over baseline) that gets logged, and
+# how many recent renders /api/memory lists
+MEMORY_PROFILE = os.environ.get('GRID_MEMORY_PROFILE', '0') == '1'
+MEMORY_PROFILE_FRAMES = int(os.environ.get('GRID_MEMORY_PROFILE_FRAMES', '8'))
+MEMORY_LOG_THRESHOLD = int(os.environ.get('GRID_MEMORY_LOG_THRESHOLD', str(16 * 1024 * 1024)))
+MEMORY_RECENT = int(os.environ.get('GRID_MEMORY_RECENT', '50'))
+# Bearer token for admin endpoints (/api/memory); unset, they answer 404
+ADMIN_TOKEN = os.environ.get('GRID_ADMIN_TOKEN', '')
+
+# One JSON line per /api/image request (see accesslog.py) for tools/analyze_logs.py:
+# '-' writes to stdout, any other value is a file appended to; unset, nothing is logged
+ACCESS_LOG = os.environ.get('GRID_ACCESS_LOG', '')
+
+# Dashboard markup lives next to this module so importing it costs nothing
+DASHBOARD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.html')
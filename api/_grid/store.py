@@ -0,0 +1,394 @@
+"""Byte store shared between instances, behind the render and emoji caches (no Pillow here).
+
+Each process keeps its own in-memory caches; a shared store sits behind
+them so a wallpaper rendered on one instance (or gunicorn worker) is a hit
+on every other. ``GRID_CACHE_BACKEND`` picks it:
+
+* ``memory``: nothing shared, the in-process caches only (the default)
+* ``disk``: one file per key under ``GRID_CACHE_DIR``, for workers on one
+  host or instances on a shared volume
+* ``redis``: any server speaking the Redis protocol at ``GRID_CACHE_URL``
+  (``redis://[:password@]host:port/db``); ``bench/serve.py`` has a stand-in
+* ``shm``: a memory-mapped arena at ``GRID_CACHE_SHM_PATH`` (``/dev/shm``
+  by default) for the workers of one host: a hit is a hash, a few struct
+  reads and one copy out of the mapping, with no syscall
+
+Values are bytes with a TTL in seconds. A store that errors or times out is
+skipped for ``GRID_CACHE_RETRY_AFTER`` seconds: requests fall back to
+rendering (and downloading) locally instead of failing.
+"""
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+
+from _grid.settings import (
+    CACHE_BACKEND, CACHE_DIR, CACHE_RETRY_AFTER, CACHE_SHM_BYTES, CACHE_SHM_PATH, CACHE_SHM_SLOT_BYTES, CACHE_TIMEOUT,
+    CACHE_URL,
+)
+
+
+class StoreError(Exception):
+    """The shared store answered with an error."""
+
+
+class SharedStore:
+    """get/set with error counting and a back-off window; subclasses implement _get and _set."""
+
+    name = None
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        self.errors = 0
+        self._down_until = 0.0
+
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, e):
+        self.errors += 1
+        self._down_until = time.monotonic() + self.retry_after
+        print(f"Shared {self.name} store unavailable for {self.retry_after}s: {e}")
+
+    def attempt(self, call, default=None):
+        """``call()``, or ``default`` while the store is down or if the call fails (which starts the back-off)."""
+        if not self.available():
+            return default
+        try:
+            return call()
+        except (OSError, ValueError, StoreError) as e:
+            self._failed(e)
+            return default
+
+    def get(self, key):
+        """The value stored under ``key``, or None if missing, expired or the store is down."""
+        return self.attempt(lambda: self._get(key))
+
+    def set(self, key, value, ttl):
+        """Stores ``value`` for ``ttl`` seconds; silently skipped while the store is down."""
+        if ttl > 0:
+            self.attempt(lambda: self._set(key, value, ttl))
+
+    def stats(self):
+        return {'backend': self.name, 'available': self.available(), 'errors': self.errors}
+
+
+class DiskStore(SharedStore):
+    """Files named by key hash, each an 8-byte expiry (Unix time) followed by the value."""
+
+    name = 'disk'
+    PRUNE_EVERY = 256  # sets between sweeps for expired files
+
+    def __init__(self, directory, retry_after):
+        super().__init__(retry_after)
+        self.directory = directory
+        self._sets = 0
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < 8 or struct.unpack_from('>d', data)[0] < time.time():
+            self._remove(path)
+            return None
+        return data[8:]
+
+    def _set(self, key, value, ttl):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers on other processes never see half a file
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(struct.pack('>d', time.time() + ttl) + value)
+        os.replace(tmp, path)
+        self._sets += 1
+        if self._sets % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """Deletes every expired file."""
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'rb') as f:
+                        head = f.read(8)
+                except OSError:
+                    continue
+                if len(head) < 8 or struct.unpack('>d', head)[0] < now:
+                    self._remove(path)
+
+
+class RespStore(SharedStore):
+    """Minimal Redis-protocol client: GET and SET ... PX, one connection per thread."""
+
+    name = 'redis'
+
+    def __init__(self, url, timeout, retry_after):
+        super().__init__(retry_after)
+        parts = urllib.parse.urlsplit(url)
+        self.address = (parts.hostname or '127.0.0.1', parts.port or 6379)
+        self.password = parts.password
+        self.db = int(parts.path.strip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+            if self.password:
+                self._command(b'AUTH', self.password.encode('utf-8'))
+            if self.db:
+                self._command(b'SELECT', str(self.db).encode('ascii'))
+        return conn
+
+    def _command(self, *args):
+        sock, reader = self._connection()
+        try:
+            sock.sendall(b'*%d\r\n' % len(args) + b''.join(b'$%d\r\n%s\r\n' % (len(a), a) for a in args))
+            return self._reply(reader)
+        except OSError:
+            # A timed-out or broken connection may have a reply in flight; never reuse it
+            self._local.conn = None
+            sock.close()
+            raise
+
+    def _reply(self, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('connection closed mid-reply')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest
+        if kind == b'-':
+            raise StoreError(rest.decode('utf-8', 'replace'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            n = int(rest)
+            if n < 0:
+                return None
+            data = reader.read(n + 2)
+            if len(data) != n + 2:
+                raise ConnectionError('connection closed mid-reply')
+            return data[:-2]
+        if kind == b'*':
+            n = int(rest)
+            return None if n < 0 else [self._reply(reader) for _ in range(n)]
+        raise StoreError(f'unexpected reply {line[:20]!r}')
+
+    def _get(self, key):
+        return self._command(b'GET', key.encode('utf-8'))
+
+    def _set(self, key, value, ttl):
+        self._command(b'SET', key.encode('utf-8'), value, b'PX', str(int(ttl * 1000)).encode('ascii'))
+
+    def eval(self, script, keys, args):
+        """Runs the Lua ``script`` on the server, which runs it atomically (unguarded: see ``attempt``)."""
+        return self._command(b'EVAL', script, b'%d' % len(keys), *(k.encode('utf-8') for k in keys), *args)
+
+
+class MmapStore(SharedStore):
+    """Set-associative arena of fixed-size slots in a file every worker maps.
+
+    The file is a header followed by ``slots`` slots of ``slot_bytes``: a
+    slot header (key digest, expiry, last use, length, CRC-32) and the value.
+    A key hashes to one set of ``WAYS`` slots; a write takes the free,
+    expired or least recently used slot of its set, under a byte-range lock
+    on that set (and a thread lock, since record locks are per process).
+    Reads take no lock: a slot caught mid-write fails its digest or CRC
+    check and is a miss. Values larger than a slot are not stored.
+    """
+
+    name = 'shm'
+    MAGIC = b'DGSHM001'
+    FILE_HEADER = struct.Struct('>8sII')  # magic, slot bytes, slots
+    SLOT_HEADER = struct.Struct('>16sddII')  # key digest, expiry, last use (Unix time), length, CRC-32
+    LAST_USE = slice(24, 32)  # Stamped by readers without the lock, so left out of the torn-read check
+    SLOT_HEADER_BYTES = 64
+    WAYS = 8
+
+    def __init__(self, path, size, slot_bytes, retry_after):
+        super().__init__(retry_after)
+        self.slot_bytes = slot_bytes
+        self.slots = max(self.WAYS, size // slot_bytes // self.WAYS * self.WAYS)
+        self.sets = self.slots // self.WAYS
+        # One file per layout: a worker started with other settings never resizes a file others have mapped
+        self.path = f'{path}-{self.slots}x{slot_bytes}'
+        self.too_large = 0
+        self.torn = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        if self._map is not None:
+            return self._map
+        with self._lock:
+            if self._map is None:
+                length = self.SLOT_HEADER_BYTES + self.slots * self.slot_bytes
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX, self.SLOT_HEADER_BYTES, 0)
+                    try:
+                        header = self.FILE_HEADER.pack(self.MAGIC, self.slot_bytes, self.slots)
+                        if os.fstat(fd).st_size == 0:
+                            os.ftruncate(fd, length)  # Zero-filled: every slot empty
+                            os.pwrite(fd, header, 0)
+                        elif os.fstat(fd).st_size != length or os.pread(fd, len(header), 0) != header:
+                            raise ValueError(f'{self.path} is not a cache arena of this layout')
+                    finally:
+                        fcntl.lockf(fd, fcntl.LOCK_UN, self.SLOT_HEADER_BYTES, 0)
+                    self._map = mmap.mmap(fd, length)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+        return self._map
+
+    def _set_slots(self, digest):
+        first = int.from_bytes(digest[:8], 'big') % self.sets * self.WAYS
+        return range(first, first + self.WAYS)
+
+    def _offset(self, slot):
+        return self.SLOT_HEADER_BYTES + slot * self.slot_bytes
+
+    def _get(self, key):
+        mm = self._open()
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        now = time.time()
+        for slot in self._set_slots(digest):
+            offset = self._offset(slot)
+            header = mm[offset:offset + self.SLOT_HEADER.size]
+            slot_digest, expiry, _, length, crc = self.SLOT_HEADER.unpack(header)
+            if slot_digest != digest:
+                continue
+            if expiry < now:
+                return None
+            start = offset + self.SLOT_HEADER_BYTES
+            value = mm[start:start + min(length, self.slot_bytes - self.SLOT_HEADER_BYTES)]
+            reread = mm[offset:offset + self.SLOT_HEADER.size]
+            if zlib.crc32(value) != crc or self._identity(reread) != self._identity(header):
+                self.torn += 1  # Rewritten while it was read
+                return None
+            # Unlocked, so racing readers may both stamp it: either time keeps it recent
+            struct.pack_into('>d', mm, offset + self.LAST_USE.start, now)
+            return value
+        return None
+
+    def _identity(self, header):
+        """What a writer changes in a slot header: everything but the last-use stamp."""
+        return header[:self.LAST_USE.start] + header[self.LAST_USE.stop:]
+
+    @contextlib.contextmanager
+    def _locked(self, slots):
+        """Holds the write lock of one set: a thread lock, and a byte-range lock for other processes."""
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.WAYS * self.slot_bytes, self._offset(slots[0]))
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.WAYS * self.slot_bytes, self._offset(slots[0]))
+
+    def _write(self, mm, slots, digest, value, ttl, now):
+        """Writes ``value`` into the key's slot, a free or expired one, or the least recently used (locked)."""
+        victim, victim_rank = None, None
+        for slot in slots:
+            slot_digest, expiry, last_use, _, _ = self.SLOT_HEADER.unpack_from(mm, self._offset(slot))
+            if slot_digest == digest or expiry < now:
+                victim = slot
+                break
+            if victim_rank is None or last_use < victim_rank:
+                victim, victim_rank = slot, last_use
+        else:
+            self.evictions += 1
+        offset = self._offset(victim)
+        # Invalidate first, so a reader never pairs the old header with new bytes
+        mm[offset:offset + 16] = bytes(16)
+        start = offset + self.SLOT_HEADER_BYTES
+        mm[start:start + len(value)] = value
+        self.SLOT_HEADER.pack_into(mm, offset, digest, now + ttl, now, len(value), zlib.crc32(value))
+
+    def _set(self, key, value, ttl):
+        if len(value) > self.slot_bytes - self.SLOT_HEADER_BYTES:
+            self.too_large += 1
+            return
+        mm = self._open()
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        slots = self._set_slots(digest)
+        now = time.time()
+        with self._locked(slots):
+            self._write(mm, slots, digest, value, ttl, now)
+
+    def update(self, key, change, ttl):
+        """Read-modify-write of one key that no other worker can interleave with (unguarded: see ``attempt``).
+
+        ``change`` gets the live value (or None) and returns (new value, or
+        None to leave it as it is, result); ``update`` returns the result.
+        """
+        mm = self._open()
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        slots = self._set_slots(digest)
+        with self._locked(slots):
+            now = time.time()
+            value = None
+            for slot in slots:
+                offset = self._offset(slot)
+                slot_digest, expiry, _, length, _ = self.SLOT_HEADER.unpack_from(mm, offset)
+                if slot_digest == digest and expiry >= now:
+                    value = mm[offset + self.SLOT_HEADER_BYTES:offset + self.SLOT_HEADER_BYTES + length]
+                    break
+            value, result = change(value)
+            if value is not None:
+                if len(value) > self.slot_bytes - self.SLOT_HEADER_BYTES:
+                    raise ValueError(f'{len(value)} bytes do not fit a {self.slot_bytes}-byte slot')
+                self._write(mm, slots, digest, value, ttl, now)
+            return result
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({'path': self.path, 'slots': self.slots, 'slot_bytes': self.slot_bytes,
+                      'evictions': self.evictions, 'too_large': self.too_large, 'torn_reads': self.torn})
+        return stats
+
+
+STORES = {
+    'memory': lambda: None,
+    'disk': lambda: DiskStore(CACHE_DIR, CACHE_RETRY_AFTER),
+    'redis': lambda: RespStore(CACHE_URL, CACHE_TIMEOUT, CACHE_RETRY_AFTER),
+    'shm': lambda: MmapStore(CACHE_SHM_PATH, CACHE_SHM_BYTES, CACHE_SHM_SLOT_BYTES, CACHE_RETRY_AFTER),
+}
+
+
+def make_store(name):
+    if name not in STORES:
+        print(f"Shared cache: unknown backend {name!r}; using the in-process caches only")
+        name = 'memory'
+    return STORES[name]()
+
+
+shared_store = make_store(CACHE_BACKEND)
@@ -0,0 +1,146 @@
+"""Pre-measured, pre-rasterized text tiles.
+
+The footer label can only take a few hundred values a year, so FreeType
+runs once per (string, font, sub-pixel start) and every later draw is one
+alpha paste. Tiles are colourless ``L`` masks: the same tile serves every
+theme, the colour is applied by the paste. On the indexed canvas the mask
+is mapped once onto a palette ramp instead (see ``palette.py``).
+
+Tiles are kept in an LRU bounded in bytes. Text users choose (signatures)
+is drawn with ``cache=False`` and never enters it.
+"""
+import collections
+import functools
+import threading
+
+from PIL import Image, ImageDraw
+
+from _grid.layout import label_values
+from _grid.palette import coverage_lut
+from _grid.settings import CANVAS_MODE, TEXT_CACHE_BYTES, TEXT_CACHE_SIZE
+
+# Room for glyphs that reach left of or above the pen position
+TILE_PAD = 8
+
+# Days of footer labels warmed ahead: today's, and tomorrow's for the midnight turnover
+WARM_LABEL_DAYS = 2
+
+
+class TileCache:
+    """Thread-safe LRU of text tiles, bounded by the pixel bytes of the images in each entry."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._tiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None:
+                return None
+            self._tiles.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._tiles:
+                return
+            self._tiles[key] = (value, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._tiles.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+tile_cache = TileCache(TEXT_CACHE_BYTES)
+
+
+def rasterize(text, font, frac):
+    """Mask drawn exactly as ImageDraw.text would at an x with fractional part ``frac``."""
+    _, _, right, bottom = font.getbbox(text, mode='L')
+    tile = Image.new('L', (max(right, 0) + 2 * TILE_PAD, max(bottom, 0) + 2 * TILE_PAD), 0)
+    ImageDraw.Draw(tile).text((TILE_PAD + frac, TILE_PAD), text, font=font, fill=255)
+    return tile
+
+
+def text_tile(text, font, frac, cache=True):
+    """``rasterize``, from the tile cache unless ``cache`` is False."""
+    key = ('L', text, font, frac)
+    tile = tile_cache.get(key) if cache else None
+    if tile is None:
+        tile = rasterize(text, font, frac)
+        if cache:
+            tile_cache.put(key, tile, tile.width * tile.height)
+    return tile
+
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def text_width(text, font):
+    """Same width the renderer used to get from draw.textbbox."""
+    left, _, right, _ = font.getbbox(text, mode='L')
+    return right - left
+
+
+def draw_text(img, xy, text, font, color, cache=True):
+    """Drop-in for ``draw.text(xy, text, font=font, fill=color)`` on an RGB canvas."""
+    x, y = xy
+    ix, iy = int(x), int(y)
+    img.paste(color, (ix - TILE_PAD, iy - TILE_PAD), text_tile(text, font, x - ix, cache))
+
+
+def indexed_tile(text, font, frac, key, cache=True):
+    """(P tile of ramp indices for ``key``, binary mask of covered pixels)."""
+    cache_key = ('P', text, font, frac, key)
+    entry = tile_cache.get(cache_key) if cache else None
+    if entry is None:
+        # The L mask is only a step here; caching it too would hold a third copy of every label
+        indexes = rasterize(text, font, frac).point(coverage_lut(key))
+        covered = indexes.point(lambda i: 255 if i else 0)  # index 0 is BG
+        entry = Image.frombytes('P', indexes.size, indexes.tobytes()), covered
+        if cache:
+            tile_cache.put(cache_key, entry, 2 * indexes.width * indexes.height)
+    return entry
+
+
+def draw_text_indexed(img, xy, text, font, key, cache=True):
+    """draw_text for the indexed canvas: coverage snaps to ``key``'s anti-aliasing ramp."""
+    x, y = xy
+    ix, iy = int(x), int(y)
+    tile, covered = indexed_tile(text, font, x - ix, key, cache)
+    img.paste(tile, (ix - TILE_PAD, iy - TILE_PAD), covered)
+
+
+def center_x(text, font, width, cache=True):
+    measure = text_width if cache else text_width.__wrapped__
+    return (width - measure(text, font)) / 2
+
+
+def warm_labels(today, font, width):
+    """Measures and rasterizes the footer labels of today and the next few days."""
+    for text in label_values(today, WARM_LABEL_DAYS):
+        frac = center_x(text, font, width) % 1
+        if CANVAS_MODE == 'P':
+            indexed_tile(text, font, frac, 'ACTIVE')  # the footer's colour
+        else:
+            text_tile(text, font, frac)
+
+
+def warm_labels_in_background(font, width):
+    """Runs warm_labels off the request path; the first renders just fill the cache themselves."""
+    from _grid.config import ist_now
+    thread = threading.Thread(target=warm_labels, args=(ist_now().date(), font, width),
+                              name='grid-text-warm', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,130 @@
+"""Fills the per-process caches before the first real request needs them.
+
+``warm_up`` parses every font, fetches the dashboard's emoji, draws every
+mode once (dot strips, text tiles), builds each theme's palette and
+pre-renders today's default ``?theme=dark`` wallpaper into the render
+cache. It runs once per IST day per process; later calls return the
+report of the run that did the work.
+
+``preload`` is the same warm-up for a pre-forking master (gunicorn.conf.py):
+everything it builds is then frozen out of the garbage collector, so the
+workers' collections never write to those objects and their pages stay
+shared with the master instead of being copied into every worker.
+"""
+import concurrent.futures
+import datetime
+import gc
+import sys
+import threading
+import time
+
+from _grid.config import MODES, GridConfig, ist_now
+
+# A birthdate so life mode has something to draw
+WARM_BIRTHDATE = (1990, 1, 1)
+
+_lock = threading.Lock()
+_report = None
+
+
+def cache_sizes():
+    """Entries in each cache warm-up fills; the renderer's count as empty until it is imported."""
+    from _grid import palette
+    from _grid.cache import render_cache
+    sizes = {'fonts': 0, 'emoji': 0, 'dot_strips': 0, 'text_tiles': 0,
+             'palettes': palette._palette_for.cache_info().currsize, 'renders': len(render_cache)}
+    if '_grid.render' in sys.modules:
+        from _grid import emoji, raster, render, text
+        sizes.update({
+            'fonts': render.get_font.cache_info().currsize,
+            'emoji': len(emoji.emoji_cache),
+            'dot_strips': raster.dot_strip.cache_info().currsize,
+            'text_tiles': len(text.tile_cache),
+        })
+    return sizes
+
+
+def warm_up(now=None):
+    """Warms this process for ``now`` (IST, defaults to the current time) and returns a report.
+
+    The report has the total and per-step milliseconds and, per cache, how
+    many entries it now holds and how many this run added.
+    """
+    global _report
+    now = now or ist_now()
+    with _lock:
+        if _report is not None and _report['date'] == now.date().isoformat():
+            return dict(_report, already_warm=True)
+
+        before = cache_sizes()
+        started = time.perf_counter()
+
+        from _grid.cache import render_cache, render_key
+        from _grid.codec import EMOJI_TABLE
+        from _grid.emoji import get_emoji_image
+        from _grid import raster
+        from _grid.palette import themed_png
+        from _grid.render import get_fonts, render_entry, render_image
+        from _grid.settings import IMAGE_WIDTH, THEMES
+        from _grid.text import warm_labels
+
+        # Pillow and the renderer, when this is the process's first use of them
+        steps = {'import': round((time.perf_counter() - started) * 1000, 1)}
+
+        def step(name, fn):
+            t0 = time.perf_counter()
+            fn()
+            steps[name] = round((time.perf_counter() - t0) * 1000, 1)
+
+        step('fonts', get_fonts)
+        # With GRID_RASTER=auto this times the backends, once per process
+        step('raster', raster.backend)
+        # Downloads overlap; each one is bounded by the fetch timeout
+        with concurrent.futures.ThreadPoolExecutor(len(EMOJI_TABLE)) as pool:
+            step('emoji', lambda: list(pool.map(get_emoji_image, EMOJI_TABLE)))
+
+        birthdate = datetime.date(*WARM_BIRTHDATE)
+        step('modes', lambda: [render_image(GridConfig(mode=mode, birthdate=birthdate), now) for mode in MODES])
+        step('labels', lambda: warm_labels(now.date(), get_fonts()[0], IMAGE_WIDTH))
+
+        def default_render():
+            config = GridConfig(theme='dark')
+            key = render_key(config, now)
+            entry = render_cache.get(key)
+            if entry is None:
+                entry = render_entry(config, now)
+                render_cache.put(key, entry)
+            for theme in THEMES:
+                themed_png(entry, GridConfig(theme=theme))
+
+        step('default_render', default_render)
+
+        after = cache_sizes()
+        _report = {
+            'date': now.date().isoformat(),
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            'steps': steps,
+            'caches': {name: {'entries': after[name], 'added': after[name] - before[name]} for name in after},
+        }
+        return dict(_report, already_warm=False)
+
+
+def preload(now=None):
+    """Warms this process before it forks workers and freezes the result; returns the warm-up report.
+
+    Fonts, emoji, dot strips, text tiles, palettes and today's default render
+    are built once here. Their pixel and font data live in buffers outside
+    the Python heap that workers only read; ``gc.freeze`` keeps the
+    collector from touching the object headers that point at them.
+    """
+    report = warm_up(now)
+    gc.collect()
+    gc.freeze()
+    return dict(report, frozen_objects=gc.get_freeze_count())
+
+
+def warm_up_in_background():
+    """Runs warm_up in a daemon thread at worker boot; requests are served meanwhile."""
+    thread = threading.Thread(target=warm_up, name='grid-warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,251 @@
+"""ASGI entry point: ``/api/image`` on an event loop, every other route through the Flask app.
+
+A WSGI worker thread is tied up for the whole of a cache miss: the emoji
+downloads (one after another, each up to the fetch timeout) and then the
+render. Here a GET to ``/api/image`` is handled on the loop instead:
+
+* parsing, redirects, rate limits and cache hits are answered on the loop,
+  so hits keep flowing while renders are in flight
+* a miss downloads all of its emoji at once on the I/O pool, then waits
+  for a render slot (shed with a 503 after ``GRID_RENDER_SLOT_WAIT``) and
+  renders on the render pool, one thread per slot
+* everything else (the dashboard, fonts, archive, stats, admin routes) is
+  bridged to the Flask app on a thread pool, unchanged
+
+It lives next to gunicorn.conf.py rather than in api/, where Vercel would
+deploy it as a function of its own. Serve it with ``GRID_SERVER=asgi
+gunicorn -c gunicorn.conf.py`` (gunicorn's own asyncio worker) or any ASGI
+server: ``uvicorn asgi:app``.
+"""
+import asyncio
+import concurrent.futures
+import io
+import os
+import sys
+import urllib.parse
+
+# The Flask app this bridges to and the rendering core it shares live in api/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+
+from index import app as flask_app
+from _grid import accesslog
+from _grid.config import ConfigError, ist_now
+from _grid.emoji import emoji_cache, get_emoji_image
+from _grid.limits import Overloaded, render_slots
+from _grid.pipeline import ImageRequest, redirect_headers, refusal
+from _grid.ratelimit import RateLimited, rate_limiter
+from _grid.settings import (
+    ASGI_IO_THREADS, ASGI_WSGI_THREADS, RENDER_COALESCE_WAIT, RENDER_RETRY_AFTER, RENDER_SLOT_WAIT, RENDER_SLOTS,
+    TRUST_FORWARDED_FOR,
+)
+from _grid.store import shared_store
+
+# Threads start on first use, so a pre-forking master can import this safely
+io_pool = concurrent.futures.ThreadPoolExecutor(ASGI_IO_THREADS, thread_name_prefix='grid-io')
+render_pool = concurrent.futures.ThreadPoolExecutor(RENDER_SLOTS, thread_name_prefix='grid-render')
+wsgi_pool = concurrent.futures.ThreadPoolExecutor(ASGI_WSGI_THREADS, thread_name_prefix='grid-wsgi')
+
+_admission = None
+
+
+def admission():
+    """The loop-side gate in front of the render pool (created on the worker's own loop)."""
+    global _admission
+    if _admission is None:
+        _admission = asyncio.Semaphore(RENDER_SLOTS)
+    return _admission
+
+
+def query_args(scope):
+    """Query parameters, first value wins (what Flask's ``request.args.get`` returns)."""
+    args = {}
+    for name, value in urllib.parse.parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True):
+        args.setdefault(name, value)
+    return args
+
+
+def header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def client_ip(scope):
+    forwarded = header(scope, b'x-forwarded-for')
+    if TRUST_FORWARDED_FOR and forwarded:
+        return forwarded.split(',')[0].strip()
+    return scope['client'][0] if scope.get('client') else 'unknown'
+
+
+async def respond(send, status, body, headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-length', str(len(body)).encode('ascii'))]
+                + [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def resolve_emoji(config):
+    """Downloads every emoji of ``config`` not yet cached, concurrently; failures fall back as in a render."""
+    pending = {e for e in config.special_dates.values() if e and e not in emoji_cache}
+    if pending:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(io_pool, get_emoji_image, e) for e in pending))
+
+
+async def lookup(req):
+    # A shared store is a network or disk round trip: keep it off the loop
+    if shared_store is None:
+        return req.lookup()
+    return await asyncio.get_running_loop().run_in_executor(io_pool, req.lookup)
+
+
+async def follow(req):
+    """ImageRequest.follow without blocking the loop; the shield keeps a timeout from cancelling the flight."""
+    try:
+        landed = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(req.flight)), RENDER_COALESCE_WAIT)
+    except asyncio.TimeoutError:
+        landed = None
+    req.adopt(landed)
+
+
+async def image(scope, send):
+    """``/api/image`` as in index.generate_grid, buffered (no streamed misses)."""
+    now = ist_now()
+    record = accesslog.begin(now)
+    status, body, headers = await image_response(scope, now, record)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+        headers = [('Content-Type', 'text/html; charset=utf-8'), *headers]
+    accesslog.finish(record, status, len(body))
+    await respond(send, status, body, headers)
+
+
+async def image_response(scope, now, record):
+    """(status, body, headers) for an ``/api/image`` request, noting what happened on its access ``record``.
+
+    The steps are _grid/pipeline.py's, as in Flask; only the waiting differs.
+    """
+    try:
+        rate_limiter.check('image', client_ip(scope))
+    except RateLimited as e:
+        return refusal(e)
+    try:
+        req = ImageRequest(query_args(scope), now, record, client_ip(scope))
+    except ConfigError as e:
+        return 400, str(e), ()
+    headers = redirect_headers(req.canonical, scope['path'], scope['query_string'].decode('latin-1'))
+    if headers:
+        accesslog.note(record, cache='redirect')
+        return 301, b'', headers
+
+    try:
+        req.found(await lookup(req))
+        if req.missing and not req.leading:
+            await follow(req)
+    except RateLimited as e:
+        return refusal(e)
+    if req.missing:
+        try:
+            await resolve_emoji(req.config)
+            gate = admission()
+            try:
+                await asyncio.wait_for(gate.acquire(), RENDER_SLOT_WAIT)
+            except asyncio.TimeoutError:
+                render_slots.shed += 1
+                raise Overloaded(RENDER_RETRY_AFTER)
+            try:
+                await asyncio.get_running_loop().run_in_executor(render_pool, req.render)
+            finally:
+                gate.release()
+        except Overloaded as e:
+            # Shed here, or a bridged Flask render (an archive) held the process's slots
+            return refusal(e)
+        finally:
+            # Followers render for themselves if this request never got to (a no-op once it has)
+            req.land(None)
+    return (200, *req.reply())
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            name = f'HTTP_{name}'
+            environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    """Runs the Flask app to completion on a bridge thread: (status, headers, body)."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = int(status.split(' ', 1)[0]), headers
+
+    result = flask_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started['status'], started['headers'], body
+
+
+async def bridge(scope, receive, send):
+    body = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    loop = asyncio.get_running_loop()
+    status, headers, body = await loop.run_in_executor(wsgi_pool, call_wsgi, wsgi_environ(scope, b''.join(body)))
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for pool in (io_pool, render_pool, wsgi_pool):
+                pool.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    if scope['method'] == 'GET' and scope['path'] == '/api/image':
+        return await image(scope, send)
+    return await bridge(scope, receive, send)
@@ -0,0 +1,79 @@
+"""Period archive vs one request per day: time per image and pixel parity.
+
+For each mode, renders every day of a period twice in-process: once the way
+a device fetching ``/api/image`` daily costs the server (``render_entry`` +
+``themed_png`` per day) and once as ``/api/archive`` builds it
+(``build_archive``: one ``render_days`` pass), each from an empty band
+cache. Reports ms per image, the speedup, the archive size, and fails if
+any archived day decodes to different pixels than its single render.
+
+    python bench/archive_bench.py
+    python bench/archive_bench.py --period quarter
+"""
+import argparse
+import datetime
+import io
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+os.environ.setdefault('GRID_WARM_TEXT', '0')
+
+from PIL import Image
+
+from _grid.archive import archive_name, build_archive
+from _grid.config import parse_config
+from _grid.palette import themed_png
+from _grid.png import band_cache
+from _grid.render import get_fonts, render_entry
+
+NOW = datetime.datetime(2026, 10, 1, 9, 0, tzinfo=datetime.timezone.utc)
+
+CASES = {
+    'year': {'highlight_weekends': 'true', 'signature': 'archive'},
+    'segregated_months': {'mode': 'segregated_months', 'theme': 'light'},
+    'month': {'mode': 'month'},
+    'life (90y)': {'mode': 'life', 'birthdate': '1995-03-02'},
+    'years (13y)': {'mode': 'years', 'years': '2024-2036', 'highlight_weekends': 'true'},
+}
+
+
+def pixels(png):
+    return Image.open(io.BytesIO(png)).convert('RGB').tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--period', default='month', choices=('week', 'month', 'quarter'))
+    opts = parser.parse_args()
+
+    get_fonts()
+    failed = False
+    print(f"{'mode':<18} {'days':>5} {'per day':>9} {'archive':>9} {'speedup':>8} {'zip':>8}  parity")
+    for name, args in CASES.items():
+        config = parse_config(args)
+        build_archive(config, NOW, opts.period)  # text tiles and dot strips for every day, so neither side pays for them
+        band_cache.clear()  # and neither side reuses bands the other deflated
+        t0 = time.perf_counter()
+        body, days = build_archive(config, NOW, opts.period)
+        archive_ms = (time.perf_counter() - t0) * 1000 / len(days)
+
+        nows = [NOW] + [datetime.datetime.combine(day, NOW.timetz()) for day in days[1:]]
+        band_cache.clear()
+        t0 = time.perf_counter()
+        singles = [themed_png(render_entry(config, now), config) for now in nows]
+        single_ms = (time.perf_counter() - t0) * 1000 / len(days)
+
+        archive = zipfile.ZipFile(io.BytesIO(body))
+        mismatched = sum(pixels(archive.read(archive_name(day, 'lock'))) != pixels(png)
+                         for day, png in zip(days, singles))
+        failed |= bool(mismatched)
+        print(f"{name:<18} {len(days):>5} {single_ms:>7.1f}ms {archive_ms:>7.1f}ms {single_ms / archive_ms:>7.1f}x "
+              f"{len(body) / 1024:>6.0f}KB  {'ok' if not mismatched else f'{mismatched} days differ'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Concurrent connections: the Flask app on threads vs asgi.py on an event loop.
+
+Starts gunicorn with one worker twice: ``GRID_SERVER=wsgi`` (gthread, one
+thread per render slot) and ``GRID_SERVER=asgi``. Then, for each
+``--clients`` level, that many keep-alive connections send requests for
+``--seconds``. A ``--miss-share`` of them ask for a never-seen wallpaper
+with ``--emoji`` fresh emoji each time; the emoji stand-in delays every
+download by ``--emoji-latency`` ms, like a slow CDN. The rest ask for a
+cached wallpaper. Reports, per server and level:
+
+* hits served per second and their p50 / p99 latency while misses are in
+  flight
+* misses rendered, misses shed with a 503, and connection errors
+
+Needs gunicorn installed (its ``asgi`` worker is built in).
+
+    python bench/asgi_capacity.py
+    python bench/asgi_capacity.py --clients 16,64,256 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+from serve import ROOT, EmojiStandIn, free_port
+
+HIT_PATH = '/api/image?c=EAAA'
+# Codepoints the stand-in draws on demand; each miss takes ones no earlier request used
+EMOJI_START = 0x1F300
+
+
+class Client:
+    """One keep-alive connection issuing GETs back to back; reconnects after an error."""
+
+    def __init__(self, port, paths, results):
+        self.port = port
+        self.paths = paths
+        self.results = results
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.writer.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode('utf-8'))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+    async def run(self, deadline):
+        for path in self.paths:
+            if time.monotonic() >= deadline:
+                break
+            kind = 'hit' if path == HIT_PATH else 'miss'
+            t0 = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(self.get(path), max(0.1, deadline - time.monotonic() + 5))
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                self.results['errors'] += 1
+                self.close()
+                await asyncio.sleep(0.05)
+                continue
+            self.results[(kind, status)] = self.results.get((kind, status), 0) + 1
+            if kind == 'hit' and status == 200:
+                self.results['hit_ms'].append((time.perf_counter() - t0) * 1000)
+        self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def miss_paths(client, emoji_per_miss, counter):
+    n = 0
+    while True:
+        emoji = [chr(EMOJI_START + next(counter)) for _ in range(emoji_per_miss)]
+        dates = ','.join(f'{i + 1:02d}-{i + 1:02d}|{e}' for i, e in enumerate(emoji))
+        yield '/api/image?' + urllib.parse.urlencode({'signature': f'miss {client} {n}', 'dates': dates})
+        n += 1
+
+
+def hit_paths():
+    while True:
+        yield HIT_PATH
+
+
+async def load(port, clients, opts, counter):
+    results = {'errors': 0, 'hit_ms': []}
+    misses = max(1, round(clients * opts.miss_share))
+    deadline = time.monotonic() + opts.seconds
+    workers = [Client(port, miss_paths(i, opts.emoji, counter) if i < misses else hit_paths(), results)
+               for i in range(clients)]
+    await asyncio.gather(*(worker.run(deadline) for worker in workers))
+    return results
+
+
+def start_server(server, opts, emoji_url):
+    port = free_port()
+    env = dict(os.environ, GRID_SERVER=server, GRID_WORKERS='1', GRID_BIND=f'127.0.0.1:{port}',
+               GRID_EMOJI_BASE_URL=emoji_url, GRID_RATE_LIMIT='0', GRID_CANONICAL_REDIRECTS='0',
+               GRID_EMOJI_CACHE_SIZE='100000')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--backlog', '2048'],
+                            env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}{HIT_PATH}', timeout=30).read()
+            return proc, port
+        except OSError:
+            if time.monotonic() > deadline or proc.poll() is not None:
+                proc.kill()
+                raise RuntimeError(f'gunicorn ({server}) did not start')
+            time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', default='16,64,256', help='comma-separated concurrent connection counts')
+    parser.add_argument('--seconds', type=float, default=6)
+    parser.add_argument('--miss-share', type=float, default=0.25, help='fraction of connections requesting misses')
+    parser.add_argument('--emoji', type=int, default=3, help='fresh emoji per miss')
+    parser.add_argument('--emoji-latency', type=float, default=300, help='ms per emoji download')
+    opts = parser.parse_args()
+    levels = [int(c) for c in opts.clients.split(',')]
+
+    stand_in = EmojiStandIn(latency_ms=opts.emoji_latency).start()
+    counter = iter(range(10 ** 9))
+    rows = []
+    try:
+        for server in ('wsgi', 'asgi'):
+            proc, port = start_server(server, opts, stand_in.url)
+            try:
+                for clients in levels:
+                    rows.append((server, clients, asyncio.run(load(port, clients, opts, counter))))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=15)
+    finally:
+        stand_in.stop()
+
+    print(f'one worker, {opts.seconds:g}s per level, {opts.miss_share:.0%} of connections on misses '
+          f'({opts.emoji} emoji at {opts.emoji_latency:g} ms each)\n')
+    print(f"{'server':<6} {'conns':>5} {'hits/s':>8} {'hit p50':>9} {'hit p99':>9} {'misses':>7} {'503':>5} {'errors':>7}")
+    for server, clients, r in rows:
+        hit_ms = sorted(r['hit_ms'])
+        p50 = f'{statistics.median(hit_ms):.1f}ms' if hit_ms else '-'
+        p99 = f'{hit_ms[max(0, int(len(hit_ms) * 0.99) - 1)]:.1f}ms' if hit_ms else '-'
+        print(f"{server:<6} {clients:>5} {len(hit_ms) / opts.seconds:>8.0f} {p50:>9} {p99:>9} "
+              f"{r.get(('miss', 200), 0):>7} {r.get(('miss', 503), 0):>5} {r['errors']:>7}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Band-cached PNG encoder: decode equality and encode time.
+
+Checks, for every mode across a spread of configs and dates, that the
+band-cached encoder's PNG decompresses byte for byte to the canvas's
+scanlines, with a valid Adler-32, and that Pillow decodes it to the same
+pixels, cold and with the band cache warm. Then times encoding with
+Pillow, with one zlib pass, and with the band cache cold and warm. Warm
+means a first-seen config (its own signature and dates) encoded after the
+base configs, as on a live worker. Exits non-zero on any mismatch.
+
+    python bench/band_encoder.py
+    python bench/band_encoder.py -n 20
+"""
+import argparse
+import datetime
+import io
+import os
+import statistics
+import struct
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+os.environ.setdefault('GRID_WARM_TEXT', '0')
+
+from PIL import Image
+
+from _grid.config import parse_config
+from _grid.png import band_cache, encode_indexed_png, indexed_png, scanlines
+from _grid.render import draw_wallpaper
+from _grid.settings import IMAGE_HEIGHT, IMAGE_WIDTH
+
+CONFIGS = [
+    {},
+    {'theme': 'light', 'highlight_weekends': 'true', 'signature': 'Spandan'},
+    {'mode': 'segregated_months', 'dates': '01-26,08-15,10-02'},
+    {'mode': 'quarter', 'bar_style': 'solid'},
+    {'mode': 'month', 'signature': 'kiosk 4', 'bar_style': 'minimal'},
+    {'mode': 'fortnight', 'highlight_weekends': 'true'},
+    {'mode': 'life', 'birthdate': '1995-03-02', 'lifespan': '90'},
+    {'mode': 'years', 'years': '2024-2036', 'highlight_weekends': 'true'},
+]
+DATES = [datetime.date(2026, 1, 1), datetime.date(2026, 2, 28), datetime.date(2026, 10, 19), datetime.date(2026, 12, 31)]
+
+
+def idat(png):
+    """The concatenated IDAT payload of ``png``."""
+    pos, data = 8, []
+    while pos < len(png):
+        length, tag = struct.unpack_from('>I4s', png, pos)
+        if tag == b'IDAT':
+            data.append(png[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    return b''.join(data)
+
+
+def check(img):
+    """True if the band-cached PNG of ``img`` is exact, both cold and from a warm band cache."""
+    pixels, palette = img.tobytes(), img.getpalette()
+    for _ in ('cold', 'warm'):
+        png = encode_indexed_png(IMAGE_WIDTH, IMAGE_HEIGHT, palette, pixels)
+        # zlib.decompress verifies the stitched Adler-32 itself
+        if zlib.decompress(idat(png)) != scanlines(pixels, IMAGE_WIDTH):
+            return False
+        if Image.open(io.BytesIO(png)).tobytes() != pixels:
+            return False
+    return True
+
+
+def timed(fn, images, n):
+    samples = []
+    for _ in range(n):
+        for img in images:
+            t0 = time.perf_counter()
+            fn(img)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', type=int, default=5, help='timing rounds over all canvases')
+    opts = parser.parse_args()
+
+    canvases = [draw_wallpaper(parse_config(args), datetime.datetime.combine(day, datetime.time(9)), 'P')[0]
+                for args in CONFIGS for day in DATES]
+    bad = sum(not check(img) for img in canvases)
+    print(f"decode equality: {len(canvases) - bad}/{len(canvases)} canvases exact")
+
+    def pillow(img):
+        img.save(io.BytesIO(), 'PNG')
+
+    def one_pass(img):
+        indexed_png(IMAGE_WIDTH, IMAGE_HEIGHT, img.getpalette(), zlib.compress(scanlines(img.tobytes(), IMAGE_WIDTH), 6))
+
+    def banded(img):
+        encode_indexed_png(IMAGE_WIDTH, IMAGE_HEIGHT, img.getpalette(), img.tobytes())
+
+    def banded_cold(img):
+        band_cache.clear()
+        banded(img)
+
+    sizes = {
+        'pillow': statistics.mean(len((lambda b: (img.save(b, 'PNG'), b.getvalue())[1])(io.BytesIO())) for img in canvases),
+        'banded': statistics.mean(len(encode_indexed_png(IMAGE_WIDTH, IMAGE_HEIGHT, img.getpalette(), img.tobytes()))
+                                  for img in canvases),
+    }
+    results = [('Pillow save', timed(pillow, canvases, opts.n)),
+               ('one zlib pass', timed(one_pass, canvases, opts.n)),
+               ('banded, cache cold', timed(banded_cold, canvases, opts.n))]
+    # Same modes and days, but content the cache has never seen in the signature and special dates
+    fresh = [draw_wallpaper(parse_config(dict(args, signature=f'new device {i}', dates=f'{i % 12 + 1:02d}-{i % 28 + 1:02d}')),
+                            datetime.datetime.combine(day, datetime.time(9)), 'P')[0]
+             for i, (args, day) in enumerate((args, day) for args in CONFIGS for day in DATES)]
+    warm = []
+    for _ in range(opts.n):
+        band_cache.clear()
+        for img in canvases:
+            banded(img)
+        band_cache.hits = band_cache.misses = 0
+        warm.append(timed(banded, fresh, 1))
+    hit_ratio = band_cache.hits / max(1, band_cache.hits + band_cache.misses)
+    results.append(('banded, cache warm', statistics.median(warm)))
+
+    print(f"\n{'encoder':<20} {'median ms':>10}")
+    for name, ms in results:
+        print(f"{name:<20} {ms:>10.2f}")
+    print(f"\nwarm band hit ratio {hit_ratio:.0%} ({len(band_cache)} bands, {band_cache.size / 1024:.0f} KB cached); "
+          f"mean size {sizes['banded'] / 1024:.1f} KB banded vs {sizes['pillow'] / 1024:.1f} KB Pillow")
+    return 1 if bad else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
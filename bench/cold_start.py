@@ -0,0 +1,139 @@
+"""Cold-start harness: import time and first-request latency per route.
+
+Every sample runs in a fresh interpreter, exactly like a new serverless
+instance. Results are appended to ``bench/results/cold_start.jsonl`` so runs
+can be compared over time; ``-X importtime`` breakdowns are stored alongside.
+
+    python bench/cold_start.py                 # 5 samples per route
+    python bench/cold_start.py -n 10 --top 15
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, 'api')
+RESULTS_PATH = os.path.join(ROOT, 'bench', 'results', 'cold_start.jsonl')
+
+ROUTES = [
+    '/',
+    '/fonts/Roboto-Regular.ttf',
+    '/api/image?theme=dark',
+]
+
+# Runs inside the fresh interpreter; prints one JSON line with timings in ms
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {api_dir!r})
+import index
+t1 = time.perf_counter()
+response = index.app.test_client().get({route!r})
+response.get_data()
+t2 = time.perf_counter()
+print(json.dumps({{
+    'status': response.status_code,
+    'import_ms': (t1 - t0) * 1000,
+    'first_request_ms': (t2 - t1) * 1000,
+    'pil_loaded': 'PIL.Image' in sys.modules,
+}}))
+'''
+
+
+def run_probe(route, importtime=False):
+    """Runs one cold start in a new interpreter and returns (timings, stderr)."""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', PROBE.format(api_dir=API_DIR, route=route)]
+    # As on Vercel: no boot-time warm-up thread competing with the request
+    env = dict(os.environ, GRID_WARM_ON_BOOT='0', GRID_CANONICAL_REDIRECTS='0')
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f"probe for {route} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(stderr, top):
+    """Aggregates ``-X importtime`` self times per top-level package."""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        head, _, name = line.split('|', 2)
+        root = name.strip().split('.')[0]
+        packages[root] = packages.get(root, 0) + int(head.split(':', 1)[1])
+    ranked = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [{'module': name, 'self_ms': round(us / 1000, 2)} for name, us in ranked]
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=ROOT)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_previous():
+    if not os.path.exists(RESULTS_PATH):
+        return None
+    with open(RESULTS_PATH) as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--samples', type=int, default=5, help='fresh interpreters per route')
+    parser.add_argument('--top', type=int, default=10, help='modules to keep from -X importtime')
+    parser.add_argument('--no-save', action='store_true', help='do not append to the results history')
+    opts = parser.parse_args()
+
+    record = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git': git_revision(),
+        'python': sys.version.split()[0],
+        'routes': {},
+    }
+
+    for route in ROUTES:
+        samples = [run_probe(route)[0] for _ in range(opts.samples)]
+        statuses = {s['status'] for s in samples}
+        _, stderr = run_probe(route, importtime=True)
+        record['routes'][route] = {
+            'status': sorted(statuses),
+            'import_ms': round(statistics.median(s['import_ms'] for s in samples), 2),
+            'first_request_ms': round(statistics.median(s['first_request_ms'] for s in samples), 2),
+            'pil_loaded': any(s['pil_loaded'] for s in samples),
+            'importtime_top': parse_importtime(stderr, opts.top),
+        }
+
+    previous = load_previous()
+    print(f"{'route':<32} {'import':>9} {'first req':>10} {'total':>9}  PIL")
+    for route, r in record['routes'].items():
+        total = r['import_ms'] + r['first_request_ms']
+        delta = ''
+        if previous and route in previous.get('routes', {}):
+            p = previous['routes'][route]
+            delta = f"  ({total - p['import_ms'] - p['first_request_ms']:+.1f} ms vs {previous.get('git') or 'last run'})"
+        print(f"{route:<32} {r['import_ms']:>7.1f}ms {r['first_request_ms']:>8.1f}ms {total:>7.1f}ms  {'yes' if r['pil_loaded'] else 'no'}{delta}")
+
+    slowest = record['routes'][ROUTES[-1]]['importtime_top']
+    print(f"\n-X importtime, {ROUTES[-1]} (self time per top-level package):")
+    for entry in slowest:
+        print(f"  {entry['module']:<24} {entry['self_ms']:>8.2f} ms")
+
+    if not opts.no_save:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"\nAppended to {os.path.relpath(RESULTS_PATH, ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Parity of the dashboard's canvas preview with the server PNG.
+
+For a spread of configs, fetches ``/api/layout`` and ``/api/image`` from
+the app in-process, runs the dashboard's own ``drawLayout`` under Node
+against a recording 2D context, and checks every drawn shape against the
+PNG: each dot's centre pixel and each bar block's centre pixel must be
+exactly the colour the preview used, every dot the server drew must be
+drawn, and every text must appear in its colour on the row band the
+preview put it. Emoji cells are skipped (the preview loads them itself).
+Needs ``node`` on PATH. Exits non-zero on any mismatch.
+
+    python bench/layout_parity.py
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, 'api')
+DASHBOARD = os.path.join(API_DIR, '_grid', 'dashboard.html')
+
+CASES = [
+    'theme=dark',
+    'theme=light&highlight_weekends=true&bar_style=solid',
+    'mode=segregated_months&signature=Make it count&dates=10-25|🍰,12-25',
+    'mode=quarter&bar_style=minimal&accent=33ccff&bg=101820',
+    'mode=month&highlight_weekends=true',
+    'mode=fortnight&theme=light&signature=hello',
+    'mode=life&birthdate=1995-03-02&lifespan=80',
+    'mode=years&years=2024-2036&highlight_weekends=true',
+]
+
+# Runs drawLayout against a 2D context that records what it is asked to fill
+RECORDER = r'''
+const ops = [];
+const ctx = {
+    fillStyle: null, font: '', textAlign: 'left', textBaseline: 'alphabetic', path: null,
+    fillRect(x, y, w, h) { ops.push(['rect', this.fillStyle, x, y, w, h]); },
+    beginPath() { this.path = null; },
+    arc(x, y, r) { this.path = ['arc', x, y, r]; },
+    roundRect(x, y, w, h, r) { this.path = ['rrect', x, y, w, h, r]; },
+    fill() { ops.push([this.path[0], this.fillStyle, ...this.path.slice(1)]); },
+    measureText() { return { fontBoundingBoxAscent: 0, width: 0 }; },
+    fillText(text, x, y) { ops.push(['text', this.fillStyle, text, x, y, this.textAlign, this.font]); },
+    drawImage() { ops.push(['image']); },
+};
+const layouts = JSON.parse(require('fs').readFileSync(process.argv[2], 'utf8'));
+console.log(JSON.stringify(layouts.map(layout => { ops.length = 0; drawLayout(ctx, layout, null); return ops.slice(); })));
+'''
+
+
+def preview_source():
+    html = open(DASHBOARD, encoding='utf-8').read()
+    start = html.index('// --- CANVAS PREVIEW ---')
+    return html[start:html.index('// --- LIVE PREVIEW ---', start)]
+
+
+def hex_rgb(value):
+    return tuple(bytes.fromhex(value.lstrip('#')))
+
+
+def check_case(query, layout, ops, img):
+    problems = []
+    px = img.load()
+    emoji_cells = {(g['x'] + c * g['pitch_x'], g['y'] + r * g['pitch_y'])
+                   for g in layout['grids'] for r, c, _, _ in g['emoji']}
+    dots = sum(len(row) - row.count('.') for g in layout['grids'] for row in g['rows'])
+    arcs = [op for op in ops if op[0] == 'arc']
+    if len(arcs) != dots:
+        problems.append(f'{len(arcs)} dots drawn for {dots} cells')
+    for _, color, cx, cy, radius in arcs:
+        origin = (round(cx - radius), round(cy - radius))
+        if origin in emoji_cells:
+            continue
+        got = px[int(cx), int(cy)]
+        if got != hex_rgb(color):
+            problems.append(f'dot at {origin}: preview {color}, server {got}')
+
+    rects = [op for op in ops if op[0] == 'rrect']
+    for i, (_, color, x, y, w, h, radius) in enumerate(rects):
+        # Sample where no later block (the solid bar's fill) is drawn over this one
+        later = rects[i + 1:]
+        points = [(x + w / 2, y + h / 2), (x + w - radius - 1, y + h / 2)]
+        points = [(sx, sy) for sx, sy in points
+                  if not any(lx <= sx <= lx + lw and ly <= sy <= ly + lh for _, _, lx, ly, lw, lh, _ in later)]
+        if not points:
+            continue
+        got = px[int(points[0][0]), int(points[0][1])]
+        if got != hex_rgb(color):
+            problems.append(f'bar block at {x:.0f}: preview {color}, server {got}')
+
+    for _, color, text, x, y, align, font in (op for op in ops if op[0] == 'text'):
+        size = int(font.split('px')[0])
+        # The recorder's ascent is 0, so y is the top of the line box
+        left, right = (0, img.width) if align == 'center' else (int(x), min(img.width, int(x + size * len(text))))
+        band = img.crop((left, int(y), right, int(y + size * 1.3)))
+        if hex_rgb(color) not in {c for _, c in band.getcolors(1 << 16) or []}:
+            problems.append(f'text {text!r} not found in {color} at y={y}')
+
+    if px[0, 0] != hex_rgb(layout['colors']['BG']):
+        problems.append('background differs')
+    return problems
+
+
+def main():
+    os.environ.setdefault('GRID_WARM_TEXT', '0')
+    os.environ.setdefault('GRID_WARM_ON_BOOT', '0')
+    os.environ.setdefault('GRID_RATE_LIMIT', '0')
+    # An unreachable emoji source: the server falls back to gold dots, like the preview without images
+    os.environ.setdefault('GRID_EMOJI_BASE_URL', 'http://127.0.0.1:9')
+    sys.path.insert(0, API_DIR)
+    import index
+    from PIL import Image
+
+    client = index.app.test_client()
+    layouts, images = [], []
+    for query in CASES:
+        layouts.append(client.get('/api/layout?' + query).get_json())
+        images.append(Image.open(io.BytesIO(client.get('/api/image?' + query, follow_redirects=True).data)).convert('RGB'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script, data = os.path.join(tmp, 'preview.js'), os.path.join(tmp, 'layouts.json')
+        with open(script, 'w', encoding='utf-8') as f:
+            f.write(preview_source() + RECORDER)
+        with open(data, 'w', encoding='utf-8') as f:
+            json.dump(layouts, f)
+        out = subprocess.run(['node', script, data], capture_output=True, text=True, check=True)
+    recorded = json.loads(out.stdout)
+
+    failed = 0
+    for query, layout, ops, img in zip(CASES, layouts, recorded, images):
+        problems = check_case(query, layout, ops, img)
+        shapes = sum(1 for op in ops if op[0] in ('arc', 'rrect', 'text'))
+        print(f"{'ok  ' if not problems else 'FAIL'} {shapes:5} shapes  {query}")
+        for p in problems[:5]:
+            print(f"       {p}")
+        failed += bool(problems)
+    print(f"\n{failed} of {len(CASES)} configs differ" if failed else f"\npreview matches the server PNG for {len(CASES)} configs")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Peak memory and latency of concurrent renders, RGB canvas vs palette canvas.
+
+Each canvas mode runs in its own fresh interpreter (``GRID_CANVAS``), renders
+``--threads`` wallpapers at once for ``--rounds`` rounds, and reports the peak
+RSS (``VmHWM``) growth over the warmed-up baseline along with render+PNG
+latency. Linux only (reads ``/proc/self/status``).
+
+    python bench/memory_bench.py
+    python bench/memory_bench.py --threads 16 --rounds 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, 'api')
+
+CANVAS_MODES = ('RGB', 'P')
+
+# Runs inside the fresh interpreter; prints one JSON line
+PROBE = r'''
+import datetime, io, json, statistics, sys, threading, time
+sys.path.insert(0, {api_dir!r})
+from _grid.config import parse_config
+from _grid.render import render_image
+
+NOW = datetime.datetime(2026, 10, 19, 9, 0)
+CONFIGS = [parse_config(a) for a in (
+    {{'theme': 'dark'}},
+    {{'theme': 'light', 'mode': 'segregated_months', 'signature': 'Make it count'}},
+    {{'mode': 'life', 'birthdate': '1995-03-02'}},
+    {{'mode': 'years', 'years': '2024-2036', 'highlight_weekends': 'true'}},
+)]
+
+def status(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+
+def render(i, times):
+    t0 = time.perf_counter()
+    out = io.BytesIO()
+    render_image(CONFIGS[i % len(CONFIGS)], NOW).save(out, 'PNG')
+    times.append((time.perf_counter() - t0) * 1000)
+
+for i in range(len(CONFIGS)):
+    render(i, [])  # fonts, dot strips, text tiles
+baseline = status('VmHWM')
+times = []
+for _ in range({rounds}):
+    threads = [threading.Thread(target=render, args=(i, times)) for i in range({threads})]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+times.sort()
+print(json.dumps({{
+    'baseline_mb': baseline / 2**20,
+    'peak_growth_mb': (status('VmHWM') - baseline) / 2**20,
+    'p50_ms': statistics.median(times),
+    'p95_ms': times[int(len(times) * 0.95) - 1],
+}}))
+'''
+
+
+def probe(canvas_mode, threads, rounds):
+    env = dict(os.environ, GRID_CANVAS=canvas_mode, GRID_WARM_TEXT='0')
+    code = PROBE.format(api_dir=API_DIR, threads=threads, rounds=rounds)
+    out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='renders in flight at once')
+    parser.add_argument('--rounds', type=int, default=3)
+    opts = parser.parse_args()
+
+    rows = {mode: probe(mode, opts.threads, opts.rounds) for mode in CANVAS_MODES}
+    print(f"{'canvas':<8} {'baseline':>10} {'peak growth':>12} {'p50':>10} {'p95':>10}")
+    for mode, r in rows.items():
+        print(f"{mode:<8} {r['baseline_mb']:>8.1f}MB {r['peak_growth_mb']:>10.1f}MB "
+              f"{r['p50_ms']:>8.1f}ms {r['p95_ms']:>8.1f}ms")
+    if rows['P']['peak_growth_mb'] > 0:
+        print(f"\npeak growth RGB/P: {rows['RGB']['peak_growth_mb'] / rows['P']['peak_growth_mb']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
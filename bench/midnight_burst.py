@@ -0,0 +1,253 @@
+"""Midnight-burst load generator simulating Shortcuts clients.
+
+Replays the 00:01 automation spike from the README: arrivals ramp up to a peak
+rate, hold, then decay, and every request picks a config from a long-tail
+(Zipf) population of dashboard-style query strings. The app runs on a local
+threaded WSGI server (see ``bench/serve.py``) and emoji come from a local
+stand-in, so nothing leaves the machine.
+
+    python bench/midnight_burst.py
+    python bench/midnight_burst.py --shape 2,10,5 --peak-rps 80 --configs 5000
+    python bench/midnight_burst.py --mix mix.json --json report.json
+    python bench/midnight_burst.py --rate-limit --devices 2000
+
+``--mix`` takes a JSON file overriding any of the weights in ``DEFAULT_MIX``.
+Rate limiting is off unless ``--rate-limit``: then it runs with the default
+rules and every request comes from one of ``--devices`` phones (its
+X-Forwarded-For), so configs shared by many devices meet the render limit
+the way they do in production.
+"""
+import argparse
+import bisect
+import concurrent.futures
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from serve import AppServer, EmojiStandIn
+
+# Weights mirror the dashboard options; the default config dominates real traffic
+DEFAULT_MIX = {
+    'default_share': 0.35,  # plain ?theme=dark from "Get The Grid"
+    'mode': {'year': 55, 'segregated_months': 15, 'month': 12, 'quarter': 8, 'fortnight': 10},
+    'theme': {'dark': 80, 'light': 20},
+    'bar_style': {'segmented': 70, 'solid': 20, 'minimal': 10},
+    'highlight_weekends': 0.3,
+    'signature': 0.4,
+    'dates_per_config': {'0': 30, '1': 30, '2': 20, '3': 10, '5': 7, '10': 3},
+    'emoji': {'': 50, '🍰': 12, '❤️': 12, '🚀': 6, '💰': 5, '✈️': 8, '💀': 3, '🍺': 4},
+}
+
+SIGNATURES = ['Spandan', 'Amit', 'carpe diem', 'Tick tock', 'K.', 'Stay hungry', 'Memento mori', 'Do it now']
+
+
+def weighted(rng, table):
+    keys = list(table)
+    return rng.choices(keys, weights=[table[k] for k in keys])[0]
+
+
+def make_config(rng, mix):
+    """Builds one dashboard-style query string."""
+    if rng.random() < mix['default_share']:
+        return 'theme=dark'
+    params = []
+    dates = set()
+    for _ in range(int(weighted(rng, mix['dates_per_config']))):
+        # Birthdays spread over the year, a few dates everybody shares
+        if rng.random() < 0.3:
+            m, d = rng.choice([(1, 1), (2, 14), (10, 31), (12, 25), (12, 31)])
+        else:
+            m, d = rng.randint(1, 12), rng.randint(1, 28)
+        entry = f"{m:02d}-{d:02d}"
+        emoji = weighted(rng, mix['emoji'])
+        dates.add(entry + (f"|{emoji}" if emoji else ''))
+    if dates:
+        params.append(('dates', ','.join(sorted(dates))))
+    params.append(('theme', weighted(rng, mix['theme'])))
+    if rng.random() < mix['signature']:
+        params.append(('signature', rng.choice(SIGNATURES) + ('' if rng.random() < 0.7 else f" {rng.randint(1, 99)}")))
+    mode = weighted(rng, mix['mode'])
+    if mode != 'year':
+        params.append(('mode', mode))
+    bar_style = weighted(rng, mix['bar_style'])
+    if bar_style != 'segmented':
+        params.append(('bar_style', bar_style))
+    if rng.random() < mix['highlight_weekends']:
+        params.append(('highlight_weekends', 'true'))
+    return urllib.parse.urlencode(params)
+
+
+class ZipfPopulation:
+    """Samples config ranks with probability proportional to 1 / rank**s."""
+
+    def __init__(self, rng, mix, size, s):
+        self.rng = rng
+        self.configs = [make_config(rng, mix) for _ in range(size)]
+        cumulative, total = [], 0.0
+        for rank in range(1, size + 1):
+            total += 1 / rank ** s
+            cumulative.append(total)
+        self.cumulative = cumulative
+
+    def sample(self):
+        x = self.rng.random() * self.cumulative[-1]
+        return self.configs[bisect.bisect_left(self.cumulative, x)]
+
+
+def arrival_times(ramp, hold, decay, peak_rps):
+    """Yields send offsets (seconds) for a ramp/hold/decay rate curve."""
+    duration = ramp + hold + decay
+
+    def rate(t):
+        if t < ramp:
+            return peak_rps * t / ramp
+        if t < ramp + hold:
+            return peak_rps
+        return peak_rps * max(0.0, (duration - t) / decay) if decay else 0.0
+
+    # Integrate the rate curve in 10 ms steps and emit one request per unit
+    t, step, acc = 0.0, 0.01, 0.0
+    while t < duration:
+        acc += rate(t) * step
+        while acc >= 1:
+            acc -= 1
+            yield t
+        t += step
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def device_ip(n):
+    return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+def fire(url, timeout, device=None):
+    request = urllib.request.Request(url, headers={'X-Forwarded-For': device} if device else {})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            size = len(response.read())
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status, size = e.code, 0
+    except OSError:
+        status, size = 'error', 0
+    return status, time.perf_counter() - start, size
+
+
+def run(opts, mix):
+    rng = random.Random(opts.seed)
+    population = ZipfPopulation(rng, mix, opts.configs, opts.zipf)
+    ramp, hold, decay = opts.shape
+    schedule = list(arrival_times(ramp, hold, decay, opts.peak_rps))
+
+    emoji = EmojiStandIn(latency_ms=opts.emoji_latency_ms).start()
+    server = AppServer(env={'GRID_EMOJI_BASE_URL': emoji.url, 'GRID_RATE_LIMIT': '1' if opts.rate_limit else '0',
+                             'GRID_TRUST_FORWARDED_FOR': '1', 'GRID_CANONICAL_REDIRECTS': '0'}).start()
+    results = []
+    peak_sampler_stop = threading.Event()
+    peak_rss = [0]
+
+    def sample_memory():
+        while not peak_sampler_stop.wait(0.1):
+            rss = server.memory()['rss'] or 0
+            peak_rss[0] = max(peak_rss[0], rss)
+
+    baseline = server.memory()
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    try:
+        print(f"{len(schedule)} requests over {ramp + hold + decay:g}s (peak {opts.peak_rps} rps), "
+              f"{opts.configs} configs, zipf s={opts.zipf}, {opts.clients} clients"
+              + (f", rate limited, {opts.devices} devices" if opts.rate_limit else ''))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=opts.clients) as pool:
+            futures = []
+            started = time.perf_counter()
+            for offset in schedule:
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                url = f"{server.url}/api/image?{population.sample()}"
+                device = device_ip(rng.randrange(opts.devices)) if opts.rate_limit else None
+                futures.append(pool.submit(fire, url, opts.timeout, device))
+            for future in futures:
+                results.append(future.result())
+            elapsed = time.perf_counter() - started
+        memory = server.memory()
+    finally:
+        peak_sampler_stop.set()
+        server.stop()
+        emoji.stop()
+
+    latencies = sorted(r[1] * 1000 for r in results)
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = statuses.get('200', 0)
+    return {
+        'requests': len(results),
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(ok / elapsed, 1) if elapsed else None,
+        'error_rate': round(1 - ok / len(results), 4) if results else None,
+        'statuses': statuses,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 1) if latencies else None,
+            **{f"p{p}": round(percentile(latencies, p), 1) for p in (50, 90, 99, 99.9)},
+            'max': round(latencies[-1], 1) if latencies else None,
+        },
+        'bytes_out': sum(r[2] for r in results),
+        'emoji_fetches': emoji.hits,
+        'memory_mb': {
+            'rss_before': round((baseline['rss'] or 0) / 2**20, 1),
+            'rss_after': round((memory['rss'] or 0) / 2**20, 1),
+            'rss_peak_sampled': round(peak_rss[0] / 2**20, 1),
+            'high_water_mark': round((memory['peak_rss'] or 0) / 2**20, 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shape', default='3,10,5', help='ramp,hold,decay seconds (default 3,10,5)')
+    parser.add_argument('--peak-rps', type=float, default=30)
+    parser.add_argument('--configs', type=int, default=2000, help='distinct configs in the population')
+    parser.add_argument('--zipf', type=float, default=1.1, help='popularity skew exponent')
+    parser.add_argument('--clients', type=int, default=64, help='max concurrent connections')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--emoji-latency-ms', type=float, default=40, help='simulated CDN latency')
+    parser.add_argument('--mix', help='JSON file overriding DEFAULT_MIX entries')
+    parser.add_argument('--rate-limit', action='store_true', help='run with the default rate limits on')
+    parser.add_argument('--devices', type=int, default=5000, help='distinct client IPs with --rate-limit')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the report to this file')
+    opts = parser.parse_args()
+    opts.shape = [float(x) for x in opts.shape.split(',')]
+    if len(opts.shape) != 3:
+        parser.error('--shape needs ramp,hold,decay')
+
+    mix = dict(DEFAULT_MIX)
+    if opts.mix:
+        with open(opts.mix) as f:
+            mix.update(json.load(f))
+
+    report = run(opts, mix)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if opts.json:
+        with open(opts.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if report['error_rate'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
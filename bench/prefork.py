@@ -0,0 +1,128 @@
+"""Per-worker memory and startup time under gunicorn, with and without the master preload.
+
+Starts ``gunicorn -c gunicorn.conf.py`` with ``--workers`` workers twice:
+``GRID_PRELOAD=1`` (the master warms up once and forks) and ``GRID_PRELOAD=0``
+(every worker imports and warms up on its own). For each it reports:
+
+* startup: launch until every worker has answered a finished ``/api/warmup``
+* RSS, PSS and USS per worker (PSS splits shared pages between the
+  processes sharing them; USS is what the worker alone holds) once warm,
+  and again after a round of traffic has touched the warm state
+* total PSS of master plus workers, the server's real footprint
+
+Linux only (reads /proc/<pid>/smaps_rollup); needs gunicorn installed.
+
+    python bench/prefork.py
+    python bench/prefork.py --workers 8 --requests 400
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+from serve import ROOT, EmojiStandIn, free_port
+
+MB = 1024 * 1024
+# A mix of cached and uncached wallpapers, so traffic touches fonts, emoji, strips and tiles
+TRAFFIC = [
+    {'c': 'EAAA'},
+    {'theme': 'light', 'mode': 'segregated_months', 'highlight_weekends': 'true'},
+    {'mode': 'life', 'birthdate': '1990-01-01', 'signature': 'prefork'},
+    {'dates': '01-01|🍰,02-14|❤️,07-04|🚀', 'mode': 'quarter'},
+]
+
+
+def memory(pid):
+    """RSS, PSS and USS of ``pid`` in bytes."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[key] = int(value.split()[0]) * 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def get(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.read()
+
+
+def run(preload, opts, emoji_url):
+    port = free_port()
+    env = dict(os.environ, GRID_PRELOAD='1' if preload else '0', GRID_WORKERS=str(opts.workers),
+               GRID_BIND=f'127.0.0.1:{port}', GRID_EMOJI_BASE_URL=emoji_url, GRID_RATE_LIMIT='0',
+               GRID_CANONICAL_REDIRECTS='0')
+    base = f'http://127.0.0.1:{port}'
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], env=env, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # /api/warmup blocks until the answering worker is warm; keep asking until every worker has answered
+        warm = set()
+        deadline = time.monotonic() + 120
+        with concurrent.futures.ThreadPoolExecutor(opts.workers * 2) as pool:
+            while len(warm) < opts.workers:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError('gunicorn did not start every worker in time')
+                try:
+                    replies = list(pool.map(lambda _: json.loads(get(base + '/api/warmup')), range(opts.workers * 2)))
+                except OSError:
+                    time.sleep(0.05)
+                    continue
+                warm.update(r['pid'] for r in replies)
+        startup = time.perf_counter() - t0
+        warm_mem = {pid: memory(pid) for pid in children(proc.pid)}
+
+        urls = [f"{base}/api/image?{urllib.parse.urlencode(TRAFFIC[i % len(TRAFFIC)])}" for i in range(opts.requests)]
+        with concurrent.futures.ThreadPoolExecutor(opts.workers * 2) as pool:
+            list(pool.map(get, urls))
+        pids = children(proc.pid)
+        served_mem = {pid: memory(pid) for pid in pids}
+        master = memory(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+    return {'startup': startup, 'warm': warm_mem, 'served': served_mem, 'master': master}
+
+
+def mean(mems, field):
+    return sum(m[field] for m in mems.values()) / len(mems) / MB
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='traffic after warm-up, spread over the workers')
+    opts = parser.parse_args()
+
+    stand_in = EmojiStandIn().start()
+    try:
+        rows = {'preload': run(True, opts, stand_in.url), 'per-worker': run(False, opts, stand_in.url)}
+    finally:
+        stand_in.stop()
+
+    print(f'{opts.workers} workers; per-worker means in MB\n')
+    print(f"{'':<11} {'startup':>8} {'':>3}{'RSS':>7} {'PSS':>7} {'USS':>7}   {'total PSS':>9}")
+    for name, r in rows.items():
+        for phase in ('warm', 'served'):
+            mems = r[phase]
+            total = (sum(m['pss'] for m in mems.values()) + r['master']['pss']) / MB
+            startup = f"{r['startup']:.2f}s" if phase == 'warm' else ''
+            print(f"{name if phase == 'warm' else '':<11} {startup:>8} {phase:>7}"
+                  f"{mean(mems, 'rss'):>7.1f} {mean(mems, 'pss'):>7.1f} {mean(mems, 'uss'):>7.1f}   {total:>9.1f}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Raster backends (api/_grid/raster.py): draw time per mode and pixel parity with Pillow.
+
+For every backend installed here and each canvas (indexed ``P`` and the
+``RGB`` reference), times drawing the dots and bar of each case, and the
+whole wallpaper (text and emoji included) drawn through that backend.
+Every backend's wallpaper is then compared with Pillow's: the share of
+pixels that differ must stay within ``raster.PARITY_TOLERANCE``. Emoji come
+from a local stand-in. Ends with the backend ``GRID_RASTER=auto`` picks on
+this host. Exits non-zero if a backend is out of parity.
+
+    python bench/raster_backends.py
+    python bench/raster_backends.py -n 30 --canvas P
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+
+from serve import EmojiStandIn
+
+NOW = datetime.datetime(2026, 10, 19, 9, 0)
+
+CASES = {
+    'year': {'mode': 'year', 'highlight_weekends': 'true'},
+    'year segmented+sig': {'mode': 'year', 'bar_style': 'segmented', 'signature': 'Make it count'},
+    'segregated_months': {'mode': 'segregated_months', 'highlight_weekends': 'true', 'bar_style': 'solid'},
+    'month emoji': {'mode': 'month', 'dates': '10-01|🍰,10-25|🚀,10-31|💀', 'bar_style': 'minimal'},
+    'quarter': {'mode': 'quarter', 'accent': '33ccff', 'bg': '101820'},
+    'life (90y)': {'mode': 'life', 'birthdate': '1995-03-02', 'lifespan': '90'},
+    'years (13y)': {'mode': 'years', 'years': '2024-2036', 'highlight_weekends': 'true'},
+}
+
+
+def timed(fn, samples):
+    fn()  # warm caches (fonts, dot strips and stamps, emoji)
+    times = []
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--samples', type=int, default=15)
+    parser.add_argument('--canvas', default='P,RGB', help='canvases to compare (P, RGB or P,RGB)')
+    opts = parser.parse_args()
+
+    stand_in = EmojiStandIn().start()
+    os.environ.update(GRID_EMOJI_BASE_URL=stand_in.url, GRID_WARM_TEXT='0')
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+    from _grid import raster
+    from _grid.config import parse_config
+    from _grid.layout import build_layout
+    from _grid.palette import INDEX, theme_colors
+    from _grid.render import render_image
+
+    backends = raster.available()
+    pixels = raster.IMAGE_WIDTH * raster.IMAGE_HEIGHT
+    failures = []
+    try:
+        for canvas in opts.canvas.split(','):
+            print(f"canvas {canvas}; median ms of {opts.samples}, shapes = dots and bar only\n")
+            print(f"{'case':<18} {'backend':<8} {'shapes':>8} {'render':>8} {'differing px':>13}")
+            for name, args in CASES.items():
+                config = parse_config(args)
+                layout = build_layout(config, NOW)
+                ink = INDEX if canvas == 'P' else theme_colors(config)
+                reference = None
+                for backend in backends.values():
+                    raster._backend = backend
+                    shapes = timed(lambda: raster.draw_shapes(backend, layout, canvas, ink), opts.samples)
+                    render = timed(lambda: render_image(config, NOW, canvas), opts.samples)
+                    img = render_image(config, NOW, canvas)
+                    reference = reference or img
+                    differing = raster.differing_pixels(img, reference)
+                    within = differing <= pixels * raster.PARITY_TOLERANCE
+                    if not within:
+                        failures.append(f'{canvas} {name} {backend.name}')
+                    print(f"{name:<18} {backend.name:<8} {shapes:>8.2f} {render:>8.2f} "
+                          f"{differing:>7} {'ok' if within else 'FAIL':>5}")
+            print()
+        raster._backend = None
+        for name, (ms, drift) in raster.compare(backends, raster.reference_layouts(), raster.AUTO_ROUNDS).items():
+            print(f'auto-selection reference: {name} {ms:.2f} ms, {drift:.2e} of pixels differ')
+        print(f'GRID_RASTER=auto on this host -> {raster.fastest().name}')
+    finally:
+        stand_in.stop()
+
+    tolerance = int(pixels * raster.PARITY_TOLERANCE)
+    print(f"\nparity (at most {tolerance} differing pixels): {'FAIL: ' + ', '.join(failures) if failures else 'ok'}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
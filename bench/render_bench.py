@@ -0,0 +1,104 @@
+"""Render latency per mode, and the 5,000-dot budget check.
+
+Times layout, rasterization and PNG encoding in-process (no HTTP) for each
+mode, with the dots drawn both through the run-length stamps and through the old
+one-``draw.ellipse``-per-dot loop for comparison, plus the lock + home screen
+pair rendered in one pass. Exits non-zero if a long-horizon view (life in
+weeks, 13-year range) is slower than ``--budget`` times the year view.
+
+    python bench/render_bench.py
+    python bench/render_bench.py -n 30 --budget 1.2
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from PIL import Image, ImageDraw
+
+from _grid.config import parse_config
+from _grid.layout import build_layout
+from _grid.palette import INDEX
+from _grid.render import draw_dot_grid, render_entries, render_image
+from _grid.settings import IMAGE_HEIGHT, IMAGE_WIDTH, THEMES
+
+NOW = datetime.datetime(2026, 10, 19, 9, 0)
+
+CASES = {
+    'year': {'mode': 'year', 'highlight_weekends': 'true'},
+    'segregated_months': {'mode': 'segregated_months', 'highlight_weekends': 'true'},
+    'life (90y)': {'mode': 'life', 'birthdate': '1995-03-02'},
+    'years (13y)': {'mode': 'years', 'years': '2024-2036', 'highlight_weekends': 'true'},
+}
+LONG_VIEWS = ('life (90y)', 'years (13y)')
+
+
+def run_dots(config, layout):
+    """Dots only, through the renderer's run-length path on its palette canvas."""
+    img = Image.new('P', (IMAGE_WIDTH, IMAGE_HEIGHT), color=INDEX['BG'])
+    for grid in layout.grids:
+        draw_dot_grid(img, grid, INDEX, {})
+    return img
+
+
+def per_dot_dots(config, layout):
+    """Dots only, the pre-layout way: one ellipse call per dot."""
+    palette = THEMES['dark']
+    img = Image.new('RGB', (IMAGE_WIDTH, IMAGE_HEIGHT), color=palette['BG'])
+    draw = ImageDraw.Draw(img)
+    for grid in layout.grids:
+        for r, row in enumerate(grid.cells):
+            for c, key in enumerate(row):
+                if key is not None:
+                    x, y = grid.cell_origin(r, c)
+                    draw.ellipse((x, y, x + grid.size, y + grid.size), fill=palette[key])
+    return img
+
+
+def timed(fn, samples):
+    fn()  # warm caches (fonts, dot strips)
+    times = []
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--samples', type=int, default=15)
+    parser.add_argument('--budget', type=float, default=1.25, help='allowed slowdown of long views vs the year view')
+    opts = parser.parse_args()
+
+    rows = {}
+    for name, args in CASES.items():
+        config = parse_config(args)
+        layout = build_layout(config, NOW)
+        rows[name] = {
+            'dots': sum(g.count for g in layout.grids),
+            'layout': timed(lambda: build_layout(config, NOW), opts.samples),
+            'dots (runs)': timed(lambda: run_dots(config, layout), opts.samples),
+            'dots (per-dot)': timed(lambda: per_dot_dots(config, layout), opts.samples),
+            'render': timed(lambda: render_image(config, NOW), opts.samples),
+            'render+png': timed(lambda: render_image(config, NOW).save(os.devnull, 'PNG'), max(3, opts.samples // 3)),
+            'lock+home png': timed(lambda: render_entries(config, NOW, ('lock', 'home')), max(3, opts.samples // 3)),
+        }
+
+    columns = ['layout', 'dots (runs)', 'dots (per-dot)', 'render', 'render+png', 'lock+home png']
+    print(f"{'mode':<18} {'dots':>5}" + ''.join(f" {c:>15}" for c in columns))
+    for name, r in rows.items():
+        print(f"{name:<18} {r['dots']:>5}" + ''.join(f" {r[c]:>13.2f}ms" for c in columns))
+
+    budget = rows['year']['render+png'] * opts.budget
+    over = [name for name in LONG_VIEWS if rows[name]['render+png'] > budget]
+    print(f"\nbudget: {budget:.1f} ms (year view x{opts.budget})  ->  {'FAIL: ' + ', '.join(over) if over else 'ok'}")
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
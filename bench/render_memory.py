@@ -0,0 +1,77 @@
+"""Per-stage render memory by parameter mix, from the opt-in memory profiler.
+
+Runs the app in-process with ``GRID_MEMORY_PROFILE=1``, renders each mix
+once as a cache miss (emoji from a local stand-in), and prints what
+``/api/memory`` reports: heap (tracemalloc) and RSS peaks over baseline,
+overall and the high-water mark during the emoji, draw and encode stages
+(so a stage includes what earlier ones left live). Then the largest live
+allocation sites and cache sizes. Run once per canvas to compare them.
+
+    python bench/render_memory.py
+    GRID_CANVAS=RGB python bench/render_memory.py
+"""
+import argparse
+import os
+import sys
+import urllib.parse
+
+from serve import EmojiStandIn
+
+MB = 1024 * 1024
+TOKEN = 'bench'
+
+MIXES = [
+    {},
+    {'theme': 'light', 'signature': 'memory bench'},
+    {'dates': '01-01|🍰,02-14|❤️,07-04|🚀,10-31|💀,12-25|🍺'},
+    {'mode': 'segregated_months', 'highlight_weekends': 'true'},
+    {'mode': 'month', 'variants': 'lock,home'},
+    {'mode': 'life', 'birthdate': '1990-01-01', 'lifespan': '100'},
+    {'mode': 'years', 'years': '2024-2038', 'accent': 'ff3b30'},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=8, help='allocation sites to list')
+    opts = parser.parse_args()
+
+    stand_in = EmojiStandIn().start()
+    os.environ.update(GRID_MEMORY_PROFILE='1', GRID_ADMIN_TOKEN=TOKEN, GRID_EMOJI_BASE_URL=stand_in.url,
+                      GRID_MEMORY_LOG_THRESHOLD=str(1 << 40), GRID_RATE_LIMIT='0', GRID_CANONICAL_REDIRECTS='0',
+                      GRID_WARM_ON_BOOT='0', GRID_WARM_TEXT='0')
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+    from index import app
+
+    client = app.test_client()
+    try:
+        for args in MIXES:
+            response = client.get('/api/image?' + urllib.parse.urlencode(args))
+            if response.status_code != 200:
+                print(f'{args}: HTTP {response.status_code}')
+                return 1
+        report = client.get(f'/api/memory?top={opts.top}', headers={'Authorization': f'Bearer {TOKEN}'}).json
+    finally:
+        stand_in.stop()
+
+    print(f"canvas {os.environ.get('GRID_CANVAS', 'P')}; MB over baseline, heap / RSS\n")
+    print(f"{'mix':<36} {'peak':>11} {'emoji':>11} {'draw':>11} {'encode':>11}")
+    for mix, row in report['renders']['by_mix'].items():
+        stages = row['stages_max']
+        cells = [f"{row['heap_max'] / MB:4.1f} / {row['rss_max'] / MB:4.1f}"]
+        cells += [f"{stages[name]['heap'] / MB:4.1f} / {stages[name]['rss'] / MB:4.1f}" if name in stages else '-'
+                  for name in ('emoji', 'draw', 'encode')]
+        print(f"{mix:<36} " + ' '.join(f'{cell:>11}' for cell in cells))
+    print(f"\nfirst render pays for imports and fonts; process RSS {report['rss'] / MB:.1f} MB, "
+          f"tracemalloc overhead {report['traced']['overhead'] / MB:.1f} MB\n")
+    for site in report['top']:
+        print(f"{site['bytes'] / 1024:>8.0f} KB  {site['site']}")
+    print()
+    for name, cache in report['caches'].items():
+        size = f", {cache['bytes'] / 1024:.0f} KB" if 'bytes' in cache else ''
+        print(f"{name:<14} {cache['entries']} entries{size}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
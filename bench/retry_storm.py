@@ -0,0 +1,114 @@
+"""Misfiring Shortcuts automations vs everyone else, with and without rate limiting.
+
+A handful of "stuck" devices re-request the same wallpaper in a tight loop;
+its emoji never downloads, so every retry is a real render, the worst kind
+of loop. Meanwhile ordinary devices each fetch their own wallpaper once at
+a steady rate. Runs the local server with limiting on and off
+(``GRID_RATE_LIMIT``) and reports how the ordinary devices fared, how many
+loop requests were turned away with 429, and the server's /api/stats counters.
+
+    python bench/retry_storm.py
+    python bench/retry_storm.py --loopers 16 --seconds 8
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from serve import AppServer, EmojiStandIn
+
+BROKEN_EMOJI = '🦖'
+
+
+def get(server, path, ip):
+    req = urllib.request.Request(server.url + path, headers={'X-Forwarded-For': ip})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, (time.perf_counter() - t0) * 1000
+
+
+def run(limited, opts, emoji_url):
+    env = {'GRID_RATE_LIMIT': '1' if limited else '0', 'GRID_TRUST_FORWARDED_FOR': '1',
+           'GRID_EMOJI_BASE_URL': emoji_url, 'GRID_EMOJI_RETRY_AFTER': '0',
+           'GRID_WARM_ON_BOOT': '0', 'GRID_WARM_TEXT': '0'}
+    server = AppServer(env=env).start()
+    stop = threading.Event()
+    loop_statuses, normal = [], []
+
+    def looper(i):
+        path = '/api/image?' + urllib.parse.urlencode({'dates': f'01-{i % 28 + 1:02d}|{BROKEN_EMOJI}'})
+        while not stop.is_set():
+            loop_statuses.append(get(server, path, f'10.1.0.{i}')[0])
+
+    def ordinary(i):
+        path = '/api/image?' + urllib.parse.urlencode({'signature': f'device {i}', 'theme': 'light'})
+        normal.append(get(server, path, f'10.2.{i // 250}.{i % 250}'))
+
+    try:
+        loopers = [threading.Thread(target=looper, args=(i,), daemon=True) for i in range(opts.loopers)]
+        for t in loopers:
+            t.start()
+        workers = []
+        deadline = time.monotonic() + opts.seconds
+        i = 0
+        while time.monotonic() < deadline:
+            t = threading.Thread(target=ordinary, args=(i,))
+            t.start()
+            workers.append(t)
+            i += 1
+            time.sleep(1 / opts.rps)
+        for t in workers:
+            t.join()
+        stop.set()
+        for t in loopers:
+            t.join()
+        stats = json.loads(urllib.request.urlopen(server.url + '/api/stats').read())
+    finally:
+        server.stop()
+
+    latencies = sorted(ms for status, ms in normal if status == 200)
+    return {
+        'ordinary_ok': sum(1 for status, _ in normal if status == 200) / len(normal),
+        'ordinary_p50': statistics.median(latencies) if latencies else float('nan'),
+        'ordinary_p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else float('nan'),
+        'loop_requests': len(loop_statuses),
+        'loop_429': loop_statuses.count(429),
+        'stats': stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loopers', type=int, default=8, help='stuck devices retrying in a loop')
+    parser.add_argument('--rps', type=float, default=20, help='ordinary devices arriving per second')
+    parser.add_argument('--seconds', type=float, default=5)
+    opts = parser.parse_args()
+
+    stand_in = EmojiStandIn(missing=[BROKEN_EMOJI]).start()
+    try:
+        rows = {'unlimited': run(False, opts, stand_in.url), 'limited': run(True, opts, stand_in.url)}
+    finally:
+        stand_in.stop()
+
+    print(f"{'':<10} {'ordinary ok':>12} {'p50':>9} {'p95':>9} {'loop reqs':>10} {'loop 429':>9}")
+    for name, r in rows.items():
+        print(f"{name:<10} {r['ordinary_ok']:>11.1%} {r['ordinary_p50']:>7.1f}ms {r['ordinary_p95']:>7.1f}ms "
+              f"{r['loop_requests']:>10} {r['loop_429']:>9}")
+    print('\nlimited server /api/stats rate_limits:')
+    for rule, counts in rows['limited']['stats']['rate_limits'].items():
+        print(f"  {rule:<7} allowed {counts['allowed']:>6}  rejected {counts['rejected']:>6}  "
+              f"limited keys {counts['limited_keys']}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Local servers shared by the load and latency harnesses.
+
+``python bench/serve.py --port 8000`` runs the Flask app on Werkzeug's
+threaded WSGI server, the same way the harnesses launch it in a subprocess.
+``EmojiStandIn`` replaces the Twemoji CDN with generated PNGs so load tests
+never leave the machine. ``RespStandIn`` is a small in-memory server for the
+Redis-protocol commands the shared cache uses (``python bench/serve.py
+--resp-port 6379`` runs just that, for ``GRID_CACHE_BACKEND=redis``).
+"""
+import argparse
+import collections
+import hashlib
+import http.server
+import io
+import logging
+import math
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, 'api')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# --- Emoji stand-in ---
+class EmojiStandIn:
+    """Serves ``/<codepoint>.png`` as a 72x72 disc tinted by the codepoint (404 for ``missing``)."""
+
+    def __init__(self, latency_ms=0, missing=()):
+        self.latency = latency_ms / 1000
+        self.missing = {f"{'-'.join(f'{ord(c):x}' for c in e if ord(c) != 0xfe0f)}.png" for e in missing}
+        self.hits = 0
+        self._pngs = {}
+        self._lock = threading.Lock()
+        handler = self._make_handler()
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _png(self, name):
+        with self._lock:
+            if name not in self._pngs:
+                from PIL import Image, ImageDraw
+                r, g, b = hashlib.md5(name.encode()).digest()[:3]
+                img = Image.new('RGBA', (72, 72), (0, 0, 0, 0))
+                ImageDraw.Draw(img).ellipse((4, 4, 68, 68), fill=(r, g, b, 255))
+                buf = io.BytesIO()
+                img.save(buf, 'PNG')
+                self._pngs[name] = buf.getvalue()
+            return self._pngs[name]
+
+    def _make_handler(self):
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.hits += 1
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                name = self.path.rsplit('/', 1)[-1]
+                if not name.endswith('.png') or name in stand_in.missing:
+                    self.send_error(404)
+                    return
+                body = stand_in._png(name)
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# --- Shared cache stand-in ---
+class RespStandIn:
+    """In-memory server for GET, SET (EX/PX), DEL, DBSIZE, FLUSHALL, PING, AUTH and SELECT.
+
+    EVAL runs only the rate limiter's token-bucket script, in Python rather
+    than Lua. ``stop()`` and ``start()`` again on the same port simulate an outage.
+    """
+
+    def __init__(self, port=None, latency_ms=0):
+        self.port = port or free_port()
+        self.url = f"redis://127.0.0.1:{self.port}/0"
+        self.latency = latency_ms / 1000
+        self.data = {}  # key -> (value, expiry as time.monotonic() or None)
+        self.commands = collections.Counter()
+        self.connections = set()
+        self._lock = threading.Lock()
+        self.server = None
+
+    def _live(self, key):
+        value, expiry = self.data.get(key, (None, None))
+        if expiry is not None and expiry < time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def _token_bucket(self, key, interval, burst):
+        """What RedisBackend.SCRIPT does (times in ms, under the command lock)."""
+        now = time.time() * 1000
+        full = max(float(self._live(key) or 0), now) + interval
+        wait = full - now - burst * interval
+        if wait > 0:
+            return b':%d\r\n' % math.ceil(wait)
+        self.data[key] = (b'%.3f' % full, time.monotonic() + (full - now) / 1000)
+        return b':0\r\n'
+
+    def execute(self, args):
+        """Runs one command (a list of bytes) and returns the encoded reply."""
+        name = args[0].upper().decode('ascii', 'replace')
+        self.commands[name] += 1
+        with self._lock:
+            if name in ('PING', 'AUTH', 'SELECT'):
+                return b'+PONG\r\n' if name == 'PING' else b'+OK\r\n'
+            if name == 'GET' and len(args) == 2:
+                value = self._live(args[1])
+                return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+            if name == 'SET' and len(args) in (3, 5):
+                expiry = None
+                if len(args) == 5:
+                    unit = args[3].upper()
+                    if unit not in (b'EX', b'PX'):
+                        return b'-ERR syntax error\r\n'
+                    expiry = time.monotonic() + int(args[4]) / (1 if unit == b'EX' else 1000)
+                self.data[args[1]] = (args[2], expiry)
+                return b'+OK\r\n'
+            if name == 'DEL':
+                return b':%d\r\n' % sum(self.data.pop(key, None) is not None for key in args[1:])
+            if name == 'DBSIZE':
+                return b':%d\r\n' % sum(self._live(key) is not None for key in list(self.data))
+            if name == 'FLUSHALL':
+                self.data.clear()
+                return b'+OK\r\n'
+            if name == 'EVAL' and args[1].startswith(b'-- day-grid token bucket') and args[2] == b'1':
+                return self._token_bucket(args[3], float(args[4]), float(args[5]))
+        return b'-ERR unknown command\r\n'
+
+    def start(self):
+        stand_in = self
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                stand_in.connections.add(self.connection)
+                while True:
+                    line = self.rfile.readline()
+                    if not line.startswith(b'*'):
+                        return
+                    args = []
+                    for _ in range(int(line[1:])):
+                        n = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(n + 2)[:-2])
+                    if stand_in.latency:
+                        time.sleep(stand_in.latency)
+                    self.wfile.write(stand_in.execute(args))
+
+        self.server = Server(('127.0.0.1', self.port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        # Clients keep their connections otherwise; an outage drops them
+        for conn in list(self.connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.connections.clear()
+
+
+# --- App server ---
+class AppServer:
+    """Runs the Flask app in a subprocess so its memory can be read from /proc."""
+
+    def __init__(self, port=None, env=None, args=()):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = dict(os.environ, **(env or {}))
+        self.args = list(args)
+        self.proc = None
+
+    def start(self, timeout=15):
+        cmd = [sys.executable, os.path.abspath(__file__), '--port', str(self.port)] + self.args
+        self.proc = subprocess.Popen(cmd, env=self.env, cwd=ROOT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(self.url + '/fonts/Buffalo.otf', timeout=1).read()
+                return self
+            except OSError:
+                if self.proc.poll() is not None:
+                    raise RuntimeError('app server exited during startup')
+                time.sleep(0.05)
+        self.stop()
+        raise RuntimeError('app server did not start in time')
+
+    def memory(self):
+        """Returns current and peak RSS of the server process in bytes (Linux only)."""
+        stats = {}
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key in ('VmRSS', 'VmHWM'):
+                        stats[key] = int(value.split()[0]) * 1024
+        except OSError:
+            pass
+        return {'rss': stats.get('VmRSS'), 'peak_rss': stats.get('VmHWM')}
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            self.proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the app on a local threaded WSGI server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--resp-port', type=int, help='run only the shared cache stand-in, on this port')
+    opts = parser.parse_args()
+
+    if opts.resp_port:
+        RespStandIn(opts.resp_port).start()
+        threading.Event().wait()
+
+    from werkzeug.serving import make_server
+    sys.path.insert(0, API_DIR)
+    import index
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server(opts.host, opts.port, index.app, threaded=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
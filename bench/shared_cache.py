@@ -0,0 +1,168 @@
+"""Several instances behind a round-robin balancer, with and without a shared cache.
+
+Starts ``--instances`` app servers and sends each of ``--configs``
+wallpapers ``--repeat`` times, each request to a random instance (as a load
+balancer would, or a pre-forking server across its workers). For every
+backend (memory, disk, shm, redis via the local stand-in) it reports the combined hit ratio across instances, how many
+renders and emoji CDN fetches that took, and latency, then the cost of one
+store hit on its own (a render entry's worth of bytes). Then it stops the
+Redis stand-in mid-traffic and checks that every request still succeeds
+(rendered locally) and that the instances pick the store back up when it
+returns.
+
+    python bench/shared_cache.py
+    python bench/shared_cache.py --instances 4 --configs 60 --repeat 6
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from serve import API_DIR, AppServer, EmojiStandIn, RespStandIn
+
+sys.path.insert(0, API_DIR)
+from _grid.store import DiskStore, MmapStore, RespStore
+
+EMOJI = ['🍰', '❤️', '🚀', '💰', '✈️', '💀', '🍺', '🎂']
+
+
+def config_query(i):
+    args = {'signature': f'instance test {i}', 'theme': ('dark', 'light')[i % 2]}
+    if i % 3 == 0:
+        args['dates'] = f'{i % 12 + 1:02d}-{i % 28 + 1:02d}|{EMOJI[i % len(EMOJI)]}'
+    return urllib.parse.urlencode(args)
+
+
+def fetch(url):
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, (time.perf_counter() - t0) * 1000
+
+
+def stats(servers):
+    totals = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'errors': 0}
+    for server in servers:
+        s = json.loads(urllib.request.urlopen(server.url + '/api/stats').read())
+        for name in ('hits', 'shared_hits', 'misses'):
+            totals[name] += s['render_cache'].get(name, 0)
+        totals['errors'] += s['shared_store'].get('errors', 0)
+    return totals
+
+
+def traffic(servers, queries, rng):
+    return [fetch(f"{rng.choice(servers).url}/api/image?{query}") for query in queries]
+
+
+def run(backend, opts, emoji, env):
+    env = dict(env, GRID_CACHE_BACKEND=backend)
+    servers = [AppServer(env=env).start() for _ in range(opts.instances)]
+    rng = random.Random(opts.seed)
+    queries = [config_query(i) for i in range(opts.configs) for _ in range(opts.repeat)]
+    rng.shuffle(queries)
+    fetches_before = emoji.hits
+    try:
+        results = traffic(servers, queries, rng)
+        totals = stats(servers)
+    finally:
+        for server in servers:
+            server.stop()
+    latencies = sorted(ms for status, ms in results if status == 200)
+    return {
+        'ok': sum(status == 200 for status, _ in results),
+        'requests': len(results),
+        'hit_ratio': (totals['hits'] + totals['shared_hits']) / len(results),
+        'shared_hits': totals['shared_hits'],
+        'renders': totals['misses'],
+        'emoji_fetches': emoji.hits - fetches_before,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def store_hit_us(store, n=2000):
+    """Median microseconds of ``store.get`` for a 15 KB value, about one render entry."""
+    store.set('bench:entry', os.urandom(15 * 1024), 60)
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        store.get('bench:entry')
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def outage(opts, env, resp):
+    """Traffic while the store goes down and comes back; returns (statuses down, shared hits after)."""
+    env = dict(env, GRID_CACHE_BACKEND='redis', GRID_CACHE_RETRY_AFTER='1')
+    servers = [AppServer(env=env).start() for _ in range(opts.instances)]
+    rng = random.Random(opts.seed + 1)
+    queries = [f'{config_query(i)}&bar_style=solid' for i in range(opts.configs)]
+    try:
+        traffic(servers, queries, rng)
+        resp.stop()
+        down = traffic(servers, queries, rng)
+        resp.start()
+        time.sleep(1.2)
+        before = stats(servers)['shared_hits']
+        traffic(servers, queries, rng)
+        totals = stats(servers)
+    finally:
+        for server in servers:
+            server.stop()
+    return down, totals['shared_hits'] - before, totals['errors']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=3)
+    parser.add_argument('--configs', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5, help='requests per config')
+    parser.add_argument('--seed', type=int, default=7)
+    opts = parser.parse_args()
+
+    emoji = EmojiStandIn().start()
+    resp = RespStandIn().start()
+    cache_dir = tempfile.mkdtemp(prefix='day-grid-bench-')
+    env = {'GRID_EMOJI_BASE_URL': emoji.url, 'GRID_CACHE_URL': resp.url, 'GRID_CACHE_DIR': cache_dir,
+           'GRID_CACHE_SHM_PATH': os.path.join(cache_dir, 'arena'),
+           'GRID_RATE_LIMIT': '0', 'GRID_CANONICAL_REDIRECTS': '0', 'GRID_WARM_ON_BOOT': '0', 'GRID_WARM_TEXT': '0'}
+    failed = False
+    try:
+        rows = {backend: run(backend, opts, emoji, env) for backend in ('memory', 'disk', 'shm', 'redis')}
+        print(f'{opts.instances} instances, {opts.configs} configs x {opts.repeat} requests, random instance each\n')
+        print(f"{'backend':<8} {'ok':>9} {'hit ratio':>10} {'shared':>7} {'renders':>8} {'emoji dl':>9} {'p50':>9} {'p95':>9}")
+        for name, r in rows.items():
+            failed |= r['ok'] != r['requests']
+            print(f"{name:<8} {r['ok']:>4}/{r['requests']:<4} {r['hit_ratio']:>10.1%} {r['shared_hits']:>7} "
+                  f"{r['renders']:>8} {r['emoji_fetches']:>9} {r['p50']:>7.1f}ms {r['p95']:>7.1f}ms")
+
+        stores = {'disk': DiskStore(cache_dir, 1), 'shm': MmapStore(env['GRID_CACHE_SHM_PATH'], 1 << 22, 32 * 1024, 1),
+                  'redis': RespStore(resp.url, 1, 1)}
+        print('\nstore hit, 15 KB: ' + ', '.join(f'{name} {store_hit_us(store):.0f}us' for name, store in stores.items()))
+
+        down, recovered, errors = outage(opts, env, resp)
+        ok = sum(status == 200 for status, _ in down)
+        failed |= ok != len(down) or not recovered
+        print(f"\nredis down: {ok}/{len(down)} ok, p50 {statistics.median(ms for _, ms in down):.1f}ms, "
+              f"{errors} store errors logged; back up: {recovered} shared hits")
+    finally:
+        resp.stop()
+        emoji.stop()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""One client spread over several instances: is its rate limit shared or multiplied?
+
+Starts ``--instances`` app servers with one rule, ``layout=RATE:BURST``, and
+sends ``--requests`` preview calls from one client, each to a random
+instance. With ``memory`` buckets every instance lets the burst through on
+its own; with ``shm`` and ``redis`` (the local stand-in) the instances take
+from one bucket, so no more than the burst (plus what refilled meanwhile)
+may pass. Then it stops the Redis stand-in mid-traffic: requests must still
+be answered (limited per process) and the shared bucket must be back in
+charge once the store returns. Exits non-zero on any failure.
+
+    python bench/shared_limits.py
+    python bench/shared_limits.py --instances 4 --requests 200
+"""
+import argparse
+import concurrent.futures
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from serve import AppServer, RespStandIn
+
+RATE = 0.05
+BURST = 20
+
+
+def fetch(url):
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def traffic(servers, n, rng):
+    urls = [f"{rng.choice(servers).url}/api/layout?signature=limits" for _ in range(n)]
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        return list(pool.map(fetch, urls))
+
+
+def allowed_at_most(seconds):
+    return BURST + int(RATE * seconds) + 1
+
+
+def run(backend, opts, env):
+    env = dict(env, GRID_RATE_LIMIT_BACKEND=backend)
+    servers = [AppServer(env=env).start() for _ in range(opts.instances)]
+    try:
+        t0 = time.monotonic()
+        statuses = traffic(servers, opts.requests, random.Random(opts.seed))
+        return statuses, time.monotonic() - t0
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def outage(opts, env, resp):
+    """(statuses while the store is down, statuses once it is back)."""
+    env = dict(env, GRID_RATE_LIMIT_BACKEND='redis', GRID_CACHE_RETRY_AFTER='1')
+    servers = [AppServer(env=env).start() for _ in range(opts.instances)]
+    rng = random.Random(opts.seed + 1)
+    try:
+        traffic(servers, BURST * 2, rng)  # drains the shared bucket
+        resp.stop()
+        down = traffic(servers, opts.requests, rng)
+        resp.start()
+        time.sleep(1.2)
+        back = traffic(servers, opts.requests, rng)
+    finally:
+        for server in servers:
+            server.stop()
+    return down, back
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=120)
+    parser.add_argument('--seed', type=int, default=7)
+    opts = parser.parse_args()
+
+    resp = RespStandIn().start()
+    shm_dir = tempfile.mkdtemp(prefix='day-grid-bench-')
+    env = {'GRID_RATE_LIMITS': f'layout={RATE}:{BURST}', 'GRID_CACHE_URL': resp.url,
+           'GRID_CACHE_SHM_PATH': os.path.join(shm_dir, 'arena'),
+           'GRID_WARM_ON_BOOT': '0', 'GRID_WARM_TEXT': '0'}
+    failures = []
+    try:
+        print(f'{opts.instances} instances, {opts.requests} requests from one client, layout={RATE}:{BURST}\n')
+        print(f"{'backend':<8} {'200':>5} {'429':>5} {'other':>6}  limit")
+        for backend in ('memory', 'shm', 'redis'):
+            statuses, seconds = run(backend, opts, env)
+            ok_count, limited = statuses.count(200), statuses.count(429)
+            shared = backend != 'memory'
+            limit = allowed_at_most(seconds) if shared else allowed_at_most(seconds) * opts.instances
+            ok = ok_count + limited == len(statuses) and (ok_count <= limit if shared else ok_count > BURST)
+            print(f"{backend:<8} {ok_count:>5} {limited:>5} {len(statuses) - ok_count - limited:>6}  "
+                  f"{'<=' if shared else '~'}{limit}{'' if ok else '  FAIL'}")
+            if not ok:
+                failures.append(backend)
+
+        down, back = outage(opts, env, resp)
+        ok_down = set(down) <= {200, 429} and 200 in down
+        ok_back = set(back) <= {200, 429} and back.count(200) <= int(RATE * 5) + 1
+        print(f"\nredis down: {down.count(200)} allowed, {down.count(429)} limited per process"
+              f"{'' if ok_down else '  FAIL'}")
+        print(f"redis back: {back.count(200)} allowed, {back.count(429)} limited by the drained shared bucket"
+              f"{'' if ok_back else '  FAIL'}")
+        if not ok_down:
+            failures.append('outage')
+        if not ok_back:
+            failures.append('recovery')
+    finally:
+        resp.stop()
+        shutil.rmtree(shm_dir, ignore_errors=True)
+    print(f"\n{'FAILED: ' + ', '.join(failures) if failures else 'shared backends hold one client to one bucket'}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Time to first byte and total latency of cache-miss renders, streamed vs buffered.
+
+Starts the app twice on the local threaded server (``GRID_STREAM_PNG=1`` and
+``0``) and fetches ``--requests`` distinct, never-cached wallpapers from
+each over a fresh connection, timing the first body byte and the last.
+
+    python bench/ttfb.py
+    python bench/ttfb.py -n 40 --mode life
+"""
+import argparse
+import http.client
+import statistics
+import sys
+import time
+import urllib.parse
+
+from serve import AppServer, EmojiStandIn
+
+
+def fetch(server, path):
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=30)
+    t0 = time.perf_counter()
+    conn.request('GET', path)
+    response = conn.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - t0
+    body = first + response.read()
+    total = time.perf_counter() - t0
+    conn.close()
+    if response.status != 200 or not body.startswith(b'\x89PNG'):
+        raise RuntimeError(f'{path}: HTTP {response.status}')
+    return ttfb * 1000, total * 1000, len(body)
+
+
+def run(stream, opts, emoji_url):
+    env = {'GRID_STREAM_PNG': '1' if stream else '0', 'GRID_EMOJI_BASE_URL': emoji_url,
+           'GRID_WARM_ON_BOOT': '0', 'GRID_WARM_TEXT': '0', 'GRID_RATE_LIMIT': '0',
+           'GRID_CANONICAL_REDIRECTS': '0'}
+    server = AppServer(env=env).start()
+    try:
+        args = {'mode': opts.mode, 'birthdate': '1990-01-01', 'theme': 'dark'}
+        fetch(server, '/api/image?' + urllib.parse.urlencode(dict(args, signature='warm')))  # fonts, strips
+        samples = [fetch(server, '/api/image?' + urllib.parse.urlencode(dict(args, signature=f'{stream} {i}')))
+                   for i in range(opts.requests)]
+    finally:
+        server.stop()
+    ttfb, total, size = zip(*samples)
+    return {'ttfb': statistics.median(ttfb), 'ttfb_p95': sorted(ttfb)[int(len(ttfb) * 0.95) - 1],
+            'total': statistics.median(total), 'bytes': statistics.median(size)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--requests', type=int, default=20)
+    parser.add_argument('--mode', default='year')
+    opts = parser.parse_args()
+
+    stand_in = EmojiStandIn().start()
+    try:
+        rows = {'buffered': run(False, opts, stand_in.url), 'streamed': run(True, opts, stand_in.url)}
+    finally:
+        stand_in.stop()
+
+    print(f"{'path':<10} {'ttfb p50':>10} {'ttfb p95':>10} {'total p50':>10} {'bytes':>8}")
+    for name, r in rows.items():
+        print(f"{name:<10} {r['ttfb']:>8.1f}ms {r['ttfb_p95']:>8.1f}ms {r['total']:>8.1f}ms {r['bytes']:>8.0f}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Worst-case requests: every one must be refused early or rendered within budget.
+
+Crafted URLs (oversized date lists, made-up emoji, huge signatures, tokens
+that smuggle the same) must get a 400 before anything is fetched or drawn;
+the largest accepted config must render within ``--budget`` ms; a burst of
+uncached renders beyond the render slots must be shed with 503 and
+Retry-After; and the emoji cache must stay bounded. Runs the app in-process
+against the local emoji stand-in. Exits non-zero on any failure.
+
+    python bench/worst_case.py
+    python bench/worst_case.py --budget 1500
+"""
+import argparse
+import datetime
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from serve import API_DIR, EmojiStandIn
+
+SLOTS = 2
+EMOJI_CACHE_SIZE = 8
+
+
+def emoji(i):
+    return chr(0x1F600 + i)
+
+
+def every_day(emoji_count):
+    days = [datetime.date(2000, 1, 1) + datetime.timedelta(days=i) for i in range(366)]
+    return ','.join(f"{d:%m-%d}|{emoji(i % emoji_count)}" if emoji_count else f"{d:%m-%d}"
+                    for i, d in enumerate(days))
+
+
+def url(**args):
+    return '/api/image?' + urllib.parse.urlencode(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=1000, help='ms allowed for the largest accepted render')
+    parser.add_argument('--burst', type=int, default=8, help='concurrent uncached renders in the overload check')
+    opts = parser.parse_args()
+
+    stand_in = EmojiStandIn()
+    stand_in.start()
+    os.environ.update({
+        'GRID_EMOJI_BASE_URL': stand_in.url,
+        'GRID_RENDER_SLOTS': str(SLOTS),
+        'GRID_RENDER_SLOT_WAIT': '0',
+        'GRID_EMOJI_CACHE_SIZE': str(EMOJI_CACHE_SIZE),
+        'GRID_WARM_TEXT': '0',
+        'GRID_WARM_ON_BOOT': '0',
+        'GRID_RATE_LIMIT': '0',
+        'GRID_CANONICAL_REDIRECTS': '0',
+    })
+    sys.path.insert(0, API_DIR)
+    import index
+    from _grid.codec import encode_config
+    from _grid.config import MAX_DISTINCT_EMOJI, MAX_SIGNATURE_CHARS, GridConfig
+    from _grid.emoji import emoji_cache
+    from _grid.limits import render_slots
+
+    client = index.app.test_client()
+    client.get(url(theme='dark'))  # first-request setup, fonts
+    failures = []
+
+    def check(name, path, status, budget_ms=None):
+        fetches = stand_in.hits
+        t0 = time.perf_counter()
+        response = client.get(path)
+        ms = (time.perf_counter() - t0) * 1000
+        ok = response.status_code == status and (budget_ms is None or ms <= budget_ms)
+        # A refused request must not have reached the emoji CDN
+        if status == 400 and stand_in.hits != fetches:
+            ok = False
+        print(f"{'ok  ' if ok else 'FAIL'} {response.status_code} {ms:8.1f}ms  {name}")
+        if not ok:
+            failures.append(name)
+
+    token_sig = encode_config(GridConfig(signature='x' * 200))
+    token_emoji = encode_config(GridConfig(special_dates={(1, d): emoji(d) for d in range(1, 20)}))
+
+    print('refused early (400):')
+    check('dates parameter of 100 KB', url(dates='01-01,' * 17000), 400, budget_ms=100)
+    check('367 date entries', url(dates=','.join(['01-01'] * 367)), 400, budget_ms=100)
+    check(f'{MAX_DISTINCT_EMOJI + 1} distinct emoji', url(dates=every_day(MAX_DISTINCT_EMOJI + 1)), 400, budget_ms=100)
+    check('plain text as emoji', url(dates='01-01|hello'), 400, budget_ms=100)
+    check('overlong emoji', url(dates='01-01|' + emoji(1) * 20), 400, budget_ms=100)
+    check('signature of 10,000 chars', url(signature='x' * 10000), 400, budget_ms=100)
+    check('token with a 200-char signature', url(c=token_sig), 400, budget_ms=100)
+    check('token with 19 distinct emoji', url(c=token_emoji), 400, budget_ms=100)
+    long_emoji = [('\u200d'.join(chr(0x1F468 + (i + j) % 4) for j in range(4)) + chr(0x1F3FB + i % 5))[:8]
+                  for i in range(MAX_DISTINCT_EMOJI)]
+    too_big = ','.join(f"{d:%m-%d}|{long_emoji[i % MAX_DISTINCT_EMOJI]}"
+                       for i, d in enumerate(datetime.date(2000, 1, 1) + datetime.timedelta(days=n) for n in range(200)))
+    check('config too large for a token', url(dates=too_big, signature='\U0001F600' * MAX_SIGNATURE_CHARS), 400,
+          budget_ms=100)
+
+    print('\nlargest accepted config (200):')
+    check(f'366 dates, {MAX_DISTINCT_EMOJI} emoji, {MAX_SIGNATURE_CHARS}-char signature',
+          url(dates=every_day(MAX_DISTINCT_EMOJI), signature='W' * MAX_SIGNATURE_CHARS), 200, budget_ms=opts.budget)
+    check('life in weeks, all dates', url(mode='life', birthdate='1930-01-01', dates=every_day(0)), 200,
+          budget_ms=opts.budget)
+
+    print(f'\nburst of {opts.burst} uncached renders on {SLOTS} slots:')
+    statuses, retry_after = [], []
+    barrier = threading.Barrier(opts.burst)
+
+    def burst(i):
+        barrier.wait()
+        response = client.get(url(signature=f'burst {i}', theme='light'))
+        statuses.append(response.status_code)
+        retry_after.append(response.headers.get('Retry-After'))
+
+    threads = [threading.Thread(target=burst, args=(i,)) for i in range(opts.burst)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    shed = statuses.count(503)
+    ok = shed and set(statuses) <= {200, 503} and all(r for s, r in zip(statuses, retry_after) if s == 503)
+    print(f"{'ok  ' if ok else 'FAIL'} 200 x{statuses.count(200)}, 503 x{shed} "
+          f"(admitted {render_slots.admitted}, shed {render_slots.shed})")
+    if not ok:
+        failures.append('overload shedding')
+
+    print('\nemoji cache bound:')
+    for i in range(4):
+        client.get(url(dates=','.join(f'02-{d:02d}|{emoji(20 + i * 8 + d)}' for d in range(1, 9))))
+    ok = len(emoji_cache) <= EMOJI_CACHE_SIZE
+    print(f"{'ok  ' if ok else 'FAIL'} {len(emoji_cache)} cached after 32 distinct emoji (limit {EMOJI_CACHE_SIZE})")
+    if not ok:
+        failures.append('emoji cache bound')
+
+    stand_in.stop()
+    print(f"\n{'FAILED: ' + ', '.join(failures) if failures else 'all worst cases bounded'}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
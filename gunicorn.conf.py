@@ -0,0 +1,44 @@
+"""Self-hosting on gunicorn: ``gunicorn -c gunicorn.conf.py`` from the repo root.
+
+The master imports the app and runs the warm-up once (``preload`` in
+api/_grid/warmup.py) before forking, so every worker starts warm and shares
+the fonts, emoji, dot strips and today's default render with the master
+instead of building its own copy. ``GRID_PRELOAD=0`` makes each worker
+import and warm up on its own instead (the Werkzeug/Vercel behaviour).
+
+``GRID_SERVER=asgi`` serves asgi.py on gunicorn's asyncio worker instead of
+the Flask app on threads.
+
+    GRID_WORKERS=4 gunicorn -c gunicorn.conf.py --bind 0.0.0.0:8000
+"""
+import os
+
+PRELOAD = os.environ.get('GRID_PRELOAD', '1') == '1'
+ASGI = os.environ.get('GRID_SERVER', 'wsgi') == 'asgi'
+
+pythonpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api')
+bind = os.environ.get('GRID_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GRID_WORKERS', os.cpu_count() or 1))
+if ASGI:
+    wsgi_app = 'asgi:app'
+    worker_class = 'asgi'
+else:
+    wsgi_app = 'index:app'
+    worker_class = 'gthread'
+    # One thread per render slot; more would only queue on the slots
+    threads = int(os.environ.get('GRID_RENDER_SLOTS', '4'))
+preload_app = PRELOAD
+
+if PRELOAD:
+    # No background warm-up threads in the master: a fork would copy them mid-run, holding locks
+    os.environ.setdefault('GRID_WARM_ON_BOOT', '0')
+    os.environ.setdefault('GRID_WARM_TEXT', '0')
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before the first worker is forked."""
+    if PRELOAD:
+        from _grid.warmup import preload
+
+        report = preload()
+        server.log.info('Preloaded in %.0f ms (%d objects frozen)', report['ms'], report['frozen_objects'])
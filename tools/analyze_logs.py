@@ -0,0 +1,207 @@
+"""How concentrated ``/api/image`` traffic is, and what a render cache of each size would save.
+
+Reads the JSON lines ``GRID_ACCESS_LOG`` writes (see api/_grid/accesslog.py;
+other lines, like the rest of a server log, are skipped) and reports:
+
+* per IST day: requests, distinct configs and render keys, and the share
+  of requests that went to the ten most requested configs
+* per mode: requests, renders, total and mean render time, and its share
+  of all render time
+* per cache size K: the hit ratio and render CPU saved if every request
+  went through one LRU or LFU cache of K entries (one entry per variant,
+  as in ``RenderCache``), next to the hit ratio the logs show and the
+  bound an unbounded cache would reach (only first sightings miss)
+
+A render that was never seen in the logs is charged its config's measured
+render time, or its mode's mean. Requests without a token form
+(``cache: uncacheable``) miss at every size. Redirects and rejected
+requests are left out.
+
+    python tools/analyze_logs.py access.log
+    python tools/analyze_logs.py access-*.log --sizes 32,64,256 --day 2026-10-19
+"""
+import argparse
+import collections
+import json
+import statistics
+import sys
+
+TOP_CONFIGS = 10
+SERVED = ('hit', 'shared', 'miss', 'partial', 'uncacheable')
+
+
+def read_records(paths):
+    """The served ``/api/image`` records in ``paths``, in file order, and the number of lines skipped."""
+    records, skipped = [], 0
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(record, dict) or record.get('log') != 'access':
+                    skipped += 1
+                elif record.get('status') == 200 and record.get('cache') in SERVED:
+                    records.append(record)
+    return records, skipped
+
+
+def entry_costs(records):
+    """Render ms per cache entry: by config (measured) and by mode (mean), for pricing misses."""
+    by_config, by_mode = collections.defaultdict(list), collections.defaultdict(list)
+    for record in records:
+        if record.get('render_ms') is not None and record['cache'] in ('miss', 'uncacheable'):
+            # One pass renders every variant of the request
+            per_entry = record['render_ms'] / len(record['variants'].split(','))
+            by_config[record['config']].append(per_entry)
+            by_mode[record['mode']].append(per_entry)
+    modes = {mode: statistics.fmean(ms) for mode, ms in by_mode.items()}
+    fallback = statistics.fmean(modes.values()) if modes else 0.0
+    configs = {config: statistics.fmean(ms) for config, ms in by_config.items()}
+    return lambda record: configs.get(record['config'], modes.get(record['mode'], fallback))
+
+
+class LRU:
+    def __init__(self, size):
+        self.size = size
+        self.entries = collections.OrderedDict()
+
+    def access(self, key):
+        """True on a hit; a miss inserts ``key``, evicting the least recently used entry."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return True
+        self.entries[key] = None
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return False
+
+
+class LFU:
+    """Least frequently used, least recently used among equals; O(1) per access."""
+
+    def __init__(self, size):
+        self.size = size
+        self.counts = {}
+        self.buckets = collections.defaultdict(collections.OrderedDict)
+        self.lowest = 0
+
+    def access(self, key):
+        count = self.counts.get(key)
+        if count is not None:
+            bucket = self.buckets[count]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[count]
+                if self.lowest == count:
+                    self.lowest = count + 1
+            self.counts[key] = count + 1
+            self.buckets[count + 1][key] = None
+            return True
+        if len(self.counts) >= self.size:
+            bucket = self.buckets[self.lowest]
+            evicted, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self.buckets[self.lowest]
+            del self.counts[evicted]
+        self.counts[key] = 1
+        self.buckets[1][key] = None
+        self.lowest = 1
+        return False
+
+
+class Unbounded:
+    """Every entry kept: only the first request for each misses."""
+
+    def __init__(self):
+        self.seen = set()
+
+    def access(self, key):
+        if key in self.seen:
+            return True
+        self.seen.add(key)
+        return False
+
+
+def simulate(records, cache, cost):
+    """(request hit ratio, render ms saved) replaying ``records`` through ``cache``."""
+    hits, saved = 0, 0.0
+    for record in records:
+        if record['key'] is None:
+            continue
+        variants = record['variants'].split(',')
+        hit = [cache.access((record['key'], v)) for v in variants]
+        hits += all(hit)
+        saved += cost(record) * sum(hit)
+    return hits / len(records), saved
+
+
+def print_days(records):
+    print(f"{'day':<10} {'requests':>9} {'configs':>8} {'keys':>6} {'top-10 share':>13}")
+    by_day = collections.defaultdict(list)
+    for record in records:
+        by_day[record['day']].append(record)
+    for day, rows in sorted(by_day.items()):
+        configs = collections.Counter(record['config'] for record in rows)
+        keys = {record['key'] for record in rows if record['key']}
+        top = sum(n for _, n in configs.most_common(TOP_CONFIGS))
+        print(f'{day:<10} {len(rows):>9} {len(configs):>8} {len(keys):>6} {top / len(rows):>13.0%}')
+
+
+def print_modes(records):
+    modes = collections.defaultdict(lambda: {'requests': 0, 'renders': 0, 'ms': 0.0})
+    for record in records:
+        row = modes[record['mode']]
+        row['requests'] += 1
+        if record.get('render_ms') is not None:
+            row['renders'] += 1
+            row['ms'] += record['render_ms']
+    total = sum(row['ms'] for row in modes.values()) or 1
+    print(f"\n{'mode':<18} {'requests':>9} {'renders':>8} {'render s':>9} {'mean ms':>8} {'share':>6}")
+    for mode, row in sorted(modes.items(), key=lambda item: -item[1]['ms']):
+        mean = row['ms'] / row['renders'] if row['renders'] else 0
+        print(f"{mode:<18} {row['requests']:>9} {row['renders']:>8} {row['ms'] / 1000:>9.1f} {mean:>8.1f} "
+              f"{row['ms'] / total:>6.0%}")
+
+
+def print_sizes(records, sizes, cost):
+    baseline = sum(cost(record) * len(record['variants'].split(',')) for record in records)
+    observed = sum(record['cache'] in ('hit', 'shared') for record in records) / len(records)
+    print(f'\nobserved hit ratio {observed:.1%}; uncached render time {baseline / 1000:.1f} s')
+    print(f"{'K':>6} {'LRU hits':>9} {'LRU saved s':>12} {'LFU hits':>9} {'LFU saved s':>12}")
+    for size in sizes:
+        lru, lru_saved = simulate(records, LRU(size), cost)
+        lfu, lfu_saved = simulate(records, LFU(size), cost)
+        print(f'{size:>6} {lru:>9.1%} {lru_saved / 1000:>12.1f} {lfu:>9.1%} {lfu_saved / 1000:>12.1f}')
+    bound, bound_saved = simulate(records, Unbounded(), cost)
+    print(f"{'inf':>6} {bound:>9.1%} {bound_saved / 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('logs', nargs='+', help='access log files (JSON lines)')
+    parser.add_argument('--sizes', default='16,32,64,128,256,512,1024', help='comma-separated cache sizes to simulate')
+    parser.add_argument('--day', action='append', default=[], help='only this IST day (YYYY-MM-DD); repeatable')
+    opts = parser.parse_args()
+
+    try:
+        records, skipped = read_records(opts.logs)
+        sizes = [int(size) for size in opts.sizes.split(',')]
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if opts.day:
+        records = [record for record in records if record['day'] in opts.day]
+    if not records:
+        parser.error('no served /api/image records in the logs')
+
+    print(f'{len(records)} served requests ({skipped} other lines skipped)\n')
+    print_days(records)
+    print_modes(records)
+    print_sizes(records, sizes, entry_costs(records))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
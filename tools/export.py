@@ -0,0 +1,153 @@
+"""Renders wallpapers for many configs and dates to disk, on every core, without the web app.
+
+Each non-blank line of the configs file is an ``/api/image`` query string
+(plain parameters or ``c=<token>``), optionally preceded by a name and
+spaces or tabs. Lines starting with ``#`` are skipped::
+
+    lobby   theme=light&mode=segregated_months&highlight_weekends=true
+    c=EAAA
+
+Every config is rendered as of each day from ``--start`` to ``--end``
+(IST, inclusive) and written as ``<out>/<name>/<YYYY-MM-DD>.png``
+(``<YYYY-MM-DD>-home.png`` for the home screen variant). Fonts and emoji
+are loaded once before the pool forks, so workers only render and encode;
+each job is a run of days of one config, encoded in one ``render_days`` pass.
+
+    python tools/export.py kiosks.txt --out exports --start 2026-01-01 --end 2026-12-31
+    python tools/export.py kiosks.txt --out exports --date 2026-10-19 --variants lock,home -j 4
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+import urllib.parse
+
+# Days per job: long enough for render_days to share most of each deflate, short enough to spread over cores
+DAYS_PER_JOB = 16
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+# Label warm-up is for long-lived web workers; here it would only compete with the pool
+os.environ.setdefault('GRID_WARM_TEXT', '0')
+
+from _grid.config import ConfigError, parse_config, parse_variants
+
+
+def read_configs(path):
+    """Parses the configs file into [(name, config)]; raises ConfigError naming the bad line."""
+    configs = []
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, query = (line.split(None, 1) + [''])[:2]
+            if '=' in name:
+                name, query = f'config-{len(configs) + 1}', line
+            if name in ('.', '..') or '/' in name or os.sep in name:
+                raise ConfigError(f'{path}:{lineno}: config names must be plain directory names')
+            if not query:
+                raise ConfigError(f'{path}:{lineno}: {name} has no query string')
+            args = {}
+            try:
+                pairs = urllib.parse.parse_qsl(query.lstrip('?'), keep_blank_values=True, strict_parsing=True)
+            except ValueError:
+                raise ConfigError(f'{path}:{lineno}: expected a query string like mode=year&theme=light') from None
+            # First occurrence wins, like request.args.get
+            for k, v in pairs:
+                args.setdefault(k, v)
+            try:
+                configs.append((name, parse_config(args)))
+            except ConfigError as e:
+                raise ConfigError(f'{path}:{lineno}: {e}') from None
+    if len({name for name, _ in configs}) != len(configs):
+        raise ConfigError(f'{path}: config names must be unique')
+    return configs
+
+
+def date_range(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+def ist_datetime(day):
+    """Midday on ``day``, in the same shape ``ist_now`` returns (IST wall clock)."""
+    return datetime.datetime.combine(day, datetime.time(12), datetime.timezone.utc)
+
+
+def preload(configs):
+    """Loads fonts and downloads every emoji in the parent, so forked workers inherit them."""
+    from _grid.emoji import get_emoji_image
+    from _grid.render import get_fonts
+
+    get_fonts()
+    for emoji in {e for _, config in configs for e in config.special_dates.values() if e}:
+        if get_emoji_image(emoji) is None:
+            print(f'warning: {emoji} could not be downloaded; it renders as a gold dot', file=sys.stderr)
+
+
+def render_job(job):
+    """Renders one (name, config, days) run for each variant and writes it; returns bytes written."""
+    from _grid.archive import archive_name
+    from _grid.render import render_days
+
+    out, name, config, days, variants = job
+    written = 0
+    for variant in variants:
+        for day, png in zip(days, render_days(config, [ist_datetime(day) for day in days], variant)):
+            with open(os.path.join(out, name, archive_name(day, variant)), 'wb') as f:
+                f.write(png)
+            written += len(png)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('configs', help='file with one /api/image query string per line')
+    parser.add_argument('--out', default='exports', help='output directory (default: exports)')
+    parser.add_argument('--start', type=datetime.date.fromisoformat, help='first day (default: today)')
+    parser.add_argument('--end', type=datetime.date.fromisoformat, help='last day (default: --start)')
+    parser.add_argument('--date', type=datetime.date.fromisoformat, action='append', default=[],
+                        help='a single day; repeatable, instead of --start/--end')
+    parser.add_argument('--variants', default='lock', help='lock, home or lock,home (default: lock)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    opts = parser.parse_args()
+
+    try:
+        configs = read_configs(opts.configs)
+        variants = parse_variants({'variants': opts.variants})
+    except (ConfigError, OSError) as e:
+        parser.error(str(e))
+    if opts.date:
+        days = sorted(set(opts.date))
+    else:
+        from _grid.config import ist_now
+        start = opts.start or ist_now().date()
+        days = list(date_range(start, opts.end or start))
+    if not configs or not days:
+        parser.error('nothing to export')
+
+    for name, _ in configs:
+        os.makedirs(os.path.join(opts.out, name), exist_ok=True)
+    preload(configs)
+
+    runs = [days[i:i + DAYS_PER_JOB] for i in range(0, len(days), DAYS_PER_JOB)]
+    jobs = [(opts.out, name, config, run, variants) for name, config in configs for run in runs]
+    images = len(configs) * len(days) * len(variants)
+    print(f'{len(configs)} configs x {len(days)} days x {len(variants)} variants = {images} images, {opts.jobs} jobs')
+    t0 = time.perf_counter()
+    if opts.jobs <= 1:
+        written = sum(map(render_job, jobs))
+    else:
+        with multiprocessing.Pool(opts.jobs) as pool:
+            written = sum(pool.imap_unordered(render_job, jobs))
+    elapsed = time.perf_counter() - t0
+    print(f'wrote {images} images ({written / 1e6:.1f} MB) to {opts.out} in {elapsed:.1f}s: '
+          f'{images / elapsed:.1f} images/s')
+
+
+if __name__ == '__main__':
+    sys.exit(main())